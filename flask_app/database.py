@@ -1,7 +1,11 @@
 import os
+import time
 import firebase_admin
 from firebase_admin import credentials, firestore
 
+from flask_app.firestore_writer import FirestoreWriter
+from flask_app.tracing import traced
+
 # Initialize Firebase only once
 if not firebase_admin._apps:
     cred_path = os.getenv("FIREBASE_CREDENTIALS")
@@ -15,9 +19,41 @@ if not firebase_admin._apps:
 
 db = firestore.client()
 
+# Writes are queued, coalesced per document and committed in batches off the request thread
+writer = FirestoreWriter(
+    db,
+    flush_interval=float(os.getenv("FIRESTORE_FLUSH_INTERVAL", "2.0")),
+    max_pending=int(os.getenv("FIRESTORE_MAX_PENDING", "5000")),
+    # Request threads wait at most this long for room in a full queue
+    enqueue_timeout=float(os.getenv("FIRESTORE_ENQUEUE_TIMEOUT", "5.0"))
+)
+
+
+@traced("firestore.enqueue")
+def add(id, user_name, data, agent, on_written=None):
+    """Queue a write; on_written() runs once it is committed"""
+    writer.enqueue(user_name, agent, data, on_written=on_written)
+    return f"Response queued successfully with id-{id}"
+
 
-def add(id, user_name, data, agent):
+@traced("firestore.set")
+def add_now(id, user_name, data, agent):
+    """Synchronous write for callers that must see the document immediately"""
     doc_ref = db.collection(user_name).document(agent)
     doc_ref.set(data)
     return f"Response saved successfully with id-{id}"
 
+
+@traced("firestore.enqueue_many")
+def add_many(id, records):
+    """Queue (user_name, agent, data) records; they go out as batched writes"""
+    # One deadline for the whole call, not enqueue_timeout per record
+    deadline = time.monotonic() + writer.enqueue_timeout
+    for user_name, agent, data in records:
+        writer.enqueue(user_name, agent, data, timeout=max(0.0, deadline - time.monotonic()))
+    return f"{len(records)} responses queued successfully with id-{id}"
+
+
+def flush(timeout=None):
+    return writer.flush(timeout)
+
@@ -0,0 +1,164 @@
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from flask_app.tracing import get_tracer
+
+# Firestore allows at most 500 operations per batch
+MAX_BATCH_SIZE = 500
+
+
+class FirestoreWriter:
+    """Background Firestore writer that coalesces and batches document sets.
+
+    Writes are queued by (collection, document); a newer write to the same
+    document replaces the queued one instead of adding another round trip.
+    A worker thread commits batched writes when max_batch documents are
+    waiting or flush_interval seconds have passed. The queue is bounded:
+    once max_pending distinct documents are waiting, enqueue blocks for at
+    most enqueue_timeout seconds and then raises TimeoutError. Batches that
+    still fail after max_retries are logged and counted in stats.
+
+    An optional on_written callback runs on the worker thread once the
+    document is committed; it never runs for a dropped or superseded write.
+    """
+
+    def __init__(self, client, max_batch: int = MAX_BATCH_SIZE, flush_interval: float = 2.0,
+                 max_pending: int = 5000, max_retries: int = 5, retry_delay: float = 0.5,
+                 enqueue_timeout: float = 5.0):
+        self.client = client
+        self.max_batch = min(max_batch, MAX_BATCH_SIZE)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.enqueue_timeout = enqueue_timeout
+
+        self.pending = OrderedDict()
+        self.in_flight = 0
+        self.closed = False
+        self.flush_requested = False
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stats = {"queued": 0, "coalesced": 0, "written": 0, "batches": 0, "retries": 0,
+                      "failed": 0, "failed_batches": 0, "enqueue_timeouts": 0}
+        self.last_error = None
+
+        atexit.register(self.close)
+
+    def _start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="firestore-writer", daemon=True)
+            self.thread.start()
+
+    def enqueue(self, collection: str, document: str, data: dict, timeout: float = None,
+                on_written: Optional[Callable[[], None]] = None):
+        """Queue a document set; waits at most `timeout` (default enqueue_timeout) for room"""
+        timeout = self.enqueue_timeout if timeout is None else timeout
+        key = (collection, document)
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("Firestore writer is closed")
+            self._start()
+
+            if key in self.pending:
+                self.pending[key] = (data, on_written)
+                self.stats["coalesced"] += 1
+                return
+
+            if len(self.pending) >= self.max_pending:
+                self.flush_requested = True
+                self.condition.notify_all()
+                if not self.condition.wait_for(lambda: len(self.pending) < self.max_pending, timeout):
+                    self.stats["enqueue_timeouts"] += 1
+                    raise TimeoutError("Firestore write queue is full")
+
+            self.pending[key] = (data, on_written)
+            self.stats["queued"] += 1
+            if len(self.pending) >= self.max_batch:
+                self.condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self.closed or self.flush_requested or len(self.pending) >= self.max_batch,
+                    self.flush_interval
+                )
+                items = []
+                while self.pending and len(items) < self.max_batch:
+                    items.append(self.pending.popitem(last=False))
+                if not self.pending:
+                    self.flush_requested = False
+                self.in_flight = len(items)
+                self.condition.notify_all()
+                if not items and self.closed:
+                    return
+
+            if items:
+                self._commit(items)
+                with self.condition:
+                    self.in_flight = 0
+                    self.condition.notify_all()
+
+    def _commit(self, items):
+        with get_tracer().span("firestore.batch_commit", documents=len(items)) as span:
+            self._commit_batch(items, span)
+
+    def _commit_batch(self, items, span):
+        for attempt in range(self.max_retries + 1):
+            span.set(attempts=attempt + 1)
+            try:
+                batch = self.client.batch()
+                for (collection, document), (data, _) in items:
+                    batch.set(self.client.collection(collection).document(document), data)
+                batch.commit()
+                self.stats["written"] += len(items)
+                self.stats["batches"] += 1
+                self._notify_written(items)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    with self.condition:
+                        self.stats["failed"] += len(items)
+                        self.stats["failed_batches"] += 1
+                        self.last_error = str(e)
+                    span.set(failed=str(e))
+                    documents = ", ".join(f"{collection}/{document}" for (collection, document), _ in items[:5])
+                    print(f"[WARNING] Firestore batch of {len(items)} writes dropped after "
+                          f"{attempt + 1} attempts ({documents}{', ...' if len(items) > 5 else ''}): {e}")
+                    return
+                self.stats["retries"] += 1
+                time.sleep(self.retry_delay * (2 ** attempt))
+
+    @staticmethod
+    def _notify_written(items):
+        for (collection, document), (_, on_written) in items:
+            if on_written is None:
+                continue
+            try:
+                on_written()
+            except Exception as e:
+                print(f"[WARNING] Write callback for {collection}/{document} failed: {e}")
+
+    def flush(self, timeout: float = None) -> bool:
+        """Write everything queued so far; returns False on timeout"""
+        with self.condition:
+            if self.thread is None:
+                return True
+            self.flush_requested = True
+            self.condition.notify_all()
+            return self.condition.wait_for(lambda: not self.pending and not self.in_flight, timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Flush remaining writes and stop the worker (registered with atexit)"""
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
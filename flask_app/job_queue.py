@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from flask_app.tracing import get_tracer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    user TEXT,
+    idempotency_key TEXT UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_after REAL NOT NULL DEFAULT 0,
+    owner_pid INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+# A job whose handler raises is retried until it has been attempted this often
+MAX_ATTEMPTS = 3
+# Seconds before the first retry; doubled for each further attempt
+RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "2"))
+# Errors that would fail the same way again, so the job fails at once
+NON_RETRYABLE: Tuple[Type[BaseException], ...] = (ValueError, TypeError, KeyError)
+# A job still running after this many seconds is presumed abandoned, whatever its owner
+STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "3600"))
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows; rely on STALE_AFTER there
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """Durable local job queue backed by SQLite.
+
+    Jobs survive restarts: each running job records the PID that claimed
+    it, and start_workers queues again the jobs whose process is gone or
+    that have run longer than `stale_after`, leaving other live processes'
+    jobs alone. Claiming is a single transaction, so several workers (or
+    processes sharing the database file) never take the same job. A failed job is retried after an exponential backoff, unless its
+    error is one of `non_retryable`. Finished jobs, and with them their
+    idempotency keys, are deleted `ttl` seconds after they finish.
+    """
+
+    def __init__(self, path: str = "jobs.sqlite3", ttl: float = 3600.0,
+                 non_retryable: Tuple[Type[BaseException], ...] = (), stale_after: float = STALE_AFTER):
+        self.path = path
+        self.ttl = ttl
+        self.stale_after = stale_after
+        self.non_retryable = NON_RETRYABLE + tuple(non_retryable)
+        self.handlers: Dict[str, Callable] = {}
+        self.local = threading.local()
+        self.wakeup = threading.Condition()
+        self.workers = []
+        self.stopping = False
+
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            if "run_after" not in columns:
+                # Databases created before retries were delayed
+                db.execute("ALTER TABLE jobs ADD COLUMN run_after REAL NOT NULL DEFAULT 0")
+            if "owner_pid" not in columns:
+                # Databases created before running jobs recorded their process
+                db.execute("ALTER TABLE jobs ADD COLUMN owner_pid INTEGER")
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            self.local.db = db
+        return db
+
+    def register(self, kind: str, handler: Callable[[Dict, Callable[[Dict], None]], Any]):
+        """handler(payload, progress) -> JSON-serializable result"""
+        self.handlers[kind] = handler
+
+    def enqueue(self, kind: str, payload: Dict, user: Optional[str] = None,
+                idempotency_key: Optional[str] = None) -> Tuple[str, bool]:
+        """Queue a job; returns (job_id, created). A repeated key returns the existing job."""
+        key = f"{user}:{kind}:{idempotency_key}" if idempotency_key else None
+        job_id = uuid.uuid4().hex
+        db = self._connect()
+        with db:
+            self._expire(db)
+            if key:
+                row = db.execute("SELECT id FROM jobs WHERE idempotency_key = ?", (key,)).fetchone()
+                if row:
+                    return row["id"], False
+            db.execute(
+                "INSERT INTO jobs (id, kind, user, idempotency_key, payload, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?)",
+                (job_id, kind, user, key, json.dumps(payload), time.time())
+            )
+        with self.wakeup:
+            self.wakeup.notify()
+        return job_id, True
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        db = self._connect()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND run_after <= ? ORDER BY created_at LIMIT 1",
+                (time.time(),)).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, owner_pid = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (time.time(), os.getpid(), row["id"]))
+            return row
+
+    def reclaim_stale(self) -> int:
+        """Queue again running jobs whose process died or that ran past stale_after; returns how many"""
+        db = self._connect()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            rows = db.execute("SELECT id, owner_pid, started_at FROM jobs WHERE status = 'running'").fetchall()
+            # A job owned by this PID predates this process (a restarted container reuses PIDs):
+            # nothing here has claimed a job yet
+            stale = [
+                row["id"] for row in rows
+                if row["owner_pid"] is None or row["owner_pid"] == os.getpid()
+                or not _pid_alive(row["owner_pid"])
+                or (row["started_at"] or 0) < time.time() - self.stale_after
+            ]
+            db.executemany("UPDATE jobs SET status = 'queued', owner_pid = NULL WHERE id = ?",
+                           [(job_id,) for job_id in stale])
+        if stale:
+            print(f"[DEBUG] Requeued {len(stale)} abandoned job(s)")
+        return len(stale)
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None,
+                retry_in: float = 0.0):
+        db = self._connect()
+        with db:
+            db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, run_after = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error,
+                 time.time() if status != "queued" else None, time.time() + retry_in, job_id))
+        with self.wakeup:
+            self.wakeup.notify_all()
+
+    def _set_progress(self, job_id: str, progress: Dict):
+        db = self._connect()
+        with db:
+            db.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id))
+
+    def _expire(self, db: sqlite3.Connection):
+        db.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                   (time.time() - self.ttl,))
+
+    def run_one(self) -> bool:
+        """Claim and run a single job; returns False if the queue was empty"""
+        row = self._claim()
+        if row is None:
+            return False
+
+        job_id = row["id"]
+        handler = self.handlers.get(row["kind"])
+        if handler is None:
+            self._finish(job_id, "error", error=f"No handler for job kind: {row['kind']}")
+            return True
+
+        try:
+            with get_tracer().span(f"job.{row['kind']}", job_id=job_id, attempt=row["attempts"] + 1):
+                result = handler(json.loads(row["payload"]), lambda progress: self._set_progress(job_id, progress))
+        except Exception as e:
+            attempts = row["attempts"] + 1
+            if isinstance(e, self.non_retryable) or attempts >= MAX_ATTEMPTS:
+                print(f"[WARNING] Job {job_id} ({row['kind']}) failed: {e}")
+                self._finish(job_id, "error", error=str(e))
+            else:
+                delay = RETRY_DELAY * 2 ** (attempts - 1)
+                print(f"[WARNING] Job {job_id} ({row['kind']}) failed, retrying in {delay:g}s: {e}")
+                self._finish(job_id, "queued", error=str(e), retry_in=delay)
+            return True
+
+        self._finish(job_id, "done", result=result)
+        return True
+
+    def _worker(self):
+        while not self.stopping:
+            try:
+                if self.run_one():
+                    continue
+            except sqlite3.Error as e:
+                print(f"[WARNING] Job queue error: {e}")
+            # Also poll, in case another process added jobs
+            with self.wakeup:
+                self.wakeup.wait(timeout=1.0)
+
+    def start_workers(self, count: int = 2):
+        """Reclaim abandoned jobs and run `count` worker threads in this process"""
+        if not self.workers:
+            self.reclaim_stale()
+        for i in range(count):
+            worker = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "user": row["user"],
+            "status": row["status"],
+            "progress": json.loads(row["progress"]) if row["progress"] else None,
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "run_after": row["run_after"] if row["status"] == "queued" else None,
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """Wait up to `timeout` seconds for a job to finish; returns its latest state"""
+        deadline = time.time() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.time()
+            if job is None or job["status"] in ("done", "error") or remaining <= 0:
+                return job
+            with self.wakeup:
+                self.wakeup.wait(timeout=min(remaining, 0.5))
@@ -0,0 +1,87 @@
+import threading
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from flask_app.tracing import Span, Tracer, get_tracer
+
+
+def model_name(serialized: Optional[Dict], metadata: Optional[Dict]) -> str:
+    """Model of a LangChain LLM run, from its callback arguments"""
+    model = (metadata or {}).get("ls_model_name")
+    if not model and serialized:
+        model = serialized.get("kwargs", {}).get("model") or serialized.get("name")
+    return str(model or "unknown").replace("models/", "")
+
+
+class SpanCallbackHandler(BaseCallbackHandler):
+    """LangChain callbacks that record a span per LLM call and tool call.
+
+    Runs inline, so spans are parented to the span current where the chain
+    or agent was invoked.
+    """
+
+    run_inline = True
+
+    def __init__(self, tracer: Optional[Tracer] = None):
+        self.tracer = tracer
+        self.runs: Dict[UUID, Span] = {}
+        self.lock = threading.Lock()
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, **attributes):
+        with self.lock:
+            parent = self.runs.get(parent_run_id) if parent_run_id else None
+        span = (self.tracer or get_tracer()).start_span(name, "client", parent=parent, **attributes)
+        with self.lock:
+            self.runs[run_id] = span
+
+    def _end(self, run_id: UUID, error: Any = None, **attributes):
+        with self.lock:
+            span = self.runs.pop(run_id, None)
+        if span is not None:
+            span.set(**attributes)
+            (self.tracer or get_tracer()).end_span(span, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        model = model_name(serialized, metadata)
+        self._start(run_id, parent_run_id, f"llm.{model}", model=model)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        model = model_name(serialized, metadata)
+        self._start(run_id, parent_run_id, f"llm.{model}", model=model)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = {}
+        try:
+            usage = response.generations[0][0].message.usage_metadata or {}
+        except (AttributeError, IndexError):
+            pass
+        self._end(run_id, input_tokens=usage.get("input_tokens"), output_tokens=usage.get("output_tokens"))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._start(run_id, parent_run_id, f"tool.{name}")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+
+_callbacks: List[BaseCallbackHandler] = []
+_callbacks_lock = threading.Lock()
+
+
+def langchain_callbacks() -> List[BaseCallbackHandler]:
+    """Callbacks to pass to LLMs (or a run config) so their calls are metered and traced"""
+    with _callbacks_lock:
+        if not _callbacks:
+            from flask_app.usage import UsageCallbackHandler
+            # Usage first: a quota error then stops the call before any span is opened
+            _callbacks.extend([UsageCallbackHandler(), SpanCallbackHandler()])
+        return _callbacks
@@ -17,6 +17,10 @@ from langchain_core.tools import tool
 from langgraph.prebuilt import create_react_agent
 from langgraph.checkpoint.memory import MemorySaver
 
+from flask_app.tracing import traced
+from flask_app.llm_callbacks import langchain_callbacks
+from flask_app.usage import QuotaExceededError, usage_metadata
+
 GOOGLE_API_KEY = ""
 MODEL_ID = "gemini-2.0-flash"
 
@@ -24,6 +28,7 @@ llm = ChatGoogleGenerativeAI(
     model=MODEL_ID,
     google_api_key=GOOGLE_API_KEY,
     temperature=0.3,
+    callbacks=langchain_callbacks(),
 )
 
 
@@ -1029,6 +1034,7 @@ memory = MemorySaver()
 agent = create_react_agent(llm, TOOLS, prompt=SYSTEM_PROMPT, checkpointer=memory)
 
 
+@traced("agent1.main")
 def main(user_input,user_id):
     global state_manager
     state_manager = PersistentStateManager(user_id)
@@ -1038,7 +1044,13 @@ def main(user_input,user_id):
     print("Type 'help' for assistance or 'reset' to start over.")
     
     messages = [("system", SYSTEM_PROMPT)]
-    thread_config = {"configurable": {"thread_id": user_id}}
+    # Callbacks in the run config also give each tool call its own span;
+    # the metadata attributes the loop's LLM calls for usage accounting
+    thread_config = {
+        "configurable": {"thread_id": user_id},
+        "callbacks": langchain_callbacks(),
+        **usage_metadata(user_id, "agent1", "timetable_react"),
+    }
 
     while True:
         try:
@@ -1119,6 +1131,8 @@ Now generate the timetable JSON.
         except KeyboardInterrupt:
             print("\nAssistant: Goodbye! 👋")
             break
+        except QuotaExceededError:
+            raise
         except Exception as ex:
             print(f"Error: {ex}")
             # Reset conversation if there's an error
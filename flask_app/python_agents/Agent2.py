@@ -4,7 +4,7 @@ import uuid
 import json
 import asyncio
 import sys
-from typing import Dict, List, Any, Optional, Union, Tuple
+from typing import Callable, Dict, List, Any, Optional, Union, Tuple
 from datetime import datetime, timedelta
 from pathlib import Path
 from enum import Enum
@@ -16,19 +16,33 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain.memory import ConversationSummaryBufferMemory
 from langchain.schema import Document
 
-import pytesseract
-from PIL import Image, ImageEnhance, ImageFilter
 import pymupdf  # PyMuPDF for better PDF handling
-from docx import Document as DocxDocument
 import io
 import base64
-from concurrent.futures import ThreadPoolExecutor
+
+from flask_app.python_agents.tutor_memory import get_user_memory, llm_summarizer
+from flask_app.python_agents.ingestion import (
+    stream_pdf_pages, chunk_pages, iter_docx_blocks, chunk_docx_blocks, DocumentChunk, PageText
+)
+from flask_app.python_agents.doc_store import get_document_store
+from flask_app.python_agents.extraction_cache import get_extraction_cache, content_key
+from flask_app.python_agents.ocr import get_ocr_service, OCRBusyError
+from flask_app.tracing import traced, current_span
+from flask_app.llm_callbacks import langchain_callbacks
+from flask_app.usage import usage_metadata
 
 GOOGLE_API_KEY = ""
 
+# Extracted document text included in a single prompt
+MAX_FILE_PROMPT_CHARS = 12000
+
+# Chunks of the user's uploaded material retrieved per question
+RAG_TOP_K = 4
+# Without a new upload, chunks below this similarity are left out of the prompt
+RAG_MIN_SCORE = 0.15
+
 # Minimal logging
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
@@ -54,11 +68,37 @@ class ProcessingResult:
     metadata: Dict[str, Any]
     processing_time: float
 
+def _result_to_record(result: ProcessingResult) -> Dict[str, Any]:
+    """JSON-friendly form of a ProcessingResult for the extraction cache"""
+    metadata = dict(result.metadata)
+    if "chunks" in metadata:
+        metadata["chunks"] = [asdict(chunk) for chunk in metadata["chunks"]]
+    return {
+        "content": result.content,
+        "content_type": result.content_type.value,
+        "confidence": result.confidence,
+        "metadata": metadata,
+        "processing_time": result.processing_time
+    }
+
+def _result_from_record(record: Dict[str, Any]) -> ProcessingResult:
+    metadata = dict(record["metadata"])
+    if "chunks" in metadata:
+        metadata["chunks"] = [DocumentChunk(**chunk) for chunk in metadata["chunks"]]
+    return ProcessingResult(
+        content=record["content"],
+        content_type=ContentType(record["content_type"]),
+        confidence=record["confidence"],
+        metadata=metadata,
+        processing_time=record["processing_time"]
+    )
+
 class EnhancedStudyAssistant:
     """24/7 Personalized Academic Tutor - Your Study Companion"""
     
-    def __init__(self, memory_manager=None, max_tokens: int = 2000):
+    def __init__(self, memory_manager=None, max_tokens: int = 2000, user_id: str = "default"):
         self.agent_name = "Enhanced Study Assistant"
+        self.user_id = user_id
         self.memory_manager = memory_manager or self._create_default_memory()
         self.max_tokens = max_tokens
       
@@ -67,6 +107,7 @@ class EnhancedStudyAssistant:
             google_api_key=GOOGLE_API_KEY,
             temperature=0.4,
             max_output_tokens=1500,
+            callbacks=langchain_callbacks(),
         )
         
         self.vision_llm = ChatGoogleGenerativeAI(
@@ -74,14 +115,16 @@ class EnhancedStudyAssistant:
             google_api_key=GOOGLE_API_KEY,
             temperature=0.1,
             max_output_tokens=1000,
+            callbacks=langchain_callbacks(),
         )
       
-        self.memory = ConversationSummaryBufferMemory(
-            llm=self.llm,
-            max_token_limit=self.max_tokens,
-            return_messages=True,
-            memory_key="chat_history"
-        )
+        # Token-budgeted per-user memory; older turns are summarized in the background
+        self.memory = get_user_memory(
+            self.user_id, llm_summarizer(self.llm, usage_metadata(self.user_id, "agent2", "memory_summary")),
+            self.max_tokens)
+        
+        # Uploaded course material, retrieved chunk by chunk per question
+        self.documents = get_document_store(self.user_id)
       
         self.user_preferences = {
             "teaching_style": TeachingStyle.BALANCED,
@@ -89,8 +132,6 @@ class EnhancedStudyAssistant:
             "question_frequency": "balanced"
         }
       
-        self.executor = ThreadPoolExecutor(max_workers=3)
-        
         # Setup prompts
         self._setup_prompts()
         
@@ -249,8 +290,10 @@ Detail level: {detail_level}"""),
                 response += " This is important because [explain relevance]."
         return response
     
-    async def chat(self, user_input: str, file_data: Optional[bytes] = None, 
-                   file_type: Optional[str] = None, filename: Optional[str] = None) -> str:
+    @traced("agent2.chat")
+    async def chat(self, user_input: str, file_path: Optional[str] = None, 
+                   file_type: Optional[str] = None, filename: Optional[str] = None,
+                   page_range: Optional[str] = None, progress: Optional[Callable[[int, int], None]] = None) -> str:
         """Main chat method for conversational interaction"""
         
         try:
@@ -262,10 +305,25 @@ Detail level: {detail_level}"""),
             session_context = self._get_session_context()
             
             processed_content = ""
-            
-            # Process file if provided
-            if file_data and file_type:
-                processing_result = await self._process_file_async(file_data, file_type, filename)
+            processing_result = None
+            
+            # Process file if provided and add it to the user's document store
+            if file_path and file_type:
+                processing_result = await self._process_file_async(file_path, file_type, filename, page_range, progress)
+                await self._index_upload(processing_result, filename or file_type)
+            
+            # Only the most relevant chunks of the user's material go into the prompt.
+            # A question sent with a file is about that file, so search only it.
+            if self.documents.size:
+                hits = []
+                if not processing_result:
+                    hits = await asyncio.to_thread(self.documents.search, user_input, RAG_TOP_K, RAG_MIN_SCORE)
+                elif processing_result.metadata.get("document_id"):
+                    hits = await asyncio.to_thread(
+                        self.documents.search, user_input, RAG_TOP_K, 0.0, processing_result.metadata["document_id"])
+                if hits:
+                    processed_content = self._format_retrieved_chunks(hits)
+            if not processed_content and processing_result:
                 processed_content = self._format_processing_result(processing_result)
             
             # Prepare conversation chain
@@ -275,7 +333,7 @@ Detail level: {detail_level}"""),
                     session_context=lambda _: session_context,
                     teaching_style=lambda _: preferences["teaching_style"].value,
                     detail_level=lambda _: preferences["detail_level"],
-                    chat_history=lambda _: self.memory.chat_memory.messages
+                    chat_history=lambda _: self.memory.messages
                 )
                 | self.conversation_prompt
                 | self.llm
@@ -286,7 +344,7 @@ Detail level: {detail_level}"""),
             full_input = f"{processed_content}\n\nStudent Question: {user_input}" if processed_content else user_input
             
             # Generate response
-            response = await chain.ainvoke({"input": full_input})
+            response = await chain.ainvoke({"input": full_input}, usage_metadata(self.user_id, "agent2", "tutor_chat"))
             
             # Format based on preferences
             formatted_response = self._format_response_based_on_preferences(response, preferences)
@@ -305,19 +363,22 @@ Detail level: {detail_level}"""),
         except Exception as e:
             return f"I apologize, but I encountered an issue: {str(e)}. Could you please try rephrasing your question?"
     
-    async def _process_file_async(self, file_data: bytes, file_type: str, filename: str) -> ProcessingResult:
-        """Process uploaded files"""
+    @traced("agent2.process_file")
+    async def _process_file_async(self, file_path: str, file_type: str, filename: str,
+                                  page_range: Optional[str] = None,
+                                  progress: Optional[Callable[[int, int], None]] = None) -> ProcessingResult:
+        """Process an uploaded file on disk, reusing cached results for files seen before"""
         start_time = datetime.now()
         
         try:
             if file_type.startswith('image'):
-                result = await self._process_image_advanced(file_data)
+                processor, process = "image", lambda: self._process_image_advanced(file_path)
             elif file_type == 'application/pdf':
-                result = await self._process_pdf_advanced(file_data)
+                processor, process = "pdf", lambda: self._process_pdf_advanced(file_path, page_range, progress)
             elif file_type in ['application/vnd.openxmlformats-officedocument.wordprocessingml.document']:
-                result = await self._process_docx_advanced(file_data)
+                processor, process = "docx", lambda: self._process_docx_advanced(file_path)
             else:
-                result = ProcessingResult(
+                return ProcessingResult(
                     content=f"I can see you uploaded a {file_type} file. I work best with images, PDFs, and Word documents.",
                     content_type=ContentType.TEXT,
                     confidence=0.5,
@@ -325,7 +386,25 @@ Detail level: {detail_level}"""),
                     processing_time=0.0
                 )
             
+            cache = get_extraction_cache()
+            size = os.path.getsize(file_path)
+            key = await asyncio.to_thread(content_key, file_path, processor, page_range or "")
+            record = await asyncio.to_thread(cache.get, key, size)
+            if record is not None:
+                result = _result_from_record(record)
+                result.metadata["cache_hit"] = True
+            else:
+                result = await process()
+                result.processing_time = (datetime.now() - start_time).total_seconds()
+                # Failures and "busy" answers are worth retrying, so only successes are kept
+                if result.confidence > 0 and "error" not in result.metadata:
+                    await asyncio.to_thread(cache.put, key, _result_to_record(result))
+                result.metadata["cache_hit"] = False
+            
+            result.metadata["document_id"] = key
             result.processing_time = (datetime.now() - start_time).total_seconds()
+            current_span().set(file_type=file_type, bytes=size, cache_hit=result.metadata["cache_hit"],
+                               confidence=result.confidence, processing_time=result.processing_time)
             return result
             
         except Exception as e:
@@ -337,19 +416,26 @@ Detail level: {detail_level}"""),
                 processing_time=(datetime.now() - start_time).total_seconds()
             )
     
-    async def _process_image_advanced(self, image_data: bytes) -> ProcessingResult:
-        """Process images with OCR and enhancement"""
+    @traced("extract.image")
+    async def _process_image_advanced(self, image_path: str) -> ProcessingResult:
+        """Process images with OCR off the event loop"""
         start_time = datetime.now()
         try:
-            image = Image.open(io.BytesIO(image_data))
-            text = pytesseract.image_to_string(image)
+            ocr = await get_ocr_service().image_to_text(image_path)
+            metadata = {
+                "method": "ocr",
+                "tiles": ocr.tiles,
+                "original_size": ocr.original_size,
+                "processed_size": ocr.processed_size,
+                "timings": ocr.timings
+            }
 
-            if text.strip():
+            if ocr.text.strip():
                 return ProcessingResult(
-                    content=f"Text extracted via OCR:\n{text}",
+                    content=f"Text extracted via OCR:\n{ocr.text}",
                     content_type=ContentType.TEXT,
                     confidence=0.85,
-                    metadata={"method": "ocr"},
+                    metadata=metadata,
                     processing_time=(datetime.now()-start_time).total_seconds()
                 )
             else:
@@ -357,9 +443,17 @@ Detail level: {detail_level}"""),
                     content="No text found in image via OCR.",
                     content_type=ContentType.MIXED,
                     confidence=0.5,
-                    metadata={"method": "ocr"},
+                    metadata=metadata,
                     processing_time=(datetime.now()-start_time).total_seconds()
                 )
+        except OCRBusyError as e:
+            return ProcessingResult(
+                content=f"Image processing is busy right now: {str(e)}",
+                content_type=ContentType.TEXT,
+                confidence=0.0,
+                metadata={"error": str(e), "busy": True},
+                processing_time=(datetime.now()-start_time).total_seconds()
+            )
         except Exception as e:
             return ProcessingResult(
                 content=f"Image processing failed: {str(e)}",
@@ -369,50 +463,111 @@ Detail level: {detail_level}"""),
                 processing_time=(datetime.now()-start_time).total_seconds()
             )
     
-    async def _process_pdf_advanced(self, pdf_data: bytes) -> ProcessingResult:
-        """Process PDF documents"""
+    @traced("extract.pdf")
+    async def _process_pdf_advanced(self, pdf_path: str, page_range: Optional[str] = None,
+                                    progress: Optional[Callable[[int, int], None]] = None) -> ProcessingResult:
+        """Process PDF documents, optionally only the pages in page_range (e.g. "1-20,35")"""
+        start_time = datetime.now()
         try:
-            pdf_document = pymupdf.open(stream=pdf_data, filetype="pdf")
-            text_content = []
-            
-            for page_num in range(min(5, len(pdf_document))):  # Limit to first 5 pages
-                page = pdf_document[page_num]
-                text = page.get_text()
-                if text.strip():
-                    text_content.append(f"Page {page_num + 1}:\n{text[:1000]}...")  # Limit text length
-            
-            pdf_document.close()
-            
+            pages = [page async for page in stream_pdf_pages(pdf_path, page_range, progress)]
+            chunks = chunk_pages(pages)
+
+            # Whole document is chunked; the prompt gets as many chunks as fit
+            content_parts = []
+            used = 0
+            for chunk in chunks:
+                if used + len(chunk.text) > MAX_FILE_PROMPT_CHARS:
+                    break
+                content_parts.append(f"[Pages {chunk.page_start}-{chunk.page_end}]\n{chunk.text}")
+                used += len(chunk.text)
+
+            page_seconds = {page.page: round(page.seconds, 4) for page in pages}
             return ProcessingResult(
-                content="\n\n".join(text_content),
+                content="\n\n".join(content_parts),
                 content_type=ContentType.TEXT,
                 confidence=0.9,
-                metadata={"pages": len(pdf_document)}
+                metadata={
+                    "pages": len(pages),
+                    "page_range": page_range,
+                    "page_seconds": page_seconds,
+                    "slowest_page": max(page_seconds, key=page_seconds.get) if page_seconds else None,
+                    "chunks": chunks,
+                    "chunks_in_prompt": len(content_parts)
+                },
+                processing_time=(datetime.now() - start_time).total_seconds()
             )
             
         except Exception as e:
             raise Exception(f"PDF processing failed: {str(e)}")
     
-    async def _process_docx_advanced(self, doc_data: bytes) -> ProcessingResult:
-        """Process Word documents"""
+    @traced("extract.docx")
+    async def _process_docx_advanced(self, doc_path: str) -> ProcessingResult:
+        """Process Word documents: paragraphs and tables in order, chunked"""
+        start_time = datetime.now()
         try:
-            doc = DocxDocument(io.BytesIO(doc_data))
-            content_parts = []
-            
-            for para in doc.paragraphs[:20]:  # Limit to first 20 paragraphs
-                if para.text.strip():
-                    content_parts.append(para.text)
+            def consume():
+                # One pass over the chunk stream: each chunk goes into the prompt
+                # budget and the counters as it's produced. The chunk list itself
+                # is kept because the document store and the cache index all of it.
+                chunks, parts, kinds, tables = [], [], set(), set()
+                used = 0
+                for chunk in chunk_docx_blocks(iter_docx_blocks(doc_path)):
+                    chunks.append(chunk)
+                    kinds.add(chunk.metadata["kind"])
+                    if chunk.metadata["kind"] == "table":
+                        tables.add(chunk.metadata["block_start"])
+                    # Like PDFs, the prompt stops at the first chunk that doesn't fit
+                    if len(parts) == len(chunks) - 1 and used + len(chunk.text) <= MAX_FILE_PROMPT_CHARS:
+                        parts.append(chunk.text)
+                        used += len(chunk.text)
+                return chunks, parts, kinds, len(tables)
+
+            chunks, content_parts, kinds, tables = await asyncio.to_thread(consume)
             
+            content_type = (ContentType.MIXED if len(kinds) > 1
+                            else ContentType.TABLE if kinds == {"table"} else ContentType.TEXT)
             return ProcessingResult(
                 content="\n\n".join(content_parts),
-                content_type=ContentType.TEXT,
+                content_type=content_type,
                 confidence=0.95,
-                metadata={"paragraphs": len(doc.paragraphs)}
+                metadata={
+                    "blocks": chunks[-1].metadata["block_end"] + 1 if chunks else 0,
+                    "tables": tables,
+                    "chunks": chunks,
+                    "chunks_in_prompt": len(content_parts)
+                },
+                processing_time=(datetime.now() - start_time).total_seconds()
             )
             
         except Exception as e:
             raise Exception(f"Word processing failed: {str(e)}")
     
+    async def _index_upload(self, result: ProcessingResult, source: str):
+        """Chunk and embed a processed upload into the user's document store"""
+        document_id = result.metadata.get("document_id")
+        if not document_id or result.confidence <= 0 or not result.content.strip():
+            return
+        chunks = result.metadata.get("chunks") or chunk_pages([PageText(1, result.content, 0.0)])
+        try:
+            added = await asyncio.to_thread(self.documents.add_document, document_id, source, chunks)
+            result.metadata["indexed_chunks"] = added
+        except Exception as e:
+            logger.warning(f"Could not index upload {source}: {e}")
+    
+    def _format_retrieved_chunks(self, hits: List[Tuple[float, Dict[str, Any]]]) -> str:
+        """Format retrieved chunks with their source and pages"""
+        parts = []
+        for _, chunk in hits:
+            if not chunk["page_start"]:
+                location = chunk.get("heading") or chunk.get("kind") or "text"
+            elif chunk["page_start"] == chunk["page_end"]:
+                location = f"p. {chunk['page_start']}"
+            else:
+                location = f"pp. {chunk['page_start']}-{chunk['page_end']}"
+            parts.append(f"[{chunk['source']}, {location}]\n{chunk['text']}")
+        
+        return "📄 **Relevant excerpts from your study material**\n\n" + "\n\n".join(parts) + "\n\n---\n"
+    
     def _format_processing_result(self, result: ProcessingResult) -> str:
         """Format file processing results"""
         confidence_emoji = "🟢" if result.confidence > 0.8 else "🟡" if result.confidence > 0.6 else "🔴"
@@ -448,7 +603,7 @@ Detail level: {detail_level}"""),
     def _get_session_context(self) -> str:
         """Get current session context"""
         try:
-            messages = self.memory.chat_memory.messages[-2:]
+            messages = self.memory.messages[-2:]
             if messages:
                 return "Continuing previous conversation"
             return "Starting new conversation"
@@ -485,7 +640,7 @@ Detail level: {detail_level}"""),
             pass  # Don't let tracking errors break the conversation
 
 # Simple conversation loop
-async def start_conversation(user_input):
+async def start_conversation(user_input, user=None):
     """Start the study assistant conversation"""
     
     print("🎓 Enhanced Study Assistant - Your Personal Tutor")
@@ -494,8 +649,8 @@ async def start_conversation(user_input):
     print("You can ask me questions, upload images/documents, or request study materials.")
     print("Type 'exit' or 'quit' to end our session.\n")
     
-    # Initialize assistant
-    assistant = EnhancedStudyAssistant()
+    # Initialize assistant (conversation memory is kept per user across requests)
+    assistant = EnhancedStudyAssistant(user_id=user or "default")
     
     while True:
         try: 
@@ -524,6 +679,13 @@ async def start_conversation(user_input):
 
             
 
+async def process_upload(user_input: str, user: Optional[str], file_path: str, file_type: str,
+                         filename: str, page_range: Optional[str] = None,
+                         progress: Optional[Callable[[int, int], None]] = None) -> str:
+    """Answer a question about an uploaded file saved at file_path (used by the upload endpoint)"""
+    assistant = EnhancedStudyAssistant(user_id=user or "default")
+    return await assistant.chat(user_input, file_path, file_type, filename, page_range, progress)
+
 # Add this at the bottom, before the "__main__" block:
 
 async def test_file(file_path: str):
@@ -542,14 +704,10 @@ async def test_file(file_path: str):
         print(f"Unsupported file type: {ext}")
         return
     
-    # Read file
-    with open(file_path, 'rb') as f:
-        file_bytes = f.read()
-    
     print(f"\n🧪 Testing file: {file_path}\n")
     response = await assistant.chat(
         user_input="Please analyze this file.",
-        file_data=file_bytes,
+        file_path=file_path,
         file_type=file_type,
         filename=os.path.basename(file_path)
     )
@@ -5,7 +5,9 @@ import re
 import hashlib
 import time
 import pickle
-from typing import List, Dict, Optional, Set
+import copy
+import threading
+from typing import Callable, List, Dict, Optional, Set
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 import asyncio
@@ -15,6 +17,21 @@ from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+from flask_app.python_agents.levels import LevelTable, LevelInfo
+from flask_app.python_agents.badge_rules import BadgeRuleEngine, record_activity
+from flask_app.python_agents.grading import AnswerGrader
+from flask_app.python_agents.skill_model import TopicSkillModel
+from flask_app.python_agents.review_queue import ReviewQueue
+from flask_app.python_agents.leaderboard import LeaderboardManager
+from flask_app.python_agents.dashboard_view import DashboardViewCache
+from flask_app.python_agents import badge_log
+from flask_app.python_agents.quiz_prefetch import QuizPrefetcher
+from flask_app.python_agents.quiz_output import QUESTION_SCHEMA, GenerationMetrics, parse_question, backoff_delay
+from flask_app.python_agents.hedging import get_hedger
+from flask_app.tracing import traced
+from flask_app.llm_callbacks import langchain_callbacks
+from flask_app.usage import QuotaExceededError, usage_metadata
+
 # API Key
 GOOGLE_API_KEY = ""
 
@@ -24,9 +41,20 @@ llm = ChatGoogleGenerativeAI(
     temperature=0.8,
     max_tokens=1000,
     api_key=GOOGLE_API_KEY,
-    timeout=20
+    timeout=20,
+    callbacks=langchain_callbacks()
 )
 
+# Question generation uses the model's JSON mode, constrained to the question schema
+quiz_llm = llm.bind(response_mime_type="application/json", response_schema=QUESTION_SCHEMA)
+# Latency tracking and hedging are keyed by (model, prompt kind)
+QUIZ_HEDGE_KEY = (llm.model, "quiz_question")
+
+# Overall time budget for generating all questions of one quiz
+QUIZ_DEADLINE_SECONDS = float(os.getenv("QUIZ_DEADLINE_SECONDS", "45"))
+# A review quiz picks from this many times as many due questions
+REVIEW_POOL_FACTOR = 3
+
 @dataclass
 class Badge:
     id: str
@@ -66,6 +94,10 @@ class UserProfile:
     completed_quests: Set[str] = field(default_factory=set)
     question_history: Set[str] = field(default_factory=set)
     topic_mastery: Dict[str, int] = field(default_factory=dict)
+    topic_skill: Dict[str, List] = field(default_factory=dict)
+    review_items: Dict[str, Dict] = field(default_factory=dict)
+    weekly_xp: List = field(default_factory=lambda: ["", 0])
+    badge_log: List = field(default_factory=list)
     daily_stats: Dict = field(default_factory=lambda: {
         "questions_answered": 0,
         "correct_answers": 0,
@@ -78,6 +110,12 @@ class UserProfile:
     total_correct: int = 0
     average_response_time: float = 0.0
     favorite_topics: List[str] = field(default_factory=list)
+    activity_counters: Dict = field(default_factory=lambda: {
+        "day_streak": 0,
+        "last_day": None,
+        "weekend_streak": 0,
+        "last_weekend": None
+    })
 
 @dataclass
 class QuizQuestion:
@@ -91,32 +129,13 @@ class QuizQuestion:
     unique_id: str = ""
     question_hash: str = ""
     fun_fact: str = ""
+    accepted_answers: List[str] = field(default_factory=list)
 
 
 class AdvancedGamificationEngine:
     def __init__(self):
-        self.level_data = [
-            {"level": 1, "title": "🌱 Curious Novice", "xp_required": 0, "xp_to_next": 100},
-            {"level": 2, "title": "📚 Eager Learner", "xp_required": 100, "xp_to_next": 150},
-            {"level": 3, "title": "🎯 Knowledge Seeker", "xp_required": 250, "xp_to_next": 200},
-            {"level": 4, "title": "⚡ Quiz Apprentice", "xp_required": 450, "xp_to_next": 300},
-            {"level": 5, "title": "🔥 Trivia Warrior", "xp_required": 750, "xp_to_next": 400},
-            {"level": 6, "title": "🎓 Scholar Knight", "xp_required": 1150, "xp_to_next": 500},
-            {"level": 7, "title": "💎 Wisdom Guardian", "xp_required": 1650, "xp_to_next": 750},
-            {"level": 8, "title": "🚀 Knowledge Master", "xp_required": 2400, "xp_to_next": 1000},
-            {"level": 9, "title": "👑 Quiz Royalty", "xp_required": 3400, "xp_to_next": 1500},
-            {"level": 10, "title": "🌟 Learning Legend", "xp_required": 4900, "xp_to_next": 2000},
-            {"level": 11, "title": "🔮 Mystic Scholar", "xp_required": 6900, "xp_to_next": 2500},
-            {"level": 12, "title": "⚔️ Quiz Gladiator", "xp_required": 9400, "xp_to_next": 3000},
-            {"level": 13, "title": "🏆 Grand Master", "xp_required": 12400, "xp_to_next": 4000},
-            {"level": 14, "title": "🎭 Sage Emperor", "xp_required": 16400, "xp_to_next": 5000},
-            {"level": 15, "title": "🌌 Cosmic Scholar", "xp_required": 21400, "xp_to_next": 7500},
-            {"level": 16, "title": "⭐ Stellar Genius", "xp_required": 28900, "xp_to_next": 10000},
-            {"level": 17, "title": "🎇 Quantum Mind", "xp_required": 38900, "xp_to_next": 15000},
-            {"level": 18, "title": "🌠 Universal Sage", "xp_required": 53900, "xp_to_next": 20000},
-            {"level": 19, "title": "💫 Omniscient Being", "xp_required": 73900, "xp_to_next": 30000},
-            {"level": 20, "title": "🌈 Transcendent Master", "xp_required": 103900, "xp_to_next": 0}
-        ]
+        self.level_table = LevelTable.from_env()
+        self.level_data = self.level_table.as_level_data()
         
         self.badges = {
             "first_steps": Badge("first_steps", "🌟 First Victory", "Answer your first question correctly", "🌟", "achievement", "common", 50, 10),
@@ -142,6 +161,23 @@ class AdvancedGamificationEngine:
             "quiz_god": Badge("quiz_god", "🌈 Quiz God", "Reach level 20", "🌈", "legendary", "legendary", 5000, 1000),
             "the_chosen_one": Badge("the_chosen_one", "👼 The Chosen One", "Get perfect accuracy on 100+ questions", "👼", "legendary", "legendary", 10000, 2000),
         }
+        
+        self.badge_rules = BadgeRuleEngine()
+        
+        # Static part of the badge listing, built once; only "earned" varies per user
+        self.badge_catalog = [
+            {
+                "id": badge_id,
+                "name": badge.name,
+                "description": badge.description,
+                "icon": badge.icon,
+                "category": badge.category,
+                "rarity": badge.rarity,
+                "xp_reward": badge.xp_reward,
+                "coins_reward": badge.coins_reward
+            }
+            for badge_id, badge in self.badges.items()
+        ]
     
     def calculate_xp(self, correct: bool, difficulty: str, response_time: float, streak: int, level: int) -> int:
         if not correct:
@@ -178,42 +214,39 @@ class AdvancedGamificationEngine:
         return max(total_xp, 10)
     
     def get_level_info(self, xp: int) -> Dict:
-        for i, level_info in enumerate(self.level_data):
-            if i == len(self.level_data) - 1:
-                return {
-                    "level": level_info["level"],
-                    "title": level_info["title"],
-                    "xp_to_next": 0,
-                    "progress": 100.0,
-                    "is_max": True
-                }
-            
-            next_level = self.level_data[i + 1]
-            if xp < next_level["xp_required"]:
-                current_level_xp = level_info["xp_required"]
-                xp_needed = next_level["xp_required"] - xp
-                xp_for_level = next_level["xp_required"] - current_level_xp
-                progress = ((xp - current_level_xp) / xp_for_level) * 100
-                
-                return {
-                    "level": level_info["level"],
-                    "title": level_info["title"],
-                    "xp_to_next": xp_needed,
-                    "progress": max(0, progress),
-                    "is_max": False
-                }
-        
-        return self.level_data[-1]
+        return self.level_table.get_level_info(xp)
+
+    def get_level(self, xp: int) -> LevelInfo:
+        """Cached level/title lookup for hot paths that don't need progress"""
+        return self.level_table.get_level(xp)
 
 
 class EnhancedGamifiedQuizAgent:
     def __init__(self):
         self.gamification = AdvancedGamificationEngine()
+        self.grader = AnswerGrader()
+        self.skill_model = TopicSkillModel()
+        self.review_queues: Dict[str, ReviewQueue] = {}
+        self.dashboard_views = DashboardViewCache()
         self.user_profiles: Dict[str, UserProfile] = {}
         self.session_questions: Set[str] = set()
         self.global_question_bank: Set[str] = set()
+        # Guards question_history and global_question_bank, which the prefetch
+        # pool and request threads update while save_user_data reads them
+        self.history_lock = threading.Lock()
+        self.generation_metrics = GenerationMetrics()
+        self.last_quiz_params: Dict[str, Dict] = {}
+        self.prefetcher = QuizPrefetcher(
+            enabled=os.getenv("QUIZ_PREFETCH", "0") == "1",
+            ttl=float(os.getenv("QUIZ_PREFETCH_TTL", "300")),
+            max_per_hour=int(os.getenv("QUIZ_PREFETCH_PER_HOUR", "6"))
+        )
         self.load_user_data()
         
+        self.leaderboards = LeaderboardManager()
+        for profile in self.user_profiles.values():
+            self.leaderboards.load_profile(profile)
+        
         self.format_configs = {
             "multiple_choice": {
                 "instruction": "Create 4 unique, plausible options with ONE clearly correct answer. Make distractors challenging but fair.",
@@ -224,12 +257,12 @@ class EnhancedGamifiedQuizAgent:
                 "example": '{"question":"True or False: The Great Wall of China is visible from space with the naked eye.","correct_answer":"False","explanation":"This is a common myth. The Great Wall is not visible from space with the naked eye.","fun_fact":"Astronauts report that city lights are much more visible from space than the Great Wall.","topic":"Geography","difficulty":"medium","format_type":"true_false"}'
             },
             "fill_in_blank": {
-                "instruction": "Create a sentence with ONE blank that has a specific, unambiguous answer.",
-                "example": '{"question":"The chemical symbol for gold is _____.","correct_answer":"Au","explanation":"Au comes from the Latin word aurum, meaning gold.","fun_fact":"Gold is one of the few elements that occurs naturally in its pure form.","topic":"Chemistry","difficulty":"easy","format_type":"fill_in_blank"}'
+                "instruction": "Create a sentence with ONE blank that has a specific, unambiguous answer. List any other spellings or forms that should also be accepted in accepted_answers.",
+                "example": '{"question":"The chemical symbol for gold is _____.","correct_answer":"Au","accepted_answers":["Au"],"explanation":"Au comes from the Latin word aurum, meaning gold.","fun_fact":"Gold is one of the few elements that occurs naturally in its pure form.","topic":"Chemistry","difficulty":"easy","format_type":"fill_in_blank"}'
             },
             "short_answer": {
-                "instruction": "Create a question requiring a 1-3 word specific answer, not an explanation.",
-                "example": '{"question":"What planet is known as the Red Planet?","correct_answer":"Mars","explanation":"Mars appears red due to iron oxide (rust) on its surface.","fun_fact":"Mars has the largest volcano in the solar system - Olympus Mons!","topic":"Astronomy","difficulty":"easy","format_type":"short_answer"}'
+                "instruction": "Create a question requiring a 1-3 word specific answer, not an explanation. List any other spellings or forms that should also be accepted in accepted_answers.",
+                "example": '{"question":"What planet is known as the Red Planet?","correct_answer":"Mars","accepted_answers":["Planet Mars"],"explanation":"Mars appears red due to iron oxide (rust) on its surface.","fun_fact":"Mars has the largest volcano in the solar system - Olympus Mons!","topic":"Astronomy","difficulty":"easy","format_type":"short_answer"}'
             }
         }
         
@@ -238,7 +271,7 @@ You are creating a UNIQUE {format_type} question for Quiz Legends, an educationa
 
 PLAYER CONTEXT:
 - Player Level: {user_level} ({level_title})
-- Topic Mastery: {topic_mastery} questions in this topic
+- Topic Mastery: {topic_mastery}
 - Recent Topics: {recent_topics}
 - Difficulty: {difficulty}
 - Session ID: {session_id} (ensure uniqueness)
@@ -265,19 +298,23 @@ QUALITY STANDARDS:
 JSON OUTPUT (no additional text):
 {format_example}
 """)
+        self.quiz_chain = self.ENHANCED_QUIZ_PROMPT | quiz_llm | StrOutputParser()
 
     def save_user_data(self):
         try:
-            save_data = {
-                "users": {},
-                "global_question_bank": list(self.global_question_bank)
-            }
+            with self.history_lock:
+                save_data = {
+                    "users": {},
+                    "global_question_bank": list(self.global_question_bank)
+                }
+                histories = {username: list(profile.question_history)
+                             for username, profile in list(self.user_profiles.items())}
             
-            for username, profile in self.user_profiles.items():
+            for username, profile in list(self.user_profiles.items()):
                 profile_dict = profile.__dict__.copy()
                 profile_dict['earned_badges'] = list(profile_dict['earned_badges'])
                 profile_dict['completed_quests'] = list(profile_dict['completed_quests'])
-                profile_dict['question_history'] = list(profile_dict['question_history'])
+                profile_dict['question_history'] = histories.get(username, [])
                 
                 daily_stats = profile_dict['daily_stats'].copy()
                 daily_stats['topics_tried'] = list(daily_stats['topics_tried'])
@@ -288,7 +325,7 @@ JSON OUTPUT (no additional text):
             with open('quiz_legends_save.json', 'w') as f:
                 json.dump(save_data, f, default=str, indent=2)
         except Exception as e:
-            pass
+            print(f"[WARNING] Could not save quiz progress: {e}")
 
     def load_user_data(self):
         try:
@@ -317,7 +354,9 @@ JSON OUTPUT (no additional text):
                     daily_stats['last_active'] = datetime.fromisoformat(daily_stats['last_active']).date()
                 
                 profile_dict['daily_stats'] = daily_stats
-                self.user_profiles[username] = UserProfile(**profile_dict)
+                profile = UserProfile(**profile_dict)
+                badge_log.backfill(profile)
+                self.user_profiles[username] = profile
         except Exception as e:
             pass
 
@@ -327,6 +366,7 @@ JSON OUTPUT (no additional text):
         
         profile = self.user_profiles[username]
         if profile.daily_stats['last_active'] != datetime.now().date():
+            self.dashboard_views.invalidate(username)
             profile.daily_stats = {
                 "questions_answered": 0,
                 "correct_answers": 0,
@@ -338,9 +378,24 @@ JSON OUTPUT (no additional text):
         
         return profile
 
+    def get_review_queue(self, profile: UserProfile) -> ReviewQueue:
+        queue = self.review_queues.get(profile.username)
+        if queue is None or queue.items is not profile.review_items:
+            queue = ReviewQueue(profile.review_items)
+            self.review_queues[profile.username] = queue
+        return queue
+
     def generate_unique_id(self) -> str:
         return f"ql_{int(time.time())}_{random.randint(10000, 99999)}"
 
+    @staticmethod
+    def _is_usable_question(text: str, format_type: str) -> bool:
+        try:
+            parse_question(text, format_type)
+        except ValueError:
+            return False
+        return True
+
     def parse_user_request(self, user_input: str) -> Dict:
         lower = user_input.lower()
         
@@ -369,12 +424,15 @@ JSON OUTPUT (no additional text):
             topic = "General Knowledge"
         
         difficulty = "medium"
+        difficulty_explicit = True
         if any(word in lower for word in ["easy", "simple", "basic", "beginner", "intro"]):
             difficulty = "easy"
         elif any(word in lower for word in ["hard", "difficult", "challenging", "advanced", "expert", "complex"]):
             difficulty = "hard"
         elif any(word in lower for word in ["expert", "master", "extreme", "insane"]):
             difficulty = "expert"
+        elif "medium" not in lower:
+            difficulty_explicit = False
         
         format_type = "multiple_choice"
         format_keywords = {
@@ -402,83 +460,128 @@ JSON OUTPUT (no additional text):
         return {
             "topic": topic.title(),
             "difficulty": difficulty,
+            "difficulty_explicit": difficulty_explicit,
             "format_type": format_type,
             "num_questions": num_questions
         }
 
-    async def generate_unique_question(self, topic: str, difficulty: str, format_type: str, profile: UserProfile) -> Optional[QuizQuestion]:
+    @traced("agent3.generate_unique_question")
+    async def generate_unique_question(self, topic: str, difficulty: str, format_type: str, profile: UserProfile,
+                                       session_hashes: Optional[Set[str]] = None,
+                                       deadline: Optional[float] = None, commit: bool = True) -> Optional[QuizQuestion]:
+        """Generate one new question, retrying with jittered backoff until `deadline` (loop time).
+
+        With commit=False the question's hash is not recorded as asked; call
+        commit_question_hashes once the question is actually served.
+        """
         max_attempts = 5
+        if session_hashes is None:
+            session_hashes = self.session_questions
+        loop = asyncio.get_running_loop()
+        if deadline is None:
+            deadline = loop.time() + QUIZ_DEADLINE_SECONDS
         
+        level_info = self.gamification.get_level(profile.total_xp)
+        topic_mastery = (
+            f"{profile.topic_mastery.get(topic, 0)} correct answers, "
+            f"{self.skill_model.describe(profile.topic_skill, topic)}"
+        )
+        recent_topics = list(profile.daily_stats["topics_tried"])[-3:]
+        config = self.format_configs.get(format_type, self.format_configs["multiple_choice"])
+        usage_config = usage_metadata(profile.username, "agent3", "quiz_question")
+        
+        attempts = 0
+        last_failure = None
         for attempt in range(max_attempts):
+            if attempt:
+                await asyncio.sleep(min(backoff_delay(attempt - 1), max(deadline - loop.time(), 0)))
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                self.generation_metrics.failure("deadline")
+                break
+            
+            attempts += 1
+            unique_id = self.generate_unique_id()
+            prompt_vars = {
+                "topic": topic,
+                "difficulty": difficulty,
+                "format_type": format_type,
+                "unique_id": unique_id,
+                "user_level": level_info["level"],
+                "level_title": level_info["title"],
+                "topic_mastery": topic_mastery,
+                "recent_topics": ", ".join(recent_topics) if recent_topics else "None",
+                "session_id": unique_id,
+                "format_specific_instruction": config["instruction"],
+                "format_example": config["example"]
+            }
+            
             try:
-                unique_id = self.generate_unique_id()
-                level_info = self.gamification.get_level_info(profile.total_xp)
-                
-                topic_mastery = profile.topic_mastery.get(topic, 0)
-                recent_topics = list(profile.daily_stats["topics_tried"])[-3:]
-                
-                config = self.format_configs.get(format_type, self.format_configs["multiple_choice"])
-                
-                prompt_vars = {
-                    "topic": topic,
-                    "difficulty": difficulty,
-                    "format_type": format_type,
-                    "unique_id": unique_id,
-                    "user_level": level_info["level"],
-                    "level_title": level_info["title"],
-                    "topic_mastery": topic_mastery,
-                    "recent_topics": ", ".join(recent_topics) if recent_topics else "None",
-                    "session_id": unique_id,
-                    "format_specific_instruction": config["instruction"],
-                    "format_example": config["example"]
-                }
-                
+                # A call slower than usual is duplicated; the first usable answer wins
                 response = await asyncio.wait_for(
-                    (self.ENHANCED_QUIZ_PROMPT | llm | StrOutputParser()).ainvoke(prompt_vars),
-                    timeout=15.0
+                    get_hedger().call(QUIZ_HEDGE_KEY, lambda: self.quiz_chain.ainvoke(prompt_vars, usage_config),
+                                      validate=lambda text: self._is_usable_question(text, format_type)),
+                    timeout=min(15.0, remaining)
                 )
-                
-                json_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-                json_match = re.search(json_pattern, response, re.DOTALL)
-                
-                if not json_match:
-                    continue
-                
-                try:
-                    data = json.loads(json_match.group())
-                except json.JSONDecodeError:
-                    continue
-                
-                question_content = f"{data['question']}_{data['correct_answer']}"
-                question_hash = hashlib.md5(question_content.encode()).hexdigest()
-                
-                if (question_hash in profile.question_history or 
-                    question_hash in self.session_questions or
-                    question_hash in self.global_question_bank):
-                    continue
-                
-                profile.question_history.add(question_hash)
-                self.session_questions.add(question_hash)
-                self.global_question_bank.add(question_hash)
-                
-                return QuizQuestion(
-                    question=data["question"],
-                    correct_answer=data["correct_answer"],
-                    explanation=data.get("explanation", "No explanation provided."),
-                    topic=data.get("topic", topic),
-                    difficulty=difficulty,
-                    format_type=format_type,
-                    options=data.get("options"),
-                    unique_id=unique_id,
-                    question_hash=question_hash,
-                    fun_fact=data.get("fun_fact", "")
-                )
-                
-            except Exception as e:
-                if attempt == max_attempts - 1:
-                    return self.create_emergency_fallback(topic, difficulty, format_type)
+            except asyncio.TimeoutError:
+                last_failure = "timeout"
+                self.generation_metrics.failure(last_failure)
+                continue
+            except QuotaExceededError:
+                raise
+            except Exception:
+                last_failure = "llm_error"
+                self.generation_metrics.failure(last_failure)
+                continue
+            
+            # Malformed output is repaired locally before spending another call
+            try:
+                data, repaired = parse_question(response, format_type)
+            except ValueError:
+                last_failure = "parse"
+                self.generation_metrics.failure(last_failure)
+                continue
+            
+            question_content = f"{data['question']}_{data['correct_answer']}"
+            question_hash = hashlib.md5(question_content.encode()).hexdigest()
+            
+            with self.history_lock:
+                duplicate = (question_hash in profile.question_history or
+                             question_hash in session_hashes or
+                             question_hash in self.global_question_bank)
+                if not duplicate and commit:
+                    profile.question_history.add(question_hash)
+                    self.global_question_bank.add(question_hash)
+            if duplicate:
+                last_failure = "duplicate"
+                self.generation_metrics.failure(last_failure)
                 continue
+            
+            session_hashes.add(question_hash)
+            self.generation_metrics.record(attempts, "repaired" if repaired else "ok")
+            
+            return QuizQuestion(
+                question=data["question"],
+                correct_answer=data["correct_answer"],
+                explanation=data.get("explanation", "No explanation provided."),
+                # The requested topic, not the model's label, so skill updates and
+                # difficulty picks read and write the same rating
+                topic=topic,
+                difficulty=difficulty,
+                format_type=format_type,
+                options=data.get("options"),
+                unique_id=unique_id,
+                question_hash=question_hash,
+                fun_fact=data.get("fun_fact", ""),
+                accepted_answers=data.get("accepted_answers") or []
+            )
         
+        # The model kept failing outright: use a placeholder. Bad or duplicate
+        # output just drops the question.
+        if last_failure in ("timeout", "llm_error"):
+            self.generation_metrics.record(attempts, "fallback")
+            return self.create_emergency_fallback(topic, difficulty, format_type)
+        self.generation_metrics.record(attempts, "dropped")
         return None
 
     def create_emergency_fallback(self, topic: str, difficulty: str, format_type: str) -> QuizQuestion:
@@ -547,72 +650,77 @@ JSON OUTPUT (no additional text):
             return user_is_true == correct_is_true
             
         else:
-            if user_clean == correct_clean:
-                return True
-            if correct_clean in user_clean or user_clean in correct_clean:
-                return True
-            
-            user_words = set(user_clean.split())
-            correct_words = set(correct_clean.split())
-            
-            overlap = len(user_words & correct_words)
-            return overlap > 0 and overlap >= min(len(user_words), len(correct_words)) * 0.7
+            return self.grader.grade(user_answer, question.correct_answer, question.accepted_answers)
 
-    def check_badge_unlocks(self, profile: UserProfile) -> List[Badge]:
-        new_badges = []
+    def evaluate_answers(self, questions: List[Optional[QuizQuestion]], user_answers: List[str]) -> List[bool]:
+        """Grade a whole session; text answers go through one grader pass"""
+        results = [False] * len(user_answers)
+        text_items = []
+        text_positions = []
         
-        for badge_id, badge in self.gamification.badges.items():
-            if badge_id in profile.earned_badges:
+        for i, (question, user_answer) in enumerate(zip(questions, user_answers)):
+            if question is None:
                 continue
+            if question.format_type in ("multiple_choice", "true_false"):
+                results[i] = self.evaluate_answer(question, user_answer)
+            else:
+                text_items.append((user_answer, question.correct_answer, question.accepted_answers))
+                text_positions.append(i)
+        
+        for i, is_correct in zip(text_positions, self.grader.grade_session(text_items)):
+            results[i] = is_correct
+        
+        return results
+
+    @staticmethod
+    def question_from_data(q_data: Dict) -> QuizQuestion:
+        """Reconstruct a question object with safe defaults"""
+        return QuizQuestion(
+            question=q_data.get("question", ""),
+            correct_answer=q_data.get("correct_answer", "A"),  # Default if missing
+            explanation=q_data.get("explanation", "No explanation available"),
+            topic=q_data.get("topic", "Unknown"),
+            difficulty=q_data.get("difficulty", "medium"),
+            format_type=q_data.get("format_type", "multiple_choice"),
+            options=q_data.get("options", []),
+            unique_id=q_data.get("unique_id", ""),
+            question_hash=q_data.get("question_hash", ""),
+            fun_fact=q_data.get("fun_fact", ""),
+            accepted_answers=q_data.get("accepted_answers") or []
+        )
+
+    def check_badge_unlocks(self, profile: UserProfile, changed_fields: Optional[Set[str]] = None,
+                            context: Optional[Dict] = None) -> List[Badge]:
+        """Award badges whose rules depend on the changed profile fields.
+
+        With no changed_fields every rule is checked (full re-evaluation).
+        Badge rewards change total_xp, so XP-dependent rules are re-checked
+        until nothing new unlocks.
+        """
+        rules = self.gamification.badge_rules
+        rule_context = {"now": datetime.now(), "level_table": self.gamification.level_table}
+        rule_context.update(context or {})
+        
+        pending = set(changed_fields) if changed_fields is not None else rules.all_fields
+        new_badges = []
+        
+        while pending:
+            unlocked = rules.evaluate(profile, pending, rule_context)
+            pending = set()
             
-            earned = False
-            
-            if badge_id == "first_steps" and profile.total_correct >= 1:
-                earned = True
-            elif badge_id == "century_club" and profile.total_correct >= 100:
-                earned = True
-            elif badge_id == "millennium_master" and profile.total_correct >= 1000:
-                earned = True
-            elif badge_id == "hot_streak" and profile.current_streak >= 5:
-                earned = True
-            elif badge_id == "blazing_trail" and profile.current_streak >= 10:
-                earned = True
-            elif badge_id == "unstoppable_force" and profile.best_streak >= 25:
-                earned = True
-            elif badge_id == "legend_born" and profile.best_streak >= 50:
-                earned = True
-            elif badge_id == "quick_draw" and profile.daily_stats["fast_answers"] >= 10:
-                earned = True
-            elif badge_id == "lightning_reflexes" and profile.daily_stats.get("ultra_fast_answers", 0) >= 25:
-                earned = True
-            elif badge_id == "xp_hunter" and profile.total_xp >= 1000:
-                earned = True
-            elif badge_id == "xp_master" and profile.total_xp >= 10000:
-                earned = True
-            elif badge_id == "xp_legend" and profile.total_xp >= 50000:
-                earned = True
-            elif badge_id == "scholar" and len(profile.topic_mastery) >= 5:
-                earned = True
-            elif badge_id == "polymath" and len(profile.topic_mastery) >= 15:
-                earned = True
-            elif badge_id == "night_owl":
-                current_hour = datetime.now().hour
-                if 22 <= current_hour or current_hour <= 6:
-                    earned = True
-            elif badge_id == "early_bird":
-                current_hour = datetime.now().hour
-                if 5 <= current_hour <= 8:
-                    earned = True
-            elif badge_id == "quiz_god":
-                level_info = self.gamification.get_level_info(profile.total_xp)
-                if level_info["level"] >= 20:
-                    earned = True
-            
-            if earned:
+            for badge_id in unlocked:
+                badge = self.gamification.badges.get(badge_id)
+                if not badge:
+                    continue
                 profile.earned_badges.add(badge_id)
+                badge_log.record_unlock(profile, badge_id, rule_context["now"])
                 profile.total_xp += badge.xp_reward
                 profile.coins += badge.coins_reward
                 new_badges.append(badge)
+                pending.add("total_xp")
+        
+        if new_badges:
+            self.dashboard_views.invalidate(profile.username)
         
         return new_badges
 
@@ -622,8 +730,7 @@ JSON OUTPUT (no additional text):
         accuracy = (profile.total_correct / max(profile.total_questions, 1)) * 100
         
         recent_badges = []
-        recent_badge_ids = list(profile.earned_badges)[-5:] if profile.earned_badges else []
-        for badge_id in recent_badge_ids:
+        for badge_id, unlocked_at in badge_log.recent(profile, 5):
             badge = self.gamification.badges.get(badge_id)
             if badge:
                 recent_badges.append({
@@ -631,13 +738,11 @@ JSON OUTPUT (no additional text):
                     "name": badge.name,
                     "description": badge.description,
                     "icon": badge.icon,
-                    "rarity": badge.rarity
+                    "rarity": badge.rarity,
+                    "unlocked_at": unlocked_at
                 })
         
-        top_topics = []
-        if profile.topic_mastery:
-            sorted_topics = sorted(profile.topic_mastery.items(), key=lambda x: x[1], reverse=True)[:3]
-            top_topics = [{"topic": topic, "count": count} for topic, count in sorted_topics]
+        top_topics = self.dashboard_views.top_topics(profile)
         
         return {
             "username": profile.username,
@@ -660,24 +765,26 @@ JSON OUTPUT (no additional text):
             "perfect_answers": profile.daily_stats.get("perfect_answers", 0),
             "topics_mastered": len(profile.topic_mastery),
             "recent_badges": recent_badges,
+            "badges_this_week": len(badge_log.since(profile, badge_log.start_of_week())),
             "top_topics": top_topics
         }
 
+    def get_dashboard_view(self, profile: UserProfile):
+        """Cached dashboard as (data, JSON bytes, etag)"""
+        return self.dashboard_views.dashboard(profile, lambda: self.get_dashboard_data(profile))
+
+    def get_badges_view(self, profile: UserProfile):
+        """Cached badge listing as (data, JSON bytes, etag)"""
+        return self.dashboard_views.badges(profile, lambda: self.get_all_badges(profile))
+
     def get_all_badges(self, profile: UserProfile) -> Dict:
         """Return all badges organized by category"""
         categories = defaultdict(list)
         
-        for badge_id, badge in self.gamification.badges.items():
-            categories[badge.category].append({
-                "id": badge_id,
-                "name": badge.name,
-                "description": badge.description,
-                "icon": badge.icon,
-                "rarity": badge.rarity,
-                "xp_reward": badge.xp_reward,
-                "coins_reward": badge.coins_reward,
-                "earned": badge_id in profile.earned_badges
-            })
+        for entry in self.gamification.badge_catalog:
+            badge_data = {key: value for key, value in entry.items() if key != "category"}
+            badge_data["earned"] = entry["id"] in profile.earned_badges
+            categories[entry["category"]].append(badge_data)
         
         return {
             "categories": dict(categories),
@@ -686,13 +793,62 @@ JSON OUTPUT (no additional text):
             "completion_percentage": round((len(profile.earned_badges) / len(self.gamification.badges)) * 100, 1)
         }
 
-    async def generate_quiz_questions(self, username: str, quiz_input: str) -> Dict:
-        """Generate quiz questions and return as data structure"""
+    def resolve_quiz_params(self, profile: UserProfile, quiz_input: str) -> Dict:
+        """Parse a quiz request and fill in the difficulty from the learner's skill if not given"""
+        params = self.parse_user_request(quiz_input)
+        
+        # No difficulty asked for: pick the one that fits the learner's skill
+        if not params['difficulty_explicit']:
+            params['difficulty'] = self.skill_model.recommend_difficulty(profile.topic_skill, params['topic'])
+        return params
+
+    @staticmethod
+    def quiz_key(params: Dict) -> tuple:
+        return (params["topic"], params["difficulty"], params["format_type"], params["num_questions"])
+
+    @traced("agent3.generate_quiz_questions")
+    async def generate_quiz_questions(self, username: str, quiz_input: str,
+                                      progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """Generate quiz questions and return as data structure.
+
+        Serves the quiz prefetched after the user's last evaluation when the
+        request matches it. `progress(done, total)` is called as each
+        question finishes.
+        """
         profile = self.get_user_profile(username)
-        self.session_questions.clear()
+        params = self.resolve_quiz_params(profile, quiz_input)
+        self.last_quiz_params[username] = params
         
-        level_info = self.gamification.get_level_info(profile.total_xp)
-        params = self.parse_user_request(quiz_input)
+        quiz = await self.prefetcher.take(username, self.quiz_key(params))
+        if quiz is not None:
+            # Level and streak may have moved since it was built
+            level_info = self.gamification.get_level(profile.total_xp)
+            quiz.update(level=level_info.level, title=level_info.title, current_streak=profile.current_streak,
+                        prefetched=True)
+            # Built without recording its questions; they count as asked only now
+            self.commit_question_hashes(profile, [q["question_hash"] for q in quiz["questions"]])
+            if progress:
+                progress(quiz["num_questions"], quiz["num_questions"])
+            return quiz
+        
+        return await self.build_quiz(username, params, progress)
+
+    def commit_question_hashes(self, profile: UserProfile, hashes: List[str]):
+        """Record served questions so they aren't generated again"""
+        with self.history_lock:
+            profile.question_history.update(hashes)
+            self.global_question_bank.update(hashes)
+
+    @traced("agent3.build_quiz")
+    async def build_quiz(self, username: str, params: Dict,
+                         progress: Optional[Callable[[int, int], None]] = None, commit: bool = True) -> Dict:
+        """Generate a quiz for already-resolved request parameters (commit: see generate_unique_question)"""
+        profile = self.get_user_profile(username)
+        # Per-quiz duplicate check, so quizzes built concurrently don't interfere
+        session_hashes: Set[str] = set()
+        deadline = asyncio.get_running_loop().time() + QUIZ_DEADLINE_SECONDS
+        
+        level_info = self.gamification.get_level(profile.total_xp)
         
         # Handle mixed format
         if params['format_type'] == 'mixed':
@@ -705,11 +861,21 @@ JSON OUTPUT (no additional text):
             format_sequence = [params['format_type']] * params['num_questions']
         
         # Generate questions
-        tasks = [
-            self.generate_unique_question(params['topic'], params['difficulty'], fmt, profile)
-            for fmt in format_sequence
-        ]
-        questions = await asyncio.gather(*tasks)
+        done = 0
+        
+        async def generate(fmt):
+            nonlocal done
+            question = await self.generate_unique_question(
+                params['topic'], params['difficulty'], fmt, profile, session_hashes, deadline, commit)
+            done += 1
+            if progress:
+                progress(done, len(format_sequence))
+            return question
+        
+        try:
+            questions = await asyncio.gather(*(generate(fmt) for fmt in format_sequence))
+        except QuotaExceededError as e:
+            return {"success": False, "error": str(e), "quota_exceeded": True}
         questions = [q for q in questions if q is not None]
         
         if not questions:
@@ -731,7 +897,8 @@ JSON OUTPUT (no additional text):
                 "correct_answer": q.correct_answer,      
                 "explanation": q.explanation,
                 "question_hash": q.question_hash,
-                "fun_fact": q.fun_fact
+                "fun_fact": q.fun_fact,
+                "accepted_answers": q.accepted_answers
             })
         
         return {
@@ -746,6 +913,60 @@ JSON OUTPUT (no additional text):
             "current_streak": profile.current_streak
         }
 
+    async def generate_review_quiz(self, username: str, num_questions: int = 10, topic: Optional[str] = None) -> Dict:
+        """Serve a review quiz from the user's due missed questions (no LLM calls).
+
+        Draws from a wider pool of due questions and keeps the ones nearest the
+        learner's skill in each question's topic.
+        """
+        profile = self.get_user_profile(username)
+        review_queue = self.get_review_queue(profile)
+        candidates = review_queue.due(num_questions * REVIEW_POOL_FACTOR, topic=topic)
+        questions_data = self.skill_model.pick_near_level(profile.topic_skill, candidates, num_questions)
+        
+        if not questions_data:
+            next_due = review_queue.next_due()
+            return {
+                "success": False,
+                "error": "Nothing to review right now. Keep playing to build your review deck!",
+                "next_review_at": datetime.fromtimestamp(next_due).isoformat() if next_due else None
+            }
+        
+        level_info = self.gamification.get_level(profile.total_xp)
+        return {
+            "success": True,
+            "review": True,
+            "username": username,
+            "level": level_info.level,
+            "title": level_info.title,
+            "topic": topic or "Review",
+            "difficulty": "mixed",
+            "num_questions": len(questions_data),
+            "questions": questions_data,
+            "current_streak": profile.current_streak
+        }
+
+    def get_leaderboard(self, username: str, board: str = "global", topic: Optional[str] = None,
+                        limit: int = 10) -> Dict:
+        """Top players, the user's rank and their neighbours on a leaderboard"""
+        leaderboard = self.leaderboards.get_board(board, topic)
+        if leaderboard is None:
+            return {
+                "success": False,
+                "error": f"Unknown leaderboard: {board}" if board != "topic" else f"No leaderboard for topic: {topic}"
+            }
+        
+        return {
+            "success": True,
+            "board": board,
+            "topic": topic if board == "topic" else None,
+            "week": self.leaderboards.week if board == "weekly" else None,
+            "total_players": len(leaderboard),
+            "top": leaderboard.top(limit),
+            "my_rank": leaderboard.rank(username),
+            "neighbors": leaderboard.around(username)
+        }
+
     async def submit_answer(self, username: str, question_id: str, user_answer: str, response_time: float) -> Dict:
         """Submit an answer and return the result"""
         profile = self.get_user_profile(username)
@@ -756,10 +977,79 @@ JSON OUTPUT (no additional text):
             "error": "Question session management needs to be implemented"
         }
 
+    @traced("agent3.evaluate_quiz_session")
     async def evaluate_quiz_session(self, username: str, answers: list,questions:list) -> Dict:
         """Evaluate a complete quiz session"""
+        result = self.score_quiz_session(username, answers, questions)
+        
+        # Save progress
+        self.save_user_data()
+        
+        self.prefetch_next_quiz(username)
+        return result
+
+    def prefetch_next_quiz(self, username: str) -> bool:
+        """Start building the user's likely next quiz (same request as last time) in the background"""
+        last_params = self.last_quiz_params.get(username)
+        if last_params is None:
+            return False
+        
+        # Re-resolve: the skill update from this session may change the recommended difficulty
+        params = dict(last_params)
+        if not params['difficulty_explicit']:
+            params['difficulty'] = self.skill_model.recommend_difficulty(
+                self.get_user_profile(username).topic_skill, params['topic'])
+        return self.prefetcher.schedule(
+            username, self.quiz_key(params), lambda: asyncio.run(self.build_quiz(username, params, commit=False)))
+
+    async def evaluate_quiz_batch(self, submissions: List[Dict]) -> List[Dict]:
+        """Evaluate many (user, answers, questions) submissions in one pass.
+
+        Profiles are updated in memory and the save file is written once for
+        the whole batch. A submission that fails is rolled back and reported
+        on its own without affecting the others.
+        """
+        results = []
+        
+        for submission in submissions:
+            username = submission.get("user")
+            answers = submission.get("answers")
+            questions = submission.get("questions")
+            
+            if not username or not answers or not questions:
+                results.append({
+                    "user": username,
+                    "success": False,
+                    "error": "Each submission needs 'user', 'answers' and 'questions'"
+                })
+                continue
+            
+            backup = copy.deepcopy(self.user_profiles.get(username))
+            try:
+                result = self.score_quiz_session(username, answers, questions)
+            except Exception as e:
+                if backup is None:
+                    self.user_profiles.pop(username, None)
+                else:
+                    self.user_profiles[username] = backup
+                self.dashboard_views.invalidate(username, rebuild_topics=True)
+                result = {"success": False, "error": f"Evaluation failed: {str(e)}"}
+            
+            result["user"] = username
+            results.append(result)
+        
+        if any(result.get("success") for result in results):
+            self.save_user_data()
+        
+        return results
+
+    def score_quiz_session(self, username: str, answers: list, questions: list) -> Dict:
+        """Score a session and update the in-memory profile without saving"""
         profile = self.get_user_profile(username)
-        level_info = self.gamification.get_level_info(profile.total_xp)
+        level_info = self.gamification.get_level(profile.total_xp)
+        before = self.gamification.badge_rules.snapshot(profile)
+        review_queue = self.get_review_queue(profile)
+        session_topics = set()
         
         questions = questions
         answers = answers
@@ -770,25 +1060,22 @@ JSON OUTPUT (no additional text):
         new_badges = []
         level_ups = []
         
+        # Reconstruct question objects and grade the whole session in one pass
+        session_questions = [
+            self.question_from_data(q_data) if isinstance(q_data, dict) else None
+            for q_data in questions
+        ]
+        grades = self.evaluate_answers(
+            session_questions[:len(answers)],
+            [answer_data.get("answer", "") for answer_data in answers]
+        )
+        
         # Process each answer
         for i, (q_data, answer_data) in enumerate(zip(questions, answers)):
     # Handle case where q_data might be missing required fields
-            if not isinstance(q_data, dict):
+            question = session_questions[i]
+            if question is None:
                 continue
-    
-    # Reconstruct question object with safe defaults
-            question = QuizQuestion(
-                question=q_data.get("question", ""),
-                correct_answer=q_data.get("correct_answer", "A"),  # Default if missing
-                explanation=q_data.get("explanation", "No explanation available"),
-                topic=q_data.get("topic", "Unknown"),
-                difficulty=q_data.get("difficulty", "medium"),
-                format_type=q_data.get("format_type", "multiple_choice"),
-                options=q_data.get("options", []),
-                unique_id=q_data.get("unique_id", ""),
-                question_hash=q_data.get("question_hash", ""),
-                fun_fact=q_data.get("fun_fact", "")
-            )
             
             user_answer = answer_data.get("answer", "")
             response_time = answer_data.get("response_time", 5.0)
@@ -797,13 +1084,16 @@ JSON OUTPUT (no additional text):
             profile.total_questions += 1
             profile.daily_stats["questions_answered"] += 1
             profile.daily_stats["topics_tried"].add(q_data["topic"])
+            session_topics.add(q_data["topic"])
             
             # Update topic mastery
             if q_data["topic"] not in profile.topic_mastery:
                 profile.topic_mastery[q_data["topic"]] = 0
+                self.dashboard_views.topic_changed(profile, q_data["topic"])
             
-            # Evaluate answer
-            is_correct = self.evaluate_answer(question, user_answer)
+            is_correct = grades[i]
+            self.skill_model.update(profile.topic_skill, q_data["topic"], question.difficulty, is_correct)
+            review_queue.record(q_data, is_correct, response_time)
             
             if is_correct:
                 profile.current_streak += 1
@@ -811,6 +1101,7 @@ JSON OUTPUT (no additional text):
                 profile.total_correct += 1
                 profile.daily_stats["correct_answers"] += 1
                 profile.topic_mastery[q_data["topic"]] += 1
+                self.dashboard_views.topic_changed(profile, q_data["topic"])
                 session_correct += 1
                 
                 # Track fast answers
@@ -826,7 +1117,7 @@ JSON OUTPUT (no additional text):
                 
                 # Calculate XP
                 old_xp = profile.total_xp
-                old_level_info = self.gamification.get_level_info(old_xp)
+                old_level_info = self.gamification.get_level(old_xp)
                 
                 xp_earned = self.gamification.calculate_xp(
                     is_correct, q_data["difficulty"], response_time, 
@@ -836,12 +1127,12 @@ JSON OUTPUT (no additional text):
                 session_xp += xp_earned
                 
                 # Check for level up
-                new_level_info = self.gamification.get_level_info(profile.total_xp)
-                if new_level_info["level"] > old_level_info["level"]:
+                new_level_info = self.gamification.get_level(profile.total_xp)
+                if new_level_info.level > old_level_info.level:
                     profile.coins += 100
                     level_ups.append({
-                        "new_level": new_level_info["level"],
-                        "new_title": new_level_info["title"],
+                        "new_level": new_level_info.level,
+                        "new_title": new_level_info.title,
                         "bonus_coins": 100
                     })
                 
@@ -858,8 +1149,26 @@ JSON OUTPUT (no additional text):
                 answers[i]["explanation"] = question.explanation
                 answers[i]["fun_fact"] = question.fun_fact
         
-        # Check badge unlocks
-        new_badges = self.check_badge_unlocks(profile)
+        # Check badge unlocks for the fields this session changed
+        now = datetime.now()
+        changed_fields = self.gamification.badge_rules.changed_fields(before, profile)
+        changed_fields |= record_activity(profile, now)
+        changed_fields |= {"time_of_day", "session"}
+        new_badges = self.check_badge_unlocks(profile, changed_fields, {
+            "now": now,
+            "session_correct": session_correct,
+            "session_total": len(questions)
+        })
+        self.dashboard_views.invalidate(username)
+        
+        # Update leaderboards with everything this session earned (answers + badges)
+        self.leaderboards.record_xp(
+            profile,
+            profile.total_xp - before["total_xp"],
+            {topic: profile.topic_mastery[topic] for topic in session_topics},
+            now
+        )
+        
         badges_data = []
         for badge in new_badges:
             badges_data.append({
@@ -875,11 +1184,10 @@ JSON OUTPUT (no additional text):
         # Calculate accuracy
         accuracy = (session_correct / len(questions)) * 100 if questions else 0
         
-        # Save progress
-        self.save_user_data()
-        
         # Get updated level info
         final_level_info = self.gamification.get_level_info(profile.total_xp)
+        profile.level = final_level_info["level"]
+        profile.prestige = final_level_info.get("prestige", profile.prestige)
         
         return {
             "success": True,
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+# Upper bound on unlock entries kept per profile
+MAX_LOG_ENTRIES = 200
+
+
+def record_unlock(profile, badge_id: str, when: Optional[datetime] = None):
+    """Append a timestamped unlock to the profile's badge log"""
+    when = when or datetime.now()
+    profile.badge_log.append([badge_id, when.isoformat(timespec="seconds")])
+    if len(profile.badge_log) > MAX_LOG_ENTRIES:
+        del profile.badge_log[:len(profile.badge_log) - MAX_LOG_ENTRIES]
+
+
+def backfill(profile):
+    """Add badges earned before the log existed, with an unknown unlock time"""
+    logged = {badge_id for badge_id, _ in profile.badge_log}
+    missing = sorted(profile.earned_badges - logged)
+    if missing:
+        profile.badge_log[:0] = [[badge_id, None] for badge_id in missing]
+
+
+def recent(profile, count: int) -> List[List]:
+    """Most recent unlocks first, O(count)"""
+    return profile.badge_log[:-count - 1:-1] if count > 0 else []
+
+
+def since(profile, start: datetime) -> List[List]:
+    """Unlocks at or after `start`, newest first; stops at the first older entry"""
+    cutoff = start.isoformat(timespec="seconds")
+    entries = []
+    for badge_id, unlocked_at in reversed(profile.badge_log):
+        if unlocked_at is None or unlocked_at < cutoff:
+            break
+        entries.append([badge_id, unlocked_at])
+    return entries
+
+
+def start_of_week(now: Optional[datetime] = None) -> datetime:
+    now = now or datetime.now()
+    monday = now.date() - timedelta(days=now.weekday())
+    return datetime.combine(monday, datetime.min.time())
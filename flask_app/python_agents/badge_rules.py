@@ -0,0 +1,142 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+# Profile fields a rule can depend on. Each getter reads the current value so
+# the engine can snapshot a profile before a session and diff it afterwards.
+FIELD_GETTERS: Dict[str, Callable] = {
+    "total_correct": lambda p: p.total_correct,
+    "total_questions": lambda p: p.total_questions,
+    "current_streak": lambda p: p.current_streak,
+    "best_streak": lambda p: p.best_streak,
+    "total_xp": lambda p: p.total_xp,
+    "topics_mastered": lambda p: len(p.topic_mastery),
+    "fast_answers": lambda p: p.daily_stats.get("fast_answers", 0),
+    "ultra_fast_answers": lambda p: p.daily_stats.get("ultra_fast_answers", 0),
+    "day_streak": lambda p: p.activity_counters.get("day_streak", 0),
+    "weekend_streak": lambda p: p.activity_counters.get("weekend_streak", 0),
+}
+
+# Event fields have no stored value; they change whenever a session happens
+EVENT_FIELDS = ("time_of_day", "session")
+
+
+@dataclass(frozen=True)
+class BadgeRule:
+    badge_id: str
+    fields: Tuple[str, ...]
+    check: Callable[[object, Dict], bool]
+
+
+def at_least(badge_id: str, field: str, minimum: int) -> BadgeRule:
+    getter = FIELD_GETTERS[field]
+    return BadgeRule(badge_id, (field,), lambda p, ctx: getter(p) >= minimum)
+
+
+def between_hours(badge_id: str, check_hour: Callable[[int], bool]) -> BadgeRule:
+    return BadgeRule(badge_id, ("time_of_day",), lambda p, ctx: check_hour(ctx["now"].hour))
+
+
+DEFAULT_BADGE_RULES: List[BadgeRule] = [
+    at_least("first_steps", "total_correct", 1),
+    at_least("century_club", "total_correct", 100),
+    at_least("millennium_master", "total_correct", 1000),
+    at_least("hot_streak", "current_streak", 5),
+    at_least("blazing_trail", "current_streak", 10),
+    at_least("unstoppable_force", "best_streak", 25),
+    at_least("legend_born", "best_streak", 50),
+    at_least("quick_draw", "fast_answers", 10),
+    at_least("lightning_reflexes", "ultra_fast_answers", 25),
+    at_least("time_bender", "ultra_fast_answers", 50),
+    BadgeRule("perfectionist", ("session",),
+              lambda p, ctx: ctx.get("session_total", 0) >= 10
+              and ctx.get("session_correct", 0) == ctx.get("session_total", 0)),
+    at_least("scholar", "topics_mastered", 5),
+    at_least("polymath", "topics_mastered", 15),
+    at_least("xp_hunter", "total_xp", 1000),
+    at_least("xp_master", "total_xp", 10000),
+    at_least("xp_legend", "total_xp", 50000),
+    between_hours("night_owl", lambda hour: 22 <= hour or hour <= 6),
+    between_hours("early_bird", lambda hour: 5 <= hour <= 8),
+    at_least("weekend_warrior", "weekend_streak", 5),
+    at_least("daily_devotee", "day_streak", 7),
+    BadgeRule("quiz_god", ("total_xp",),
+              lambda p, ctx: ctx["level_table"].get_level(p.total_xp).is_max),
+    BadgeRule("the_chosen_one", ("total_correct", "total_questions"),
+              lambda p, ctx: p.total_questions >= 100 and p.total_correct == p.total_questions),
+]
+
+
+class BadgeRuleEngine:
+    """Evaluates badge rules indexed by the profile fields they depend on.
+
+    Only rules that depend on a changed field are checked, so a session that
+    doesn't move total_xp never looks at the XP badges.
+    """
+
+    def __init__(self, rules: Iterable[BadgeRule] = DEFAULT_BADGE_RULES):
+        self.rules: List[BadgeRule] = list(rules)
+        self.order = {rule.badge_id: i for i, rule in enumerate(self.rules)}
+        self.index: Dict[str, List[BadgeRule]] = {}
+        for rule in self.rules:
+            for field in rule.fields:
+                if field not in FIELD_GETTERS and field not in EVENT_FIELDS:
+                    raise ValueError(f"Badge rule {rule.badge_id} depends on unknown field {field!r}")
+                self.index.setdefault(field, []).append(rule)
+
+    @property
+    def all_fields(self) -> Set[str]:
+        return set(self.index)
+
+    def snapshot(self, profile) -> Dict[str, object]:
+        return {field: getter(profile) for field, getter in FIELD_GETTERS.items()}
+
+    def changed_fields(self, before: Dict[str, object], profile) -> Set[str]:
+        return {field for field, value in before.items() if FIELD_GETTERS[field](profile) != value}
+
+    def evaluate(self, profile, changed: Iterable[str], context: Dict) -> List[str]:
+        """Return ids of unearned badges whose rules now pass, in definition order"""
+        candidates = {}
+        for field in changed:
+            for rule in self.index.get(field, ()):
+                if rule.badge_id not in profile.earned_badges:
+                    candidates[rule.badge_id] = rule
+
+        unlocked = []
+        for badge_id in sorted(candidates, key=self.order.__getitem__):
+            if candidates[badge_id].check(profile, context):
+                unlocked.append(badge_id)
+        return unlocked
+
+
+def record_activity(profile, now: datetime) -> Set[str]:
+    """Update the calendar counters for a play session in O(1).
+
+    Keeps consecutive-day and consecutive-weekend streaks on the profile so
+    calendar badges never need to rescan history. Returns the changed fields.
+    """
+    counters = profile.activity_counters
+    changed = set()
+    today = now.date()
+
+    last_day = counters.get("last_day")
+    if last_day != today.isoformat():
+        if last_day == (today - timedelta(days=1)).isoformat():
+            counters["day_streak"] = counters.get("day_streak", 0) + 1
+        else:
+            counters["day_streak"] = 1
+        counters["last_day"] = today.isoformat()
+        changed.add("day_streak")
+
+    if today.weekday() >= 5:
+        saturday = today - timedelta(days=today.weekday() - 5)
+        last_weekend = counters.get("last_weekend")
+        if last_weekend != saturday.isoformat():
+            if last_weekend == (saturday - timedelta(days=7)).isoformat():
+                counters["weekend_streak"] = counters.get("weekend_streak", 0) + 1
+            else:
+                counters["weekend_streak"] = 1
+            counters["last_weekend"] = saturday.isoformat()
+            changed.add("weekend_streak")
+
+    return changed
@@ -0,0 +1,133 @@
+import json
+import heapq
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class TopKTopics:
+    """Top-k topics by correct answers, maintained incrementally.
+
+    Topic counts only ever grow, so a topic outside the top k can only enter
+    by beating the current minimum; each update is O(log k).
+    """
+
+    def __init__(self, k: int = 3, counts: Optional[Dict[str, int]] = None):
+        self.k = k
+        self.heap: List[Tuple[int, str]] = []
+        for topic, count in (counts or {}).items():
+            self.update(topic, count)
+
+    def update(self, topic: str, count: int):
+        for i, (_, existing) in enumerate(self.heap):
+            if existing == topic:
+                self.heap[i] = (count, topic)
+                heapq.heapify(self.heap)
+                return
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, (count, topic))
+        elif count > self.heap[0][0]:
+            heapq.heapreplace(self.heap, (count, topic))
+
+    def top(self) -> List[Dict]:
+        return [{"topic": topic, "count": count}
+                for count, topic in sorted(self.heap, key=lambda entry: -entry[0])]
+
+
+class _UserView:
+    __slots__ = ("top_topics", "version", "dashboard", "dashboard_body", "dashboard_etag",
+                 "badges", "badges_body", "badges_etag")
+
+    def __init__(self, top_topics: TopKTopics):
+        self.top_topics = top_topics
+        # Bumped by every invalidation; a build that started on an older version is not stored
+        self.version = 0
+        self.dashboard = None
+        self.dashboard_body = None
+        self.dashboard_etag = None
+        self.badges = None
+        self.badges_body = None
+        self.badges_etag = None
+
+
+def _serialize(data: Dict) -> Tuple[bytes, str]:
+    body = json.dumps({"success": True, "data": data}, separators=(",", ":")).encode()
+    return body, hashlib.sha1(body).hexdigest()
+
+
+class DashboardViewCache:
+    """Materialized dashboard and badge views per user.
+
+    Views are built on first request and kept as ready-to-send JSON bytes
+    with an ETag until the profile changes and the user is invalidated.
+    Builds run outside the lock; one that raced an invalidation is returned
+    but not cached. At most max_views users are kept, least recently used
+    first out.
+    """
+
+    def __init__(self, top_k: int = 3, max_views: int = 10000):
+        self.top_k = top_k
+        self.max_views = max_views
+        self.lock = threading.Lock()
+        self.views: "OrderedDict[str, _UserView]" = OrderedDict()
+        self.stats = {"hits": 0, "builds": 0}
+
+    def _view(self, profile) -> _UserView:
+        """Caller holds the lock"""
+        view = self.views.get(profile.username)
+        if view is None:
+            view = _UserView(TopKTopics(self.top_k, profile.topic_mastery))
+            self.views[profile.username] = view
+            if len(self.views) > self.max_views:
+                self.views.popitem(last=False)
+        else:
+            self.views.move_to_end(profile.username)
+        return view
+
+    def top_topics(self, profile) -> List[Dict]:
+        with self.lock:
+            return self._view(profile).top_topics.top()
+
+    def topic_changed(self, profile, topic: str):
+        with self.lock:
+            view = self.views.get(profile.username)
+            if view is not None:
+                view.top_topics.update(topic, profile.topic_mastery[topic])
+
+    def invalidate(self, username: str, rebuild_topics: bool = False):
+        with self.lock:
+            view = self.views.get(username)
+            if view is None:
+                return
+            view.version += 1
+            if rebuild_topics:
+                del self.views[username]
+                return
+            view.dashboard = view.dashboard_body = view.dashboard_etag = None
+            view.badges = view.badges_body = view.badges_etag = None
+
+    def _cached(self, profile, kind: str, build: Callable[[], Dict]) -> Tuple[Dict, bytes, str]:
+        with self.lock:
+            view = self._view(profile)
+            body = getattr(view, f"{kind}_body")
+            if body is not None:
+                self.stats["hits"] += 1
+                return getattr(view, kind), body, getattr(view, f"{kind}_etag")
+            version = view.version
+
+        data = build()
+        body, etag = _serialize(data)
+        with self.lock:
+            self.stats["builds"] += 1
+            if view.version == version and self.views.get(profile.username) is view:
+                setattr(view, kind, data)
+                setattr(view, f"{kind}_body", body)
+                setattr(view, f"{kind}_etag", etag)
+        return data, body, etag
+
+    def dashboard(self, profile, build: Callable[[], Dict]) -> Tuple[Dict, bytes, str]:
+        return self._cached(profile, "dashboard", build)
+
+    def badges(self, profile, build: Callable[[], Dict]) -> Tuple[Dict, bytes, str]:
+        return self._cached(profile, "badges", build)
@@ -0,0 +1,239 @@
+import os
+import re
+import json
+import math
+import zlib
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from flask_app.python_agents.ingestion import DocumentChunk
+
+_WORD = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    """Local, dependency-free embedder using the hashing trick.
+
+    Words and word pairs are hashed into `dim` signed buckets with sublinear
+    term weights, then L2-normalized. No model or network is needed, and
+    keyword-heavy study questions match their source passages well.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _embed(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower())
+        counts: Dict[str, int] = {}
+        for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            counts[token] = counts.get(token, 0) + 1
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token, count in counts.items():
+            h = zlib.crc32(token.encode())
+            vector[h % self.dim] += (1.0 + math.log(count)) * (1.0 if h & 0x80000000 else -1.0)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return np.stack([self._embed(text) for text in texts]) if texts else np.zeros((0, self.dim), np.float32)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self._embed(text)
+
+
+class LangChainEmbedder:
+    """Adapter for any LangChain embeddings object (e.g. GoogleGenerativeAIEmbeddings)"""
+
+    def __init__(self, embeddings, name: str):
+        self.embeddings = embeddings
+        self.name = name
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return self._normalize(np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32))
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self._normalize(np.asarray(self.embeddings.embed_query(text), dtype=np.float32))
+
+
+def get_embedder():
+    """Embedder chosen by RAG_EMBEDDER ("hashing" by default, or "google")"""
+    if os.getenv("RAG_EMBEDDER", "hashing") == "google":
+        try:
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+            model = os.getenv("RAG_EMBEDDING_MODEL", "models/text-embedding-004")
+            return LangChainEmbedder(GoogleGenerativeAIEmbeddings(model=model), f"google-{model}")
+        except Exception as e:
+            print(f"[WARNING] Google embeddings unavailable, using local hashing embedder: {e}")
+    return HashingEmbedder()
+
+
+class UserDocumentStore:
+    """One user's uploaded course material, searchable by similarity.
+
+    Each document is its own shard: chunk vectors in `docs/<id>.npy`
+    (memory-mapped on load, so a large store costs little RAM until
+    searched) and chunk texts and positions in `docs/<id>.json`. `meta.json`
+    lists the documents in order. Adding a document writes only its shard
+    and the small meta file. Documents are keyed by content hash, so
+    re-uploading a file adds nothing.
+    """
+
+    def __init__(self, directory: str, embedder=None):
+        self.directory = directory
+        self.embedder = embedder or HashingEmbedder()
+        self.lock = threading.Lock()
+        self.shards: List[np.ndarray] = []
+        # Document id of each shard, in the same order
+        self.shard_ids: List[str] = []
+        self.chunks: List[Dict] = []
+        self.documents: Dict[str, Dict] = {}
+        os.makedirs(self._file("docs"), exist_ok=True)
+        self.load()
+
+    @property
+    def size(self) -> int:
+        return len(self.chunks)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _shard(self, document_id: str, extension: str) -> str:
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", document_id)
+        return self._file(os.path.join("docs", f"{safe_name}.{extension}"))
+
+    @staticmethod
+    def _write_json(path: str, data):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _write_shard(self, document_id: str, vectors: np.ndarray, chunks: List[Dict]) -> np.ndarray:
+        tmp_vectors = self._shard(document_id, "tmp.npy")
+        np.save(tmp_vectors, np.asarray(vectors, dtype=np.float32))
+        os.replace(tmp_vectors, self._shard(document_id, "npy"))
+        self._write_json(self._shard(document_id, "json"), chunks)
+        return np.load(self._shard(document_id, "npy"), mmap_mode="r")
+
+    def _save_meta(self):
+        # Caller holds the lock (or is loading); the meta file is what makes a shard part of the store
+        self._write_json(self._file("meta.json"), {"embedder": self.embedder.name, "documents": self.documents})
+
+    def load(self):
+        try:
+            with open(self._file("meta.json"), 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        changed = meta.get("embedder") != self.embedder.name
+        for document_id, info in meta.get("documents", {}).items():
+            try:
+                with open(self._shard(document_id, "json"), 'r') as f:
+                    chunks = json.load(f)
+                vectors = np.load(self._shard(document_id, "npy"), mmap_mode="r")
+            except (OSError, ValueError):
+                print(f"[WARNING] Skipping unreadable document {document_id} in {self.directory}")
+                changed = True
+                continue
+            if meta.get("embedder") != self.embedder.name or len(vectors) != len(chunks):
+                # Stored with a different embedder (or a write was cut short): re-embed
+                print(f"[DEBUG] Re-embedding {len(chunks)} chunks of {document_id} in {self.directory}")
+                vectors = self._write_shard(
+                    document_id, self.embedder.embed_documents([chunk["text"] for chunk in chunks]), chunks)
+            self.documents[document_id] = info
+            self.shards.append(vectors)
+            self.shard_ids.append(document_id)
+            self.chunks.extend(chunks)
+        if changed:
+            self._save_meta()
+
+    def add_document(self, document_id: str, source: str, chunks: List[DocumentChunk]) -> int:
+        """Index a document's chunks; returns how many were added (0 if already stored)"""
+        chunks = [chunk for chunk in chunks if chunk.text.strip()]
+        if not chunks or document_id in self.documents:
+            return 0
+
+        new_vectors = self.embedder.embed_documents([chunk.text for chunk in chunks])
+        new_chunks = [{
+            "document_id": document_id,
+            "source": source,
+            "text": chunk.text,
+            "page_start": chunk.page_start,
+            "page_end": chunk.page_end,
+            "kind": chunk.metadata.get("kind", "text"),
+            "heading": chunk.metadata.get("heading")
+        } for chunk in chunks]
+        with self.lock:
+            if document_id in self.documents:
+                return 0
+            try:
+                new_vectors = self._write_shard(document_id, new_vectors, new_chunks)
+            except Exception as e:
+                print(f"[WARNING] Could not persist document {document_id}: {e}")
+            self.shards.append(new_vectors)
+            self.shard_ids.append(document_id)
+            self.chunks.extend(new_chunks)
+            self.documents[document_id] = {
+                "source": source,
+                "chunks": len(new_chunks),
+                "added_at": datetime.now().isoformat(timespec="seconds")
+            }
+            try:
+                self._save_meta()
+            except Exception as e:
+                print(f"[WARNING] Could not persist document store: {e}")
+        return len(new_chunks)
+
+    def search(self, query: str, k: int = 4, min_score: float = 0.0,
+               document_id: Optional[str] = None) -> List[Tuple[float, Dict]]:
+        """Top-k chunks by cosine similarity to the query, best first, optionally from one document"""
+        with self.lock:
+            # Chunks are only ever appended, so indices into this list stay valid
+            shards, shard_ids, chunks = list(self.shards), list(self.shard_ids), self.chunks
+
+        # (index of the shard's first chunk, vectors) for the shards searched
+        selected = []
+        start = 0
+        for vectors, shard_id in zip(shards, shard_ids):
+            if document_id is None or shard_id == document_id:
+                selected.append((start, vectors))
+            start += len(vectors)
+        if not selected or not any(len(vectors) for _, vectors in selected):
+            return []
+
+        query_vector = self.embedder.embed_query(query)
+        scores = np.concatenate([np.asarray(vectors @ query_vector) for _, vectors in selected])
+        rows = np.concatenate([np.arange(start, start + len(vectors)) for start, vectors in selected])
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), chunks[rows[i]]) for i in top if scores[i] >= min_score]
+
+
+_stores: Dict[str, UserDocumentStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_document_store(user_id: str) -> UserDocumentStore:
+    """Per-user store under DOCUMENT_STORE_DIR, opened once per process"""
+    with _stores_lock:
+        store = _stores.get(user_id)
+        if store is None:
+            # Hashed so distinct ids never share a directory and none can escape the store root
+            name = hashlib.sha256(user_id.encode()).hexdigest()[:32]
+            directory = os.path.join(os.getenv("DOCUMENT_STORE_DIR", "document_store"), name)
+            store = UserDocumentStore(directory, get_embedder())
+            _stores[user_id] = store
+        return store
@@ -0,0 +1,139 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Bump a processor's version whenever its output changes so old entries stop matching
+PROCESSOR_VERSIONS = {
+    "image": "ocr-1",
+    "pdf": "pdf-1",
+    "docx": "docx-2",
+}
+
+
+def content_key(path: str, processor: str, options: str = "") -> str:
+    """SHA-256 of the file's bytes, namespaced by processor version and options"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    digest = digest.hexdigest()
+    version = PROCESSOR_VERSIONS.get(processor, processor)
+    suffix = hashlib.sha256(options.encode()).hexdigest()[:12] if options else "all"
+    return f"{digest}-{version}-{suffix}"
+
+
+class ExtractionCache:
+    """Content-addressed cache of extraction results.
+
+    Records are plain JSON-serializable dicts. Recent ones stay in an
+    in-memory LRU; every record is also written to `directory` so repeat
+    uploads are served after a restart too. The oldest files are pruned once
+    there are more than max_disk_entries.
+    """
+
+    def __init__(self, directory: str = "extraction_cache", max_memory_items: int = 64,
+                 max_disk_entries: int = 2000):
+        self.directory = directory
+        self.max_memory_items = max_memory_items
+        self.max_disk_entries = max_disk_entries
+        self.memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "bytes_saved": 0,
+            "seconds_saved": 0.0,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _remember(self, key: str, record: Dict):
+        # Caller holds the lock
+        self.memory[key] = record
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_items:
+            self.memory.popitem(last=False)
+
+    def get(self, key: str, file_size: int = 0) -> Optional[Dict]:
+        with self.lock:
+            record = self.memory.get(key)
+            if record is not None:
+                self.memory.move_to_end(key)
+                tier = "memory_hits"
+
+        if record is None:
+            try:
+                with open(self._path(key), 'r') as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                with self.lock:
+                    self.stats["misses"] += 1
+                return None
+            with self.lock:
+                self._remember(key, record)
+            tier = "disk_hits"
+
+        with self.lock:
+            self.stats[tier] += 1
+            self.stats["bytes_saved"] += file_size
+            self.stats["seconds_saved"] += record.get("processing_time", 0.0)
+        return record
+
+    def put(self, key: str, record: Dict):
+        with self.lock:
+            self._remember(key, record)
+            self.stats["stores"] += 1
+
+        path = self._path(key)
+        try:
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(record, f)
+            os.replace(tmp_path, path)
+            self._prune()
+        except Exception as e:
+            print(f"[WARNING] Could not write extraction cache entry: {e}")
+
+    def _prune(self):
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")]
+        if len(entries) <= self.max_disk_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_disk_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def summary(self) -> Dict:
+        with self.lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "seconds_saved": round(self.stats["seconds_saved"], 3),
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_items": len(self.memory),
+            }
+
+
+_cache: Optional[ExtractionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache(
+                directory=os.getenv("EXTRACTION_CACHE_DIR", "extraction_cache"),
+                max_memory_items=int(os.getenv("EXTRACTION_CACHE_ITEMS", "64"))
+            )
+        return _cache
@@ -0,0 +1,213 @@
+import re
+import unicodedata
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+NUMBER_WORDS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17,
+    "eighteen": 18, "nineteen": 19, "twenty": 20, "thirty": 30, "forty": 40,
+    "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+SCALE_WORDS = {"hundred": 100, "thousand": 1000, "million": 1000000, "billion": 1000000000}
+STOP_WORDS = {"a", "an", "the"}
+# Singular words that look like "-ies" plurals
+SINGULAR_IES = {"species", "series"}
+# An answer with one of these that the correct answer lacks is never accepted ("not mars")
+NEGATIONS = {"not", "no", "never", "neither", "nor", "none"}
+
+# Punctuation, except a minus sign that starts a number ("-40" keeps its sign, "covid-19" splits)
+_PUNCTUATION = re.compile(r"[^\w\s.-]|(?<=\S)-|-(?!\.?\d)")
+_NUMBER = re.compile(r"^-?(?:\d+(?:\.\d*)?|\.\d+)$")
+
+
+def _strip_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _stem(token: str) -> str:
+    """Light plural stemmer: planets -> planet, boxes -> box; mars and species stay put"""
+    if len(token) <= 4 or token.lstrip("-")[:1].isdigit() or token in SINGULAR_IES:
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith(("ses", "xes", "zes", "ches", "shes")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def _fold_numbers(tokens: List[str]) -> List[str]:
+    """Replace runs of number words ("twenty one") with digits ("21")"""
+    result = []
+    total = current = 0
+    in_number = False
+
+    def flush():
+        nonlocal total, current, in_number
+        if in_number:
+            result.append(str(total + current))
+        total = current = 0
+        in_number = False
+
+    for token in tokens:
+        if token in NUMBER_WORDS:
+            current += NUMBER_WORDS[token]
+            in_number = True
+        elif token in SCALE_WORDS and in_number:
+            scale = SCALE_WORDS[token]
+            if scale == 100:
+                current = max(current, 1) * scale
+            else:
+                total += max(current, 1) * scale
+                current = 0
+        elif token == "and" and in_number:
+            continue
+        else:
+            flush()
+            result.append(token)
+    flush()
+    return result
+
+
+def _canonical_number(token: str) -> str:
+    """3.0 -> 3, .5 and 0.50 -> 0.5; commas were already removed"""
+    if not _NUMBER.match(token):
+        return token
+    try:
+        value = Decimal(token)
+    except InvalidOperation:
+        return token
+    if not value:
+        return "0"
+    return format(value.normalize(), "f")
+
+
+@lru_cache(maxsize=8192)
+def normalize(text: str) -> Tuple[str, ...]:
+    """Normalize an answer to a tuple of comparable tokens.
+
+    Handles case, unicode accents, punctuation, articles, number words and
+    simple plurals. A one-word capitalized answer is taken as a proper noun
+    and not stemmed (Texas, Mars). Results are cached since the same
+    correct answers are normalized over and over.
+    """
+    text = _strip_accents(text).strip()
+    proper_noun = " " not in text and text[:1].isupper()
+    text = text.casefold().replace(",", "").replace("\u2212", "-")
+    text = _PUNCTUATION.sub(" ", text)
+    tokens = []
+    for token in text.split():
+        token = token.rstrip(".")
+        if not _NUMBER.match(token):
+            token = token.lstrip(".")
+        if token and token not in STOP_WORDS:
+            tokens.append(token)
+    tokens = [_canonical_number(token) for token in _fold_numbers(tokens)]
+    return tuple(tokens) if proper_noun else tuple(_stem(token) for token in tokens)
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Levenshtein distance that gives up once max_distance is exceeded"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) < len(b):
+        a, b = b, a
+
+    previous = list(range(len(b) + 1))
+    for i, ch_a in enumerate(a, 1):
+        current = [i]
+        for j, ch_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ch_a != ch_b)
+            ))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class AnswerGrader:
+    """Deterministic local grader for fill_in_blank and short_answer questions.
+
+    An answer is correct when its normalized form matches the correct answer
+    or one of the accepted aliases exactly, contains it as a phrase, shares
+    enough words with it, or is within the edit-distance threshold of it.
+    Numbers must match exactly, so 1945 is never accepted for 1946.
+    """
+
+    def __init__(self, max_edit_ratio: float = 0.2, min_fuzzy_length: int = 4,
+                 min_word_overlap: float = 0.7):
+        self.max_edit_ratio = max_edit_ratio
+        self.min_fuzzy_length = min_fuzzy_length
+        self.min_word_overlap = min_word_overlap
+        self._index: Dict[Tuple[str, ...], List[Tuple[str, ...]]] = {}
+
+    def accepted_forms(self, correct_answer: str, aliases: Optional[Iterable[str]] = None) -> List[Tuple[str, ...]]:
+        """Normalized accepted answers for a question, built once per answer key"""
+        key = (correct_answer,) + tuple(aliases or ())
+        forms = self._index.get(key)
+        if forms is None:
+            forms = []
+            for answer in key:
+                normalized = normalize(answer)
+                if normalized and normalized not in forms:
+                    forms.append(normalized)
+            if len(self._index) > 4096:
+                self._index.clear()
+            self._index[key] = forms
+        return forms
+
+    def _matches(self, user: Tuple[str, ...], accepted: Tuple[str, ...]) -> bool:
+        if user == accepted:
+            return True
+        if NEGATIONS.intersection(user).difference(accepted):
+            return False
+
+        # "the planet mars" for "mars"
+        size = len(accepted)
+        if any(user[i:i + size] == accepted for i in range(len(user) - size + 1)):
+            return True
+
+        user_words, accepted_words = set(user), set(accepted)
+        if len(accepted_words) > 1:
+            overlap = len(user_words & accepted_words)
+            if overlap >= len(accepted_words) * self.min_word_overlap:
+                return True
+
+        user_text, accepted_text = " ".join(user), " ".join(accepted)
+        if any(ch.isdigit() for ch in user_text + accepted_text):
+            return False
+        if len(accepted_text) < self.min_fuzzy_length:
+            return False
+        max_distance = round(len(accepted_text) * self.max_edit_ratio)
+        return edit_distance(user_text, accepted_text, max_distance) <= max_distance
+
+    def grade(self, user_answer: str, correct_answer: str, aliases: Optional[Iterable[str]] = None) -> bool:
+        if not user_answer or not user_answer.strip():
+            return False
+        user = normalize(user_answer)
+        if not user:
+            return False
+        return any(self._matches(user, accepted) for accepted in self.accepted_forms(correct_answer, aliases))
+
+    def grade_session(self, items: Sequence[Tuple[str, str, Optional[Iterable[str]]]]) -> List[bool]:
+        """Grade (user_answer, correct_answer, aliases) triples for a whole session.
+
+        Identical answer/key pairs are graded once and the normalization cache
+        is shared across the session.
+        """
+        seen: Dict[Tuple, bool] = {}
+        results = []
+        for user_answer, correct_answer, aliases in items:
+            key = (user_answer, correct_answer, tuple(aliases or ()))
+            if key not in seen:
+                seen[key] = self.grade(user_answer, correct_answer, aliases)
+            results.append(seen[key])
+        return results
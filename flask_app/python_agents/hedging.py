@@ -0,0 +1,149 @@
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional
+
+# Calls observed for a (model, prompt kind) before its percentile is trusted
+MIN_SAMPLES = 20
+
+
+class LatencyTracker:
+    """Sliding window of call latencies per (model, prompt kind)"""
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self.samples: Dict[Hashable, Deque[float]] = {}
+        self.lock = threading.Lock()
+
+    def record(self, key: Hashable, seconds: float):
+        with self.lock:
+            samples = self.samples.get(key)
+            if samples is None:
+                samples = self.samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, key: Hashable, q: float, min_samples: int = MIN_SAMPLES) -> Optional[float]:
+        with self.lock:
+            samples = self.samples.get(key)
+            if samples is None or len(samples) < min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def summary(self) -> Dict[str, Dict]:
+        with self.lock:
+            keys = list(self.samples)
+        result = {}
+        for key in keys:
+            name = "/".join(map(str, key)) if isinstance(key, tuple) else str(key)
+            result[name] = {
+                "samples": len(self.samples[key]),
+                **{f"p{int(q * 100)}": self.percentile(key, q, 1) for q in (0.5, 0.9, 0.95, 0.99)}
+            }
+        return result
+
+
+class HedgedCaller:
+    """Fires a duplicate LLM call when the first is slower than usual.
+
+    If a call hasn't returned by the p90 latency recorded for its (model,
+    prompt kind), a second identical call is started and the first valid
+    result wins; the other is cancelled. Hedges draw from a token bucket that
+    earns `max_hedge_ratio` tokens per call, so extra calls stay within that
+    fraction of traffic. When that is under 10%, the threshold moves up to
+    the matching percentile (p95 for 5%).
+    """
+
+    def __init__(self, tracker: Optional[LatencyTracker] = None, quantile: float = 0.9,
+                 max_hedge_ratio: float = 0.05, burst: float = 3.0):
+        self.tracker = tracker or LatencyTracker()
+        self.quantile = quantile
+        self.max_hedge_ratio = max_hedge_ratio
+        # A budget smaller than 1 - quantile would be used up by calls that are
+        # only a little slow, so wait for the quantile the budget can cover
+        self.hedge_quantile = max(quantile, 1.0 - max_hedge_ratio)
+        self.burst = burst
+        self.tokens = burst
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "hedges": 0, "hedge_wins": 0, "over_budget": 0}
+
+    def _try_hedge(self) -> bool:
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.stats["hedges"] += 1
+                return True
+            self.stats["over_budget"] += 1
+            return False
+
+    async def _timed(self, key: Hashable, make_call: Callable[[], Awaitable[Any]]):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await make_call()
+        self.tracker.record(key, loop.time() - start)
+        return result
+
+    async def call(self, key: Hashable, make_call: Callable[[], Awaitable[Any]],
+                   validate: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Run make_call(), hedging it once if it runs past the key's latency threshold"""
+        with self.lock:
+            self.stats["calls"] += 1
+            self.tokens = min(self.burst, self.tokens + self.max_hedge_ratio)
+
+        primary = asyncio.ensure_future(self._timed(key, make_call))
+        hedge = None
+        try:
+            threshold = self.tracker.percentile(key, self.hedge_quantile)
+            if threshold is None:
+                return await primary
+
+            done, _ = await asyncio.wait({primary}, timeout=threshold)
+            if done or not self._try_hedge():
+                return await primary
+
+            hedge = asyncio.ensure_future(self._timed(key, make_call))
+            pending = {primary, hedge}
+            fallback = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        fallback = fallback or task
+                        continue
+                    result = task.result()
+                    if validate is None or validate(result):
+                        if task is hedge:
+                            with self.lock:
+                                self.stats["hedge_wins"] += 1
+                        return result
+                    fallback = task
+            # Neither produced a valid result: behave like the primary alone would
+            return fallback.result()
+        finally:
+            # Also covers the caller timing out or being cancelled
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def summary(self) -> Dict:
+        with self.lock:
+            stats = dict(self.stats)
+        calls = stats["calls"]
+        return {
+            **stats,
+            "hedge_ratio": round(stats["hedges"] / calls, 4) if calls else 0.0,
+            "latency": self.tracker.summary(),
+        }
+
+
+_hedger: Optional[HedgedCaller] = None
+_hedger_lock = threading.Lock()
+
+
+def get_hedger() -> HedgedCaller:
+    """Process-wide hedger, so the hedge budget is global"""
+    global _hedger
+    with _hedger_lock:
+        if _hedger is None:
+            _hedger = HedgedCaller()
+        return _hedger
@@ -0,0 +1,313 @@
+import os
+import time
+import asyncio
+import zipfile
+import multiprocessing
+import xml.etree.ElementTree as ET
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Pages handed to one worker at a time; big enough to amortize opening the file
+PAGES_PER_TASK = 8
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def pool_context():
+    """Start method for worker pools created inside the threaded server.
+
+    Forking a process that has other threads running can copy a lock some
+    thread was holding and deadlock the child, so workers come from a fork
+    server (spawn where that isn't available).
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=pool_context())
+    return _pool
+
+
+@dataclass
+class PageText:
+    page: int  # 1-based page number
+    text: str
+    seconds: float
+
+
+@dataclass
+class DocumentChunk:
+    index: int
+    text: str
+    page_start: int
+    page_end: int
+    char_start: int  # offset in the full document text
+    char_end: int
+    metadata: Dict = field(default_factory=dict)
+
+
+def parse_page_range(spec: Optional[str], page_count: int) -> List[int]:
+    """Turn "1-20,35,40-" into sorted 1-based page numbers within the document.
+
+    Raises ValueError for a malformed spec or one that selects no pages.
+    """
+    if not spec:
+        return list(range(1, page_count + 1))
+
+    pages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, _, end = part.partition("-")
+            first = int(start) if start.strip() else 1
+            last = int(end) if end.strip() else page_count
+        else:
+            first = last = int(part)
+        if first > last:
+            raise ValueError(f"Invalid page range: {part}")
+        pages.update(range(max(first, 1), min(last, page_count) + 1))
+    if not pages:
+        raise ValueError(f"Page range {spec!r} selects no pages (the document has {page_count})")
+    return sorted(pages)
+
+
+def _extract_pages(path: str, pages: List[int]) -> List[Tuple[int, str, float]]:
+    """Worker: extract text for the given 1-based pages of a PDF on disk"""
+    import pymupdf
+
+    results = []
+    with pymupdf.open(path) as document:
+        for page_number in pages:
+            start = time.perf_counter()
+            text = document[page_number - 1].get_text()
+            results.append((page_number, text, time.perf_counter() - start))
+    return results
+
+
+def pdf_page_count(path: str) -> int:
+    import pymupdf
+
+    # Opening by path reads only the cross-reference table, not the whole file
+    with pymupdf.open(path, filetype="pdf") as document:
+        return len(document)
+
+
+async def stream_pdf_pages(path: str, page_range: Optional[str] = None,
+                           progress: Optional[Callable[[int, int], None]] = None) -> AsyncIterator[PageText]:
+    """Extract pages of the PDF at `path` in a process pool, yielding them in page order as they finish.
+
+    Workers open the file by path, so the document is never copied into
+    them. Extraction never runs on the event loop thread. `progress(done,
+    total)` is called after each page.
+    """
+    loop = asyncio.get_running_loop()
+    page_count = await loop.run_in_executor(None, pdf_page_count, path)
+    pages = parse_page_range(page_range, page_count)
+    if not pages:
+        return
+
+    pool = get_pool()
+    tasks = [
+        loop.run_in_executor(pool, _extract_pages, path, pages[i:i + PAGES_PER_TASK])
+        for i in range(0, len(pages), PAGES_PER_TASK)
+    ]
+
+    # All tasks run in parallel; awaiting them in order yields each page
+    # as soon as it and everything before it is done
+    done = 0
+    for task in tasks:
+        for page_number, text, seconds in await task:
+            done += 1
+            if progress:
+                progress(done, len(pages))
+            yield PageText(page_number, text, seconds)
+
+
+def chunk_pages(pages: Iterable[PageText], chunk_size: int = 1500, overlap: int = 200) -> List[DocumentChunk]:
+    """Split page texts into overlapping chunks that remember their pages and offsets"""
+    parts = []
+    page_starts: List[int] = []
+    page_numbers: List[int] = []
+    length = 0
+    for page in pages:
+        text = page.text.strip()
+        if not text:
+            continue
+        page_starts.append(length)
+        page_numbers.append(page.page)
+        parts.append(text + "\n\n")
+        length += len(text) + 2
+    full_text = "".join(parts)
+
+    def page_at(position: int) -> int:
+        return page_numbers[bisect_right(page_starts, position) - 1]
+
+    chunks: List[DocumentChunk] = []
+    start = 0
+    while start < len(full_text):
+        end = min(start + chunk_size, len(full_text))
+        if end < len(full_text):
+            # Prefer to cut at a paragraph, then a sentence boundary
+            boundary = max(full_text.rfind("\n\n", start + chunk_size // 2, end),
+                           full_text.rfind(". ", start + chunk_size // 2, end))
+            if boundary != -1:
+                end = boundary + 1
+        text = full_text[start:end].strip()
+        if text:
+            chunks.append(DocumentChunk(
+                index=len(chunks),
+                text=text,
+                page_start=page_at(start),
+                page_end=page_at(end - 1),
+                char_start=start,
+                char_end=end
+            ))
+        if end >= len(full_text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+# Content-control wrappers that can sit between the body and its paragraphs and tables
+_BLOCK_CONTAINERS = {f"{_W}sdt", f"{_W}sdtContent"}
+
+
+@dataclass
+class DocxBlock:
+    index: int  # position among the body's paragraphs and tables
+    kind: str  # "paragraph" or "table"
+    text: str
+    heading: Optional[str] = None  # nearest heading above this block
+    rows: List[str] = field(default_factory=list)
+
+
+def _paragraph_text(element) -> str:
+    parts = []
+    for node in element.iter():
+        if node.tag == f"{_W}t" and node.text:
+            parts.append(node.text)
+        elif node.tag == f"{_W}tab":
+            parts.append("\t")
+        elif node.tag in (f"{_W}br", f"{_W}cr"):
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _is_heading(element) -> bool:
+    style = element.find(f"{_W}pPr/{_W}pStyle")
+    return style is not None and style.get(f"{_W}val", "").lower().startswith(("heading", "title"))
+
+
+def _table_rows(element) -> List[str]:
+    rows = []
+    for row in element.iter(f"{_W}tr"):
+        cells = [" ".join(_paragraph_text(p).strip() for p in cell.iter(f"{_W}p")).strip()
+                 for cell in row.findall(f"{_W}tc")]
+        if any(cells):
+            rows.append(" | ".join(cells))
+    return rows
+
+
+def iter_docx_blocks(path: str) -> Iterator[DocxBlock]:
+    """Yield a .docx body's paragraphs and tables in document order.
+
+    Blocks wrapped in content controls (w:sdt/w:sdtContent, as templates and
+    forms use) count as body blocks. document.xml is parsed incrementally
+    and each top-level block is freed once yielded, so the XML tree never
+    holds more than one block.
+    """
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as xml:
+        # Tags of the open elements above the current one: document, body, ...
+        ancestors: List[str] = []
+        index = 0
+        heading = None
+        for event, element in ET.iterparse(xml, events=("start", "end")):
+            if event == "start":
+                ancestors.append(element.tag)
+                continue
+            ancestors.pop()
+            # document > body > (sdt > sdtContent >)* block
+            if len(ancestors) < 2 or any(tag not in _BLOCK_CONTAINERS for tag in ancestors[2:]):
+                continue
+            if element.tag == f"{_W}p":
+                text = _paragraph_text(element).strip()
+                if text:
+                    if _is_heading(element):
+                        heading = text
+                    yield DocxBlock(index, "paragraph", text, heading)
+                    index += 1
+            elif element.tag == f"{_W}tbl":
+                rows = _table_rows(element)
+                if rows:
+                    yield DocxBlock(index, "table", "\n".join(rows), heading, rows)
+                    index += 1
+            element.clear()
+
+
+def chunk_docx_blocks(blocks: Iterable[DocxBlock], chunk_size: int = 1500) -> Iterator[DocumentChunk]:
+    """Group paragraphs into chunks and emit tables as their own chunks.
+
+    Large tables are split by rows, repeating the header row in each part,
+    and very long paragraphs are split like PDF text.
+    Chunks are produced as blocks arrive; DOCX has no pages, so positions are
+    block indices and the section heading in each chunk's metadata.
+    """
+    chunk_index = 0
+    offset = 0
+    pending: List[DocxBlock] = []
+
+    def make(text: str, first: DocxBlock, last: DocxBlock, kind: str) -> DocumentChunk:
+        nonlocal chunk_index, offset
+        chunk = DocumentChunk(
+            index=chunk_index,
+            text=text,
+            page_start=0,
+            page_end=0,
+            char_start=offset,
+            char_end=offset + len(text),
+            metadata={"kind": kind, "block_start": first.index, "block_end": last.index, "heading": first.heading}
+        )
+        chunk_index += 1
+        offset += len(text) + 2
+        return chunk
+
+    def flush() -> Iterator[DocumentChunk]:
+        if pending:
+            yield make("\n\n".join(block.text for block in pending), pending[0], pending[-1], "text")
+            pending.clear()
+
+    for block in blocks:
+        if block.kind == "table":
+            yield from flush()
+            header, part = block.rows[0], [block.rows[0]]
+            size = len(header)
+            for row in block.rows[1:]:
+                if size + len(row) > chunk_size and len(part) > 1:
+                    yield make("\n".join(part), block, block, "table")
+                    part, size = [header], len(header)
+                part.append(row)
+                size += len(row) + 1
+            yield make("\n".join(part), block, block, "table")
+            continue
+
+        if len(block.text) > chunk_size:
+            yield from flush()
+            for piece in chunk_pages([PageText(0, block.text, 0.0)], chunk_size):
+                yield make(piece.text, block, block, "text")
+            continue
+
+        size = sum(len(existing.text) + 2 for existing in pending)
+        if pending and (size + len(block.text) > chunk_size or block.heading != pending[-1].heading):
+            yield from flush()
+        pending.append(block)
+    yield from flush()
@@ -0,0 +1,231 @@
+import random
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels: int):
+        self.key = key
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+
+class IndexableSkipList:
+    """Sorted container with O(log n) insert, remove, rank and index lookup.
+
+    Every link stores how many positions it skips, so the rank of a key is
+    the sum of the link widths walked on the way to it.
+    """
+
+    MAX_LEVELS = 24
+
+    def __init__(self):
+        self.head = _Node(None, self.MAX_LEVELS)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _random_levels(self) -> int:
+        levels = 1
+        while levels < self.MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+        return levels
+
+    def insert(self, key):
+        chain = [None] * self.MAX_LEVELS
+        steps_at_level = [0] * self.MAX_LEVELS
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = self._random_levels()
+        new_node = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain = [None] * self.MAX_LEVELS
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def rank(self, key) -> int:
+        """0-based position of key"""
+        node = self.head
+        position = 0
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        target = node.next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        return position
+
+    def __getitem__(self, index: int):
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        node = self.head
+        index += 1
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.width[level] <= index:
+                index -= node.width[level]
+                node = node.next[level]
+        return node.key
+
+    def slice(self, start: int, stop: int) -> List:
+        """Keys in positions [start, stop), found in O(log n + k)"""
+        start = max(start, 0)
+        stop = min(stop, self.size)
+        if start >= stop:
+            return []
+        node = self.head
+        index = start + 1
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.width[level] <= index:
+                index -= node.width[level]
+                node = node.next[level]
+        keys = []
+        while node is not None and len(keys) < stop - start:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class Leaderboard:
+    """Scores per user, ranked highest first (ties broken by username)"""
+
+    def __init__(self):
+        self.scores: Dict[str, int] = {}
+        self.index = IndexableSkipList()
+
+    def __len__(self):
+        return len(self.scores)
+
+    def set(self, username: str, score: int):
+        old = self.scores.get(username)
+        if old == score:
+            return
+        if old is not None:
+            self.index.remove((-old, username))
+        self.scores[username] = score
+        self.index.insert((-score, username))
+
+    def add(self, username: str, amount: int):
+        self.set(username, self.scores.get(username, 0) + amount)
+
+    @staticmethod
+    def _entries(keys: List[Tuple], first_rank: int) -> List[Dict]:
+        return [
+            {"rank": first_rank + i, "username": username, "score": -score}
+            for i, (score, username) in enumerate(keys)
+        ]
+
+    def top(self, count: int) -> List[Dict]:
+        return self._entries(self.index.slice(0, count), 1)
+
+    def rank(self, username: str) -> Optional[int]:
+        if username not in self.scores:
+            return None
+        return self.index.rank((-self.scores[username], username)) + 1
+
+    def around(self, username: str, radius: int = 2) -> List[Dict]:
+        rank = self.rank(username)
+        if rank is None:
+            return []
+        start = max(rank - 1 - radius, 0)
+        return self._entries(self.index.slice(start, rank + radius), start + 1)
+
+
+def week_key(now: datetime) -> str:
+    year, week, _ = now.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+class LeaderboardManager:
+    """Global, per-topic and weekly leaderboards kept up to date incrementally.
+
+    The weekly board is replaced with an empty one when the ISO week changes,
+    so rollover never rescans users.
+    """
+
+    def __init__(self):
+        self.global_board = Leaderboard()
+        self.topic_boards: Dict[str, Leaderboard] = {}
+        self.week = week_key(datetime.now())
+        self.weekly_board = Leaderboard()
+
+    def _roll_week(self, now: datetime):
+        current = week_key(now)
+        if current != self.week:
+            self.week = current
+            self.weekly_board = Leaderboard()
+
+    def topic_board(self, topic: str) -> Leaderboard:
+        key = topic.lower()
+        if key not in self.topic_boards:
+            self.topic_boards[key] = Leaderboard()
+        return self.topic_boards[key]
+
+    def load_profile(self, profile, now: Optional[datetime] = None):
+        """Add a saved profile to the boards (used once at startup)"""
+        self._roll_week(now or datetime.now())
+        self.global_board.set(profile.username, profile.total_xp)
+        for topic, count in profile.topic_mastery.items():
+            self.topic_board(topic).set(profile.username, count)
+        week, xp = profile.weekly_xp
+        if week == self.week and xp:
+            self.weekly_board.set(profile.username, xp)
+
+    def record_xp(self, profile, xp_gained: int, topics: Dict[str, int], now: Optional[datetime] = None):
+        """Apply one XP change: new total, XP gained and changed topic counts"""
+        now = now or datetime.now()
+        self._roll_week(now)
+
+        week, xp = profile.weekly_xp
+        profile.weekly_xp = [self.week, (xp if week == self.week else 0) + xp_gained]
+
+        self.global_board.set(profile.username, profile.total_xp)
+        if profile.weekly_xp[1]:
+            self.weekly_board.set(profile.username, profile.weekly_xp[1])
+        for topic, count in topics.items():
+            self.topic_board(topic).set(profile.username, count)
+
+    def get_board(self, board: str, topic: Optional[str] = None, now: Optional[datetime] = None) -> Optional[Leaderboard]:
+        if board == "global":
+            return self.global_board
+        if board == "weekly":
+            self._roll_week(now or datetime.now())
+            return self.weekly_board
+        if board == "topic" and topic:
+            return self.topic_boards.get(topic.lower())
+        return None
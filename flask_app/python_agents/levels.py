@@ -0,0 +1,147 @@
+import os
+import json
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import List, Dict, Optional
+
+# Default Quiz Legends level curve: (level, title, xp_required)
+DEFAULT_LEVEL_CURVE = [
+    (1, "🌱 Curious Novice", 0),
+    (2, "📚 Eager Learner", 100),
+    (3, "🎯 Knowledge Seeker", 250),
+    (4, "⚡ Quiz Apprentice", 450),
+    (5, "🔥 Trivia Warrior", 750),
+    (6, "🎓 Scholar Knight", 1150),
+    (7, "💎 Wisdom Guardian", 1650),
+    (8, "🚀 Knowledge Master", 2400),
+    (9, "👑 Quiz Royalty", 3400),
+    (10, "🌟 Learning Legend", 4900),
+    (11, "🔮 Mystic Scholar", 6900),
+    (12, "⚔️ Quiz Gladiator", 9400),
+    (13, "🏆 Grand Master", 12400),
+    (14, "🎭 Sage Emperor", 16400),
+    (15, "🌌 Cosmic Scholar", 21400),
+    (16, "⭐ Stellar Genius", 28900),
+    (17, "🎇 Quantum Mind", 38900),
+    (18, "🌠 Universal Sage", 53900),
+    (19, "💫 Omniscient Being", 73900),
+    (20, "🌈 Transcendent Master", 103900),
+]
+
+
+@dataclass(frozen=True)
+class LevelInfo:
+    """Immutable, precomputed description of a single level"""
+    level: int
+    title: str
+    xp_required: int
+    xp_to_next: int
+    is_max: bool
+
+    def __getitem__(self, key):
+        # Allow dict-style access so callers can use level["level"] like before
+        return getattr(self, key)
+
+
+class LevelTable:
+    """Precomputed level curve with bisect lookup.
+
+    The curve is a list of levels sorted by xp_required. Once the last level
+    is reached, every `prestige_xp` extra XP counts as one prestige rank
+    (prestige_xp=0 disables prestige).
+    """
+
+    def __init__(self, curve: List[Dict], prestige_xp: int = 0):
+        if not curve:
+            raise ValueError("Level curve must contain at least one level")
+
+        curve = sorted(curve, key=lambda entry: entry["xp_required"])
+        thresholds = [int(entry["xp_required"]) for entry in curve]
+        if thresholds[0] != 0:
+            raise ValueError("The first level must start at 0 XP")
+        if any(b <= a for a, b in zip(thresholds, thresholds[1:])):
+            raise ValueError("Level xp_required values must be strictly increasing")
+        if prestige_xp < 0:
+            raise ValueError("prestige_xp must be >= 0")
+
+        self.thresholds = thresholds
+        self.prestige_xp = int(prestige_xp)
+        self.levels: List[LevelInfo] = []
+        for i, entry in enumerate(curve):
+            is_max = i == len(curve) - 1
+            self.levels.append(LevelInfo(
+                level=int(entry["level"]),
+                title=entry["title"],
+                xp_required=thresholds[i],
+                xp_to_next=0 if is_max else thresholds[i + 1] - thresholds[i],
+                is_max=is_max
+            ))
+        self.max_level = self.levels[-1]
+
+    @classmethod
+    def default(cls) -> "LevelTable":
+        return cls([
+            {"level": level, "title": title, "xp_required": xp_required}
+            for level, title, xp_required in DEFAULT_LEVEL_CURVE
+        ])
+
+    @classmethod
+    def from_file(cls, path: str) -> "LevelTable":
+        """Load a curve from JSON: {"levels": [...], "prestige_xp": 50000}"""
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            return cls(data)
+        return cls(data["levels"], data.get("prestige_xp", 0))
+
+    @classmethod
+    def from_env(cls, env_var: str = "QUIZ_LEVEL_CURVE") -> "LevelTable":
+        path = os.getenv(env_var)
+        if path and os.path.exists(path):
+            return cls.from_file(path)
+        return cls.default()
+
+    def as_level_data(self) -> List[Dict]:
+        """Legacy list-of-dicts view of the curve"""
+        return [
+            {"level": l.level, "title": l.title, "xp_required": l.xp_required, "xp_to_next": l.xp_to_next}
+            for l in self.levels
+        ]
+
+    def get_level(self, xp: int) -> LevelInfo:
+        """Return the cached LevelInfo for an XP total in O(log n)"""
+        index = bisect_right(self.thresholds, xp) - 1
+        return self.levels[index if index > 0 else 0]
+
+    def get_prestige(self, xp: int) -> int:
+        if not self.prestige_xp or xp < self.max_level.xp_required:
+            return 0
+        return (xp - self.max_level.xp_required) // self.prestige_xp
+
+    def get_level_info(self, xp: int) -> Dict:
+        """Return the level info dict (with progress) used by the API responses"""
+        info = self.get_level(xp)
+
+        if info.is_max:
+            result = {
+                "level": info.level,
+                "title": info.title,
+                "xp_to_next": 0,
+                "progress": 100.0,
+                "is_max": True
+            }
+            if self.prestige_xp:
+                into_prestige = (xp - info.xp_required) % self.prestige_xp
+                result["prestige"] = self.get_prestige(xp)
+                result["xp_to_next"] = self.prestige_xp - into_prestige
+                result["progress"] = (into_prestige / self.prestige_xp) * 100
+            return result
+
+        progress = ((xp - info.xp_required) / info.xp_to_next) * 100
+        return {
+            "level": info.level,
+            "title": info.title,
+            "xp_to_next": info.xp_required + info.xp_to_next - xp,
+            "progress": max(0, progress),
+            "is_max": False
+        }
@@ -0,0 +1,172 @@
+import io
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple, Union
+
+from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+
+from flask_app.python_agents.ingestion import pool_context
+
+# Longest side after downscaling; ~300 dpi for a letter page, plenty for tesseract
+MAX_SIDE = 2400
+# Images taller than this are OCRed as overlapping horizontal bands in parallel
+TILE_HEIGHT = 1200
+TILE_OVERLAP = 80
+
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+# Images waiting for a worker before new requests are turned away
+MAX_PENDING = 16
+
+
+class OCRBusyError(Exception):
+    """Raised when the OCR queue is full; callers should retry later"""
+
+
+@dataclass
+class OCRResult:
+    text: str
+    tiles: int
+    original_size: Tuple[int, int]
+    processed_size: Tuple[int, int]
+    timings: dict = field(default_factory=dict)
+
+
+def preprocess(image: Image.Image, max_side: int = MAX_SIDE) -> Image.Image:
+    """Grayscale, downscale, denoise and binarize an image for tesseract"""
+    image = ImageOps.exif_transpose(image)
+    image = image.convert("L")
+
+    scale = max_side / max(image.size)
+    if scale < 1:
+        image = image.resize((int(image.width * scale), int(image.height * scale)), Image.LANCZOS)
+
+    image = ImageOps.autocontrast(image, cutoff=1)
+    image = ImageEnhance.Sharpness(image).enhance(1.5)
+    image = image.filter(ImageFilter.MedianFilter(3))
+
+    # Global threshold at the mean brightness; works for paper and whiteboards
+    histogram = image.histogram()
+    pixels = sum(histogram) or 1
+    threshold = sum(value * count for value, count in enumerate(histogram)) / pixels
+    return image.point(lambda value: 255 if value > threshold * 0.9 else 0, mode="1")
+
+
+def tile_boxes(width: int, height: int, tile_height: int = TILE_HEIGHT,
+               overlap: int = TILE_OVERLAP) -> List[Tuple[int, int, int, int]]:
+    """Full-width horizontal bands, so lines of text are never cut sideways"""
+    if height <= tile_height:
+        return [(0, 0, width, height)]
+    boxes = []
+    top = 0
+    while top < height:
+        bottom = min(top + tile_height, height)
+        boxes.append((0, top, width, bottom))
+        if bottom == height:
+            break
+        top = bottom - overlap
+    return boxes
+
+
+def prepare_image(image: Union[bytes, str]) -> Tuple[List[bytes], Tuple[int, int], Tuple[int, int]]:
+    """Worker: preprocess an image (raw bytes or a path) and split it into tiles, returned as PNG bytes"""
+    image = Image.open(io.BytesIO(image) if isinstance(image, bytes) else image)
+    original_size = image.size
+    processed = preprocess(image)
+
+    tiles = []
+    for box in tile_boxes(*processed.size):
+        buffer = io.BytesIO()
+        processed.crop(box).save(buffer, format="PNG")
+        tiles.append(buffer.getvalue())
+    return tiles, original_size, processed.size
+
+
+def ocr_tile(tile_data: bytes) -> str:
+    """Worker: run tesseract on one preprocessed tile"""
+    import pytesseract
+
+    try:
+        return pytesseract.image_to_string(Image.open(io.BytesIO(tile_data)))
+    except Exception as e:
+        # pytesseract errors can't be unpickled in the parent, which would
+        # break the whole pool; send back a plain exception instead
+        raise RuntimeError(f"OCR failed: {e}") from None
+
+
+def merge_tile_text(texts: List[str]) -> str:
+    """Join band texts, dropping lines repeated across the band overlap"""
+    merged: List[str] = []
+    for text in texts:
+        lines = [line for line in text.splitlines() if line.strip()]
+        tail = [line.strip() for line in merged[-3:]]
+        while lines and lines[0].strip() in tail:
+            lines.pop(0)
+        merged.extend(lines)
+    return "\n".join(merged)
+
+
+class OCRService:
+    """OCR off the event loop on a bounded process pool.
+
+    The pool caps how many images are worked on at once. Beyond max_workers
+    images in progress, at most max_pending more may queue; past that,
+    requests fail fast with OCRBusyError instead of piling up behind slow
+    images.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_pending: int = MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=pool_context())
+        # Shared across threads: Flask runs each request in its own event loop
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.stats = {"images": 0, "tiles": 0, "rejected": 0, "seconds": 0.0}
+
+    async def image_to_text(self, image: Union[bytes, str]) -> OCRResult:
+        with self.lock:
+            if self.in_flight >= self.max_workers + self.max_pending:
+                self.stats["rejected"] += 1
+                raise OCRBusyError("OCR queue is full, please try again shortly")
+            self.in_flight += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            tiles, original_size, processed_size = await loop.run_in_executor(
+                self.pool, prepare_image, image)
+            prepared = time.perf_counter()
+            texts = await asyncio.gather(
+                *(loop.run_in_executor(self.pool, ocr_tile, tile) for tile in tiles))
+            finished = time.perf_counter()
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+        with self.lock:
+            self.stats["images"] += 1
+            self.stats["tiles"] += len(tiles)
+            self.stats["seconds"] += finished - start
+        return OCRResult(
+            text=merge_tile_text(texts),
+            tiles=len(tiles),
+            original_size=original_size,
+            processed_size=processed_size,
+            timings={"preprocess": round(prepared - start, 4), "ocr": round(finished - prepared, 4)}
+        )
+
+
+_service: Optional[OCRService] = None
+_service_lock = threading.Lock()
+
+
+def get_ocr_service() -> OCRService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = OCRService()
+        return _service
@@ -0,0 +1,144 @@
+import re
+import json
+import random
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# JSON schema sent to the model so it returns a single question object
+QUESTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "question": {"type": "string"},
+        "options": {"type": "array", "items": {"type": "string"}},
+        "correct_answer": {"type": "string"},
+        "accepted_answers": {"type": "array", "items": {"type": "string"}},
+        "explanation": {"type": "string"},
+        "fun_fact": {"type": "string"},
+        "topic": {"type": "string"},
+        "difficulty": {"type": "string"},
+        "format_type": {"type": "string"},
+    },
+    "required": ["question", "correct_answer", "explanation"],
+}
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def repair_json(text: str) -> str:
+    """Best-effort fix-up of a truncated or sloppy JSON object.
+
+    Drops code fences and anything around the first object, removes trailing
+    commas, closes an unterminated string and balances brackets. Text inside
+    strings is never touched.
+    """
+    text = _FENCE.sub("", text.strip())
+    start = text.find("{")
+    if start == -1:
+        return text
+    text = text[start:]
+
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char in "}]":
+            # Trailing comma before a closer
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if not stack or stack[-1] != char:
+                continue  # stray closer
+            stack.pop()
+            out.append(char)
+            if not stack:
+                break  # end of the first object; ignore trailing text
+            continue
+        out.append(char)
+
+    if in_string:
+        out.append('"')
+    while out and (out[-1].isspace() or out[-1] in ",:"):
+        out.pop()
+    out.extend(reversed(stack))
+    return "".join(out)
+
+
+def parse_question(text: str, format_type: str) -> Tuple[Dict, bool]:
+    """Parse and validate a generated question; returns (data, needed_repair).
+
+    Raises ValueError if the output can't be used even after repair.
+    """
+    repaired = False
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        repaired = True
+        try:
+            data = json.loads(repair_json(text))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Unparseable output: {e}") from None
+
+    if not isinstance(data, dict):
+        raise ValueError("Output is not a JSON object")
+    for key in ("question", "correct_answer"):
+        if not isinstance(data.get(key), str) or not data[key].strip():
+            raise ValueError(f"Missing '{key}'")
+    if format_type == "multiple_choice":
+        options = data.get("options")
+        if not isinstance(options, list) or len(options) < 2:
+            raise ValueError("Multiple choice question without options")
+    return data, repaired
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 4.0) -> float:
+    """Full-jitter exponential backoff for the given (0-based) retry"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class GenerationMetrics:
+    """Attempts per generated question and why attempts failed"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.attempts = Counter()
+        self.outcomes = Counter()
+        self.failures = Counter()
+
+    def failure(self, reason: str):
+        with self.lock:
+            self.failures[reason] += 1
+
+    def record(self, attempts: int, outcome: str):
+        with self.lock:
+            self.attempts[attempts] += 1
+            self.outcomes[outcome] += 1
+
+    def summary(self) -> Dict:
+        with self.lock:
+            questions = sum(self.attempts.values())
+            total_attempts = sum(attempts * count for attempts, count in self.attempts.items())
+            return {
+                "questions": questions,
+                "mean_attempts": round(total_attempts / questions, 3) if questions else 0.0,
+                "attempts_histogram": {str(attempts): count for attempts, count in sorted(self.attempts.items())},
+                "outcomes": dict(self.outcomes),
+                "failures": dict(self.failures),
+            }
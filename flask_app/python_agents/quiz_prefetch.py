@@ -0,0 +1,161 @@
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+QuizKey = Tuple[str, str, str, int]  # (topic, difficulty, format_type, num_questions)
+
+
+class _Prefetch:
+    __slots__ = ("key", "future", "created_at")
+
+    def __init__(self, key: QuizKey, future: Future):
+        self.key = key
+        self.future = future
+        self.created_at = time.time()
+
+
+class QuizPrefetcher:
+    """Speculatively builds a user's next quiz while they look at their results.
+
+    At most one prefetched quiz is held per user, for `ttl` seconds. It is
+    served only if the next request asks for exactly the same topic,
+    difficulty, format and length. Anything else discards it. Each user may
+    trigger at most `max_per_hour` prefetches. Discarded quizzes are counted
+    as wasted questions (roughly one LLM call each).
+    """
+
+    def __init__(self, enabled: bool = True, ttl: float = 300.0, max_per_hour: int = 6, max_workers: int = 2):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_per_hour = max_per_hour
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quiz-prefetch")
+        self.entries: Dict[str, _Prefetch] = {}
+        self.recent: Dict[str, Deque[float]] = {}
+        # Reentrant: done-callbacks of finished futures run while it is held
+        self.lock = threading.RLock()
+        self.stats = {
+            "scheduled": 0,
+            "requests": 0,
+            "over_budget": 0,
+            "hits": 0,
+            "hits_still_running": 0,
+            "misses": 0,
+            "invalidated": 0,
+            "replaced": 0,
+            "expired": 0,
+            "failed": 0,
+            "questions_generated": 0,
+            "questions_wasted": 0,
+        }
+
+    def schedule(self, username: str, key: QuizKey, build: Callable[[], Dict]) -> bool:
+        """Start building the quiz for `key` in the background, within the user's budget"""
+        if not self.enabled:
+            return False
+
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(username)
+            if entry is not None and entry.key == key and now - entry.created_at < self.ttl:
+                return False
+
+            recent = self.recent.setdefault(username, deque())
+            while recent and now - recent[0] > 3600:
+                recent.popleft()
+            if len(recent) >= self.max_per_hour:
+                self.stats["over_budget"] += 1
+                return False
+            recent.append(now)
+
+            if entry is not None:
+                self._discard(self.entries.pop(username), "replaced")
+            future = self.executor.submit(build)
+            future.add_done_callback(self._count_generated)
+            self.entries[username] = _Prefetch(key, future)
+            self.stats["scheduled"] += 1
+            return True
+
+    def _count_generated(self, future: Future):
+        quiz = self._result(future)
+        if quiz:
+            with self.lock:
+                self.stats["questions_generated"] += quiz.get("num_questions", 0)
+
+    @staticmethod
+    def _result(future: Future) -> Optional[Dict]:
+        if future.cancelled() or future.exception() is not None:
+            return None
+        quiz = future.result()
+        return quiz if quiz.get("success") else None
+
+    def _discard(self, entry: _Prefetch, reason: str):
+        # Caller holds the lock
+        self.stats[reason] += 1
+        if entry.future.cancel():
+            return
+
+        def count_waste(future: Future):
+            quiz = self._result(future)
+            if quiz:
+                with self.lock:
+                    self.stats["questions_wasted"] += quiz.get("num_questions", 0)
+
+        entry.future.add_done_callback(count_waste)
+
+    async def take(self, username: str, key: QuizKey) -> Optional[Dict]:
+        """The prefetched quiz for exactly this request, waiting for it if it's still being built"""
+        if not self.enabled:
+            return None
+
+        with self.lock:
+            self.stats["requests"] += 1
+            entry = self.entries.pop(username, None)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if time.time() - entry.created_at >= self.ttl:
+                self._discard(entry, "expired")
+                return None
+            if entry.key != key:
+                self._discard(entry, "invalidated")
+                return None
+            still_running = not entry.future.done()
+
+        try:
+            quiz = await asyncio.wrap_future(entry.future)
+        except Exception:
+            quiz = None
+        with self.lock:
+            if not quiz or not quiz.get("success"):
+                self.stats["failed"] += 1
+                return None
+            self.stats["hits"] += 1
+            if still_running:
+                self.stats["hits_still_running"] += 1
+        return quiz
+
+    def invalidate(self, username: str):
+        with self.lock:
+            entry = self.entries.pop(username, None)
+            if entry is not None:
+                self._discard(entry, "invalidated")
+
+    def summary(self) -> Dict:
+        with self.lock:
+            now = time.time()
+            for username in [username for username, entry in self.entries.items()
+                             if now - entry.created_at >= self.ttl]:
+                self._discard(self.entries.pop(username), "expired")
+
+            requests = self.stats["requests"]
+            generated = self.stats["questions_generated"]
+            return {
+                **self.stats,
+                "enabled": self.enabled,
+                "held": len(self.entries),
+                "hit_rate": round(self.stats["hits"] / requests, 3) if requests else 0.0,
+                "waste_rate": round(self.stats["questions_wasted"] / generated, 3) if generated else 0.0,
+            }
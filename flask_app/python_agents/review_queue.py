@@ -0,0 +1,119 @@
+import heapq
+import time
+from typing import Dict, List, Optional
+
+DAY_SECONDS = 24 * 60 * 60
+
+# Question fields kept for a review item, so it can be re-served without the LLM
+REVIEW_FIELDS = (
+    "question", "options", "correct_answer", "accepted_answers", "explanation",
+    "fun_fact", "topic", "difficulty", "format_type", "question_hash", "unique_id"
+)
+
+
+class ReviewQueue:
+    """SM-2 spaced-repetition scheduler over a user's missed questions.
+
+    Items live in a plain dict (profile.review_items) keyed by question hash,
+    so they're saved with the profile. The heap of (due, hash) entries is an
+    index rebuilt on load; updates push a new entry and stale ones are skipped
+    lazily, keeping due lookups O(log n).
+    """
+
+    def __init__(self, items: Dict[str, Dict], max_items: int = 500, relearn_seconds: int = 10 * 60):
+        self.items = items
+        self.max_items = max_items
+        self.relearn_seconds = relearn_seconds
+        self.heap = [(item["due"], question_hash) for question_hash, item in items.items()]
+        heapq.heapify(self.heap)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _push(self, question_hash: str):
+        heapq.heappush(self.heap, (self.items[question_hash]["due"], question_hash))
+        if len(self.heap) > 2 * len(self.items) + 16:
+            self.heap = [(item["due"], h) for h, item in self.items.items()]
+            heapq.heapify(self.heap)
+
+    def _is_current(self, due: float, question_hash: str) -> bool:
+        item = self.items.get(question_hash)
+        return item is not None and item["due"] == due
+
+    def record(self, q_data: Dict, correct: bool, response_time: float = 5.0,
+               now: Optional[float] = None) -> Optional[Dict]:
+        """Schedule a question after it was answered.
+
+        Missed questions enter the queue; questions already in the queue are
+        rescheduled with SM-2. Correct answers to new questions are ignored.
+        """
+        question_hash = q_data.get("question_hash")
+        if not question_hash or question_hash == "fallback":
+            return None
+
+        now = now if now is not None else time.time()
+        item = self.items.get(question_hash)
+        if item is None:
+            if correct:
+                return None
+            if len(self.items) >= self.max_items:
+                self._evict()
+            item = {
+                "q": {key: q_data.get(key) for key in REVIEW_FIELDS},
+                "ease": 2.5,
+                "interval": 0,
+                "reps": 0,
+                "lapses": 0
+            }
+            self.items[question_hash] = item
+
+        quality = (5 if response_time <= 5 else 4) if correct else 1
+        if quality < 3:
+            item["reps"] = 0
+            item["interval"] = 0
+            item["lapses"] += 1
+            item["due"] = now + self.relearn_seconds
+        else:
+            item["reps"] += 1
+            if item["reps"] == 1:
+                item["interval"] = 1
+            elif item["reps"] == 2:
+                item["interval"] = 6
+            else:
+                item["interval"] = round(item["interval"] * item["ease"])
+            item["due"] = now + item["interval"] * DAY_SECONDS
+        item["ease"] = round(max(1.3, item["ease"] + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)), 2)
+
+        self._push(question_hash)
+        return item
+
+    def _evict(self):
+        """Drop the best-learned item (longest interval) to stay within max_items"""
+        question_hash = max(self.items, key=lambda h: (self.items[h]["interval"], -self.items[h]["lapses"]))
+        del self.items[question_hash]
+
+    def due(self, limit: int, now: Optional[float] = None, topic: Optional[str] = None) -> List[Dict]:
+        """Return up to `limit` due questions, most overdue first"""
+        now = now if now is not None else time.time()
+        found = []
+        popped = []
+
+        while self.heap and self.heap[0][0] <= now and len(found) < limit:
+            due, question_hash = heapq.heappop(self.heap)
+            if not self._is_current(due, question_hash):
+                continue
+            popped.append((due, question_hash))
+            question = self.items[question_hash]["q"]
+            if topic and (question.get("topic") or "").lower() != topic.lower():
+                continue
+            found.append(dict(question))
+
+        for entry in popped:
+            heapq.heappush(self.heap, entry)
+        return found
+
+    def next_due(self) -> Optional[float]:
+        """Timestamp of the next due review, skipping stale heap entries"""
+        while self.heap and not self._is_current(*self.heap[0]):
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
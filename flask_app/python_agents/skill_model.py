@@ -0,0 +1,94 @@
+import math
+from typing import Dict, List, Sequence, Tuple
+
+# Rating a question of each difficulty is assumed to have
+DIFFICULTY_RATINGS = {"easy": 800, "medium": 1000, "hard": 1200, "expert": 1400}
+INITIAL_RATING = 1000.0
+
+# Aim for questions the learner gets right about 70% of the time
+TARGET_SUCCESS = 0.7
+
+
+def normalize_topic(topic: str) -> str:
+    """Skill key for a topic: "World  History" and "world history" share a rating"""
+    return " ".join((topic or "").split()).casefold()
+
+
+class TopicSkillModel:
+    """Elo-style skill estimate per (user, topic).
+
+    Each profile keeps topic_skill = {topic: [rating, answers]}, two numbers
+    per topic, and every answer is an O(1) update. Early answers move the
+    rating more (higher K) so new topics settle quickly.
+    """
+
+    def __init__(self, k_max: float = 48.0, k_min: float = 16.0, settle_after: int = 30,
+                 min_answers: int = 5):
+        self.k_max = k_max
+        self.k_min = k_min
+        self.settle_after = settle_after
+        self.min_answers = min_answers
+
+    @staticmethod
+    def expected(rating: float, question_rating: float) -> float:
+        return 1.0 / (1.0 + 10 ** ((question_rating - rating) / 400.0))
+
+    def get(self, skills: Dict[str, List], topic: str) -> Tuple[float, int]:
+        rating, answers = skills.get(normalize_topic(topic), (INITIAL_RATING, 0))
+        return float(rating), int(answers)
+
+    def update(self, skills: Dict[str, List], topic: str, difficulty: str, correct: bool) -> float:
+        rating, answers = self.get(skills, topic)
+        question_rating = DIFFICULTY_RATINGS.get(difficulty, DIFFICULTY_RATINGS["medium"])
+
+        progress = min(answers / self.settle_after, 1.0)
+        k = self.k_max - (self.k_max - self.k_min) * progress
+        rating += k * ((1.0 if correct else 0.0) - self.expected(rating, question_rating))
+
+        skills[normalize_topic(topic)] = [round(rating, 1), answers + 1]
+        return rating
+
+    def recommend_difficulty(self, skills: Dict[str, List], topic: str) -> str:
+        """Difficulty whose expected success rate is closest to the target"""
+        rating, answers = self.get(skills, topic)
+        if answers < self.min_answers:
+            return "medium"
+        return min(
+            DIFFICULTY_RATINGS,
+            key=lambda difficulty: abs(self.expected(rating, DIFFICULTY_RATINGS[difficulty]) - TARGET_SUCCESS)
+        )
+
+    def target_rating(self, skills: Dict[str, List], topic: str) -> float:
+        """Question rating the learner should answer correctly TARGET_SUCCESS of the time"""
+        rating, _ = self.get(skills, topic)
+        # Solve expected(rating, q) == TARGET_SUCCESS for q
+        return rating - 400.0 * math.log10(TARGET_SUCCESS / (1 - TARGET_SUCCESS))
+
+    def pick_near_level(self, skills: Dict[str, List], candidates: Sequence[Dict], count: int) -> List[Dict]:
+        """Pick the bank questions whose difficulty is closest to the learner's level in their topic.
+
+        The sort is stable, so candidates equally near keep their order.
+        """
+        targets = {}
+
+        def distance(q: Dict) -> float:
+            topic = q.get("topic") or ""
+            if topic not in targets:
+                targets[topic] = self.target_rating(skills, topic)
+            return abs(DIFFICULTY_RATINGS.get(q.get("difficulty"), DIFFICULTY_RATINGS["medium"]) - targets[topic])
+
+        return sorted(candidates, key=distance)[:count]
+
+    def describe(self, skills: Dict[str, List], topic: str) -> str:
+        rating, answers = self.get(skills, topic)
+        if answers == 0:
+            return "new topic, no answers yet"
+        if rating < 900:
+            band = "struggling"
+        elif rating < 1100:
+            band = "developing"
+        elif rating < 1300:
+            band = "confident"
+        else:
+            band = "advanced"
+        return f"skill rating {rating:.0f} ({band}) after {answers} answers"
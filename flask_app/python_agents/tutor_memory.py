@@ -0,0 +1,131 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+
+# Shared by all users; summarization is rare and never on the request path
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tutor-summary")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token for English)"""
+    return max(1, len(text) // 4)
+
+
+class TokenBudgetMemory:
+    """Conversation memory that never blocks a chat turn on an LLM call.
+
+    Recent turns are kept verbatim in a token-counted ring buffer. When the
+    buffer goes over max_tokens the oldest turns are evicted and folded into
+    a running summary by a background worker. Until that finishes, the
+    evicted turns are simply left out of the prompt.
+    """
+
+    def __init__(self, summarize: Optional[Callable[[str, str], str]] = None, max_tokens: int = 2000):
+        self.summarize = summarize
+        self.max_tokens = max_tokens
+        self.turns = deque()
+        self.buffer_tokens = 0
+        self.summary = ""
+        self.pending: List[str] = []
+        self.summarizing = False
+        self.lock = threading.Lock()
+        self.stats = {"turns": 0, "evicted": 0, "summaries": 0, "summary_errors": 0}
+
+    def save_context(self, inputs: Dict[str, str], outputs: Dict[str, str]):
+        user_text = inputs.get("input", "")
+        ai_text = outputs.get("output", "")
+        tokens = estimate_tokens(user_text) + estimate_tokens(ai_text)
+
+        with self.lock:
+            self.turns.append((user_text, ai_text, tokens))
+            self.buffer_tokens += tokens
+            self.stats["turns"] += 1
+
+            # Always keep the latest turn, even if it alone is over budget
+            while self.buffer_tokens > self.max_tokens and len(self.turns) > 1:
+                old_user, old_ai, old_tokens = self.turns.popleft()
+                self.buffer_tokens -= old_tokens
+                self.pending.append(f"Student: {old_user}\nTutor: {old_ai}")
+                self.stats["evicted"] += 1
+
+            self._schedule_summary()
+
+    def _schedule_summary(self):
+        # Caller holds the lock
+        if self.summarize is None or self.summarizing or not self.pending:
+            return
+        self.summarizing = True
+        evicted, self.pending = self.pending, []
+        _summary_executor.submit(self._fold_into_summary, self.summary, evicted)
+
+    def _fold_into_summary(self, previous_summary: str, evicted: List[str]):
+        try:
+            new_summary = self.summarize(previous_summary, "\n\n".join(evicted))
+        except Exception:
+            new_summary = None
+
+        with self.lock:
+            if new_summary:
+                self.summary = new_summary
+                self.stats["summaries"] += 1
+            else:
+                # Put the turns back so the next attempt includes them
+                self.pending[:0] = evicted
+                self.stats["summary_errors"] += 1
+            self.summarizing = False
+            if new_summary:
+                self._schedule_summary()
+
+    @property
+    def messages(self) -> list:
+        """Summary (if any) followed by the buffered turns, ready for the prompt"""
+        with self.lock:
+            messages = []
+            if self.summary:
+                messages.append(SystemMessage(content=f"Summary of the earlier conversation: {self.summary}"))
+            for user_text, ai_text, _ in self.turns:
+                messages.append(HumanMessage(content=user_text))
+                messages.append(AIMessage(content=ai_text))
+            return messages
+
+    def clear(self):
+        with self.lock:
+            self.turns.clear()
+            self.buffer_tokens = 0
+            self.summary = ""
+            self.pending = []
+
+
+_memories: Dict[str, TokenBudgetMemory] = {}
+_memories_lock = threading.Lock()
+
+
+def get_user_memory(user_id: str, summarize: Optional[Callable[[str, str], str]] = None,
+                    max_tokens: int = 2000) -> TokenBudgetMemory:
+    """Per-user memory, kept across requests so summaries are only computed once"""
+    with _memories_lock:
+        memory = _memories.get(user_id)
+        if memory is None:
+            memory = TokenBudgetMemory(summarize, max_tokens)
+            _memories[user_id] = memory
+        elif memory.summarize is None:
+            memory.summarize = summarize
+        return memory
+
+
+def llm_summarizer(llm, config: Optional[Dict] = None) -> Callable[[str, str], str]:
+    """Build a summarize(previous_summary, new_turns) function for a chat model (invoked with `config`)"""
+    def summarize(previous_summary: str, new_turns: str) -> str:
+        prompt = (
+            "Progressively summarize this tutoring conversation, keeping the topics covered, "
+            "what the student struggled with and any preferences they stated.\n\n"
+            f"Current summary:\n{previous_summary or '(none)'}\n\n"
+            f"New lines of conversation:\n{new_turns}\n\n"
+            "New summary:"
+        )
+        result = llm.invoke(prompt, config)
+        return result.content if hasattr(result, "content") else str(result)
+    return summarize
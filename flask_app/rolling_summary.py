@@ -0,0 +1,139 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rolling-summary")
+
+FOLD_PROMPT = (
+    "You are keeping a running summary of a student's tutoring session.\n"
+    "Current summary:\n{summary}\n\n"
+    "New exchanges:\n{exchanges}\n\n"
+    "Rewrite the summary so it also covers the new exchanges. Combine similar points, "
+    "keep the key ideas and what the student struggled with, and use at most 5 sentences."
+)
+
+MERGE_PROMPT = (
+    "Merge these two summaries of one tutoring session into a single concise, coherent "
+    "summary of at most 5 sentences.\n\n"
+    "Earlier part of the session:\n{earlier}\n\n"
+    "Later part of the session:\n{later}"
+)
+
+
+def _text(result) -> str:
+    return result.content if hasattr(result, "content") else str(result)
+
+
+class RollingSummarizer:
+    """Keeps a session summary up to date in the background as the chat goes on.
+
+    Each new exchange is folded into the current segment summary by a worker
+    thread; exchanges that arrive while it's busy are folded together in one
+    call. Every `segment_size` exchanges the segment is merged into the
+    session summary, so prompts stay small however long the session runs.
+    Reading the summary never calls the LLM.
+    """
+
+    def __init__(self, llm, segment_size: int = 8, config: Optional[Dict] = None):
+        self.llm = llm
+        self.segment_size = segment_size
+        self.config = config
+        self.session_summary = ""
+        self.segment_summary = ""
+        self.segment_exchanges = 0
+        self.pending: List[Tuple[str, str]] = []
+        self.running = False
+        self.condition = threading.Condition()
+        self.stats = {"exchanges": 0, "llm_calls": 0, "errors": 0, "merge_errors": 0}
+
+    def add(self, question: str, answer: str):
+        with self.condition:
+            self.pending.append((question, str(answer)))
+            self.stats["exchanges"] += 1
+            if not self.running:
+                self.running = True
+                _executor.submit(self._work)
+
+    def _invoke(self, prompt: str) -> str:
+        with self.condition:
+            self.stats["llm_calls"] += 1
+        return _text(self.llm.invoke(prompt, self.config)).strip()
+
+    def _work(self):
+        while True:
+            with self.condition:
+                if not self.pending:
+                    self.running = False
+                    self.condition.notify_all()
+                    return
+                batch, self.pending = self.pending, []
+                segment_summary = self.segment_summary
+
+            exchanges = "\n\n".join(f"Student: {q}\nTutor: {a}" for q, a in batch)
+            try:
+                segment_summary = self._invoke(FOLD_PROMPT.format(
+                    summary=segment_summary or "(empty)", exchanges=exchanges))
+            except Exception as e:
+                print(f"[WARNING] Could not fold {len(batch)} exchanges into the session summary: {e}")
+                with self.condition:
+                    self.stats["errors"] += 1
+                    self.pending[:0] = batch
+                    self.running = False
+                    self.condition.notify_all()
+                return
+
+            with self.condition:
+                self.segment_summary = segment_summary
+                self.segment_exchanges += len(batch)
+                close_segment = self.segment_exchanges >= self.segment_size
+                session_summary = self.session_summary
+
+            if close_segment:
+                try:
+                    merged = (self._invoke(MERGE_PROMPT.format(earlier=session_summary, later=segment_summary))
+                              if session_summary else segment_summary)
+                except Exception as e:
+                    # The segment stays open and the merge is retried after the next fold
+                    print(f"[WARNING] Could not merge the segment into the session summary: {e}")
+                    with self.condition:
+                        self.stats["errors"] += 1
+                        self.stats["merge_errors"] += 1
+                    continue
+                with self.condition:
+                    self.session_summary = merged
+                    self.segment_summary = ""
+                    self.segment_exchanges = 0
+
+    def summary(self, wait: float = 0.0) -> str:
+        """Current summary; optionally wait up to `wait` seconds for pending folds"""
+        with self.condition:
+            if wait:
+                self.condition.wait_for(lambda: not self.running, wait)
+            parts = [part for part in (self.session_summary, self.segment_summary) if part]
+            return "\n\n".join(parts)
+
+
+_session_summaries: Dict[str, RollingSummarizer] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session_summarizer(user: str, llm) -> RollingSummarizer:
+    from flask_app.usage import usage_metadata
+
+    with _sessions_lock:
+        summarizer = _session_summaries.get(user)
+        if summarizer is None:
+            summarizer = RollingSummarizer(llm, config=usage_metadata(user, "agent2", "session_summary"))
+            _session_summaries[user] = summarizer
+        return summarizer
+
+
+def end_session(user: str) -> Optional[RollingSummarizer]:
+    with _sessions_lock:
+        return _session_summaries.pop(user, None)
+
+
+def clear_sessions():
+    with _sessions_lock:
+        _session_summaries.clear()
+
@@ -1,26 +1,118 @@
+import os
 import asyncio
 import json
+import threading
 from firebase_admin import firestore
 
-from flask import Flask, jsonify, request
+from flask import Flask, g, jsonify, request
 
-from flask_app.database import add
-from flask_app.summary import summarizer
+from flask_app.database import add, add_many
+from flask_app.snapshot_tracker import SnapshotTracker
+from flask_app.job_queue import JobQueue
+from flask_app.tracing import get_tracer, current_span, parse_traceparent
+from flask_app.usage import get_usage_ledger, QuotaExceededError, WINDOWS
+from flask_app.summary import summarizer, llm as summary_llm
+from flask_app.rolling_summary import get_session_summarizer, end_session, clear_sessions
+from flask_app.uploads import (
+    SpooledRequest, UploadJobs, sniff_file_type, stream_size, save_upload, use_fast_lane, MAX_UPLOAD_BYTES, PDF
+)
 
 from flask_app.python_agents.Agent1 import main as agent1_main
-from flask_app.python_agents.Agent2 import start_conversation
+from flask_app.python_agents.Agent2 import start_conversation, process_upload
+from flask_app.python_agents.ingestion import pdf_page_count, parse_page_range
+from flask_app.python_agents.extraction_cache import get_extraction_cache
 from flask_app.python_agents.Agent3 import EnhancedGamifiedQuizAgent
+from flask_app.python_agents.hedging import get_hedger
 
 
 # Create a SINGLE global agent instance that persists across requests
 quiz_agent = EnhancedGamifiedQuizAgent()
 
+# Skip dashboard snapshot writes when nothing changed since the last one
+dashboard_snapshots = SnapshotTracker(
+    max_staleness=float(os.getenv("DASHBOARD_MAX_STALENESS", "3600")),
+    save_interval=float(os.getenv("DASHBOARD_SNAPSHOT_SAVE_INTERVAL", "30"))
+)
+
 app = Flask(__name__)
+# Stream multipart uploads to spooled temp files and cap their size
+app.request_class = SpooledRequest
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
+
+# Large uploads are processed in the background and polled for progress
+upload_jobs = UploadJobs()
+
+# Long-running agent work (quiz generation, session summaries) runs as jobs;
+# requests wait up to JOB_SYNC_WAIT seconds, then get a job id to poll
+job_queue = JobQueue(
+    path=os.getenv("JOB_DB_PATH", "jobs.sqlite3"),
+    ttl=float(os.getenv("JOB_RESULT_TTL", "3600")),
+    # Retrying won't help until the user's quota window moves on
+    non_retryable=(QuotaExceededError,)
+)
+JOB_SYNC_WAIT = float(os.getenv("JOB_SYNC_WAIT", "20"))
+
+# Most leaderboard entries returned by one request
+MAX_LEADERBOARD_LIMIT = 100
+# Most questions in one review quiz
+MAX_REVIEW_QUESTIONS = 50
 
 response_array = []
 conversation_array = []
 chat_array = []
 
+# Latest generated or review quiz per user, kept for evaluation or saving;
+# written by job worker threads as well as requests
+quiz_sessions = {}
+quiz_sessions_lock = threading.Lock()
+
+
+# Every request runs inside a server span; agent, LLM and write spans nest under it
+tracer = get_tracer()
+
+# Tokens and cost per user, agent, prompt and model; optional per-user quotas
+usage_ledger = get_usage_ledger()
+
+
+@app.before_request
+def start_request_span():
+    rule = request.url_rule.rule if request.url_rule else "<unmatched>"
+    span = tracer.start_span(
+        f"{request.method} {rule}", "server",
+        context=parse_traceparent(request.headers.get("traceparent")),
+        http_method=request.method, http_route=rule
+    )
+    g.trace_span, g.trace_token = span, tracer.activate(span)
+
+
+@app.after_request
+def tag_request_span(response):
+    span = g.get("trace_span")
+    if span is not None:
+        span.set(http_status_code=response.status_code)
+        response.headers["X-Trace-Id"] = span.trace_id
+    return response
+
+
+@app.teardown_request
+def end_request_span(error=None):
+    span = g.pop("trace_span", None)
+    if span is None:
+        return
+    tracer.deactivate(g.pop("trace_token"))
+    if error is None and span.attributes.get("http_status_code", 200) >= 500:
+        error = f"HTTP {span.attributes['http_status_code']}"
+    tracer.end_span(span, error)
+
+
+@app.errorhandler(QuotaExceededError)
+def quota_exceeded(error):
+    response = jsonify({"error": str(error), "quota": usage_ledger.quota_status(error.user)})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(int(error.retry_after) + 1)
+    return response
+
+
 @app.route('/agent1', methods=['POST'])
 def agent_1():
     data = request.get_json(silent=True) or {}
@@ -46,6 +138,7 @@ def agent_1():
         add(2, user, data_to_store, "1")
         return jsonify({"message": "Data stored!"})
 
+    usage_ledger.check(user)
     if asyncio.iscoroutinefunction(agent1_main):
         agent_com = asyncio.run(agent1_main(question, user)) 
     else:
@@ -66,24 +159,92 @@ def agent_2():
     if question.lower() == "quit":
         if not chat_array:
             return jsonify({"error": "No data to store"}), 400
-        summarized_response = summarizer(chat_array)
-        data_to_store = {
-            "id": 1,
-            "agent": "agent-2",
-            "response": summarized_response,
-            "timestamp": firestore.SERVER_TIMESTAMP
-        }
-        add(1, user, data_to_store, "2")
-        return jsonify({"message": "Data stored!"})
+        job_id, _ = job_queue.enqueue(
+            "agent2_quit", {"user": user, "chat": list(chat_array)}, user, idempotency_key(data)
+        )
+        return job_response(job_queue.wait(job_id, JOB_SYNC_WAIT))
     
+    usage_ledger.check(user)
     if asyncio.iscoroutinefunction(start_conversation):
-        agent_2 = asyncio.run(start_conversation(question))
+        agent_2 = asyncio.run(start_conversation(question, user))
     else:
-        agent_2 = start_conversation(question)
+        agent_2 = start_conversation(question, user)
     
     chat_array.append(agent_2)
+    get_session_summarizer(user, summary_llm).add(question, agent_2)
     return jsonify({"response": agent_2})
 
+@app.route('/agent2/upload', methods=['POST'])
+def agent_2_upload():
+    """Ask the tutor about an uploaded image, PDF or Word file (multipart form)"""
+    user = request.form.get('user')
+    question = request.form.get('question', '').strip() or "Please analyze this file."
+    page_range = request.form.get('page_range') or None
+    upload = request.files.get('file')
+
+    if not user:
+        return jsonify({"error": "No user provided"}), 400
+    if upload is None:
+        return jsonify({"error": "No file provided"}), 400
+    usage_ledger.check(user)
+
+    file_type = sniff_file_type(upload.stream)
+    if file_type is None:
+        return jsonify({"error": "Unsupported file type; upload an image, PDF or Word document"}), 415
+
+    size = stream_size(upload.stream)
+    filename = upload.filename or file_type
+    # Extractors and background jobs read the upload from disk, never as one bytes object
+    file_path = save_upload(upload.stream)
+    handed_off = False
+    try:
+        pages = None
+        if file_type == PDF:
+            try:
+                page_count = pdf_page_count(file_path)
+            except Exception as e:
+                return jsonify({"error": f"Could not read PDF: {e}"}), 400
+            try:
+                pages = len(parse_page_range(page_range, page_count))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+        def record(response):
+            chat_array.append(response)
+            get_session_summarizer(user, summary_llm).add(f"{question} [file: {filename}]", response)
+
+        if use_fast_lane(file_type, size, pages):
+            response = asyncio.run(process_upload(question, user, file_path, file_type, filename, page_range))
+            record(response)
+            return jsonify({"response": response, "file_type": file_type})
+
+        def run(progress):
+            try:
+                return asyncio.run(process_upload(question, user, file_path, file_type, filename, page_range, progress))
+            finally:
+                os.remove(file_path)
+
+        job_id = upload_jobs.submit(user, filename, run, on_done=record)
+        handed_off = True
+    finally:
+        if not handed_off:
+            os.remove(file_path)
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "file_type": file_type,
+        "pages": pages,
+        "status_url": f"/agent2/upload/{job_id}"
+    }), 202
+
+@app.route('/agent2/upload/<job_id>', methods=['GET'])
+def agent_2_upload_status(job_id):
+    """Progress of a background upload job, and the tutor's answer once done"""
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job)
+
 @app.route('/agent3', methods=['POST'])
 def agent_3():
     data = request.get_json(silent=True) or {}
@@ -93,6 +254,7 @@ def agent_3():
     answers = data.get('answers')
     
     print(f"[DEBUG] Received request - Action: {action}, User: {user}")
+    current_span().set(action=action)
     
     if not user:
         return jsonify({"error": "No user provided"}), 400
@@ -104,7 +266,7 @@ def agent_3():
             
             # Get profile from the persistent agent
             profile = quiz_agent.get_user_profile(user)
-            dashboard_data = quiz_agent.get_dashboard_data(profile)
+            dashboard_data, body, etag = quiz_agent.get_dashboard_view(profile)
             
             print(f"[DEBUG] Dashboard data: Level {dashboard_data.get('level')}, XP {dashboard_data.get('total_xp')}")
             
@@ -114,10 +276,7 @@ def agent_3():
             except Exception as e:
                 print(f"[WARNING] Firebase dashboard save failed: {e}")
             
-            return jsonify({
-                "success": True,
-                "data": dashboard_data
-            })
+            return cached_json_response(body, etag)
         
         # Handle BADGES action
         elif action == "badges":
@@ -125,13 +284,28 @@ def agent_3():
             
             # Get profile from the persistent agent
             profile = quiz_agent.get_user_profile(user)
-            badges_data = quiz_agent.get_all_badges(profile)
+            badges_data, body, etag = quiz_agent.get_badges_view(profile)
             
             print(f"[DEBUG] Badges: {badges_data.get('earned_count')}/{badges_data.get('total_count')}")
             
+            return cached_json_response(body, etag)
+        
+        # Handle LEADERBOARD action
+        elif action == "leaderboard":
+            board = data.get('board', 'global')
+            try:
+                limit = int(data['limit']) if data.get('limit') is not None else 10
+            except (TypeError, ValueError):
+                return jsonify({"error": "limit must be an integer"}), 400
+            limit = max(1, min(limit, MAX_LEADERBOARD_LIMIT))
+            leaderboard_data = quiz_agent.get_leaderboard(user, board, data.get('topic'), limit)
+            
+            if not leaderboard_data.get("success"):
+                return jsonify(leaderboard_data), 404
+            
             return jsonify({
                 "success": True,
-                "data": badges_data
+                "data": leaderboard_data
             })
         
         # Handle GENERATE_QUIZ action
@@ -139,32 +313,41 @@ def agent_3():
             if not question:
                 return jsonify({"error": "No question/topic provided"}), 400
             
-            print(f"[DEBUG] Generating quiz: {question}")
+            print(f"[DEBUG] Queueing quiz generation: {question}")
+            usage_ledger.check(user)
             
-            # Use the global agent instance
-            quiz_response = asyncio.run(quiz_agent.generate_quiz_questions(user, question))
+            job_id, _ = job_queue.enqueue(
+                "generate_quiz", {"user": user, "question": question}, user, idempotency_key(data)
+            )
+            job = job_queue.wait(job_id, JOB_SYNC_WAIT)
             
-            if not quiz_response.get("success"):
-                print(f"[ERROR] Quiz generation failed: {quiz_response.get('error')}")
-                return jsonify(quiz_response), 400
+            if job and job["status"] == "done" and not job["result"].get("success"):
+                print(f"[ERROR] Quiz generation failed: {job['result'].get('error')}")
+                return jsonify(job["result"]), 429 if job["result"].get("quota_exceeded") else 400
             
-            # Validate and add missing fields
-            for q in quiz_response.get("questions", []):
-                if "correct_answer" not in q:
-                    q["correct_answer"] = "A"
-                if "explanation" not in q:
-                    q["explanation"] = "No explanation provided"
-                if "question_hash" not in q:
-                    q["question_hash"] = ""
-                if "fun_fact" not in q:
-                    q["fun_fact"] = ""
+            return job_response(job, lambda result: {"response": result})
+        
+        # Handle REVIEW action (spaced-repetition quiz served from local data)
+        elif action == "review":
+            print(f"[DEBUG] Building review quiz for user: {user}")
             
-            print(f"[DEBUG] Generated {len(quiz_response.get('questions', []))} questions")
+            try:
+                num_questions = int(data['num_questions']) if data.get('num_questions') is not None else 10
+            except (TypeError, ValueError):
+                return jsonify({"error": "num_questions must be an integer"}), 400
+            num_questions = max(1, min(num_questions, MAX_REVIEW_QUESTIONS))
+            review_response = asyncio.run(
+                quiz_agent.generate_review_quiz(user, num_questions, data.get('topic'))
+            )
             
-            # Store for evaluation (session storage)
-            response_array.append({"response": quiz_response})
+            if not review_response.get("success"):
+                return jsonify(review_response), 404
             
-            return jsonify({"response": quiz_response})
+            # Store for evaluation just like a generated quiz
+            with quiz_sessions_lock:
+                quiz_sessions[user] = {"response": review_response}
+            
+            return jsonify({"response": review_response})
         
         # Handle EVALUATE_SESSION action
         elif action == "evaluate_session":
@@ -173,11 +356,13 @@ def agent_3():
             
             print(f"[DEBUG] Evaluating session for user: {user}")
             
-            if not response_array or "response" not in response_array[-1]:
+            with quiz_sessions_lock:
+                session = quiz_sessions.get(user)
+            if not session:
                 return jsonify({"error": "No quiz session found. Generate quiz first."}), 400
             
             # Extract questions from stored session
-            questions_list = response_array[-1]["response"].get("questions", [])
+            questions_list = session["response"].get("questions", [])
             
             if not questions_list:
                 return jsonify({"error": "No questions found in session"}), 400
@@ -201,30 +386,58 @@ def agent_3():
                 except Exception as e:
                     print(f"[WARNING] Firebase save failed (but local save succeeded): {e}")
             
-            # Clear session after evaluation
-            response_array.clear()
+            # Clear session after evaluation, unless a newer quiz replaced it meanwhile
+            with quiz_sessions_lock:
+                if quiz_sessions.get(user) is session:
+                    del quiz_sessions[user]
             
             return jsonify({"response": final_result})
         
+        # Handle EVALUATE_BATCH action (many students' submissions in one call)
+        elif action == "evaluate_batch":
+            submissions = data.get('submissions')
+            if not submissions or not isinstance(submissions, list):
+                return jsonify({"error": "No submissions provided"}), 400
+            
+            print(f"[DEBUG] Evaluating batch of {len(submissions)} submissions for: {user}")
+            
+            results = asyncio.run(quiz_agent.evaluate_quiz_batch(submissions))
+            
+            try:
+                save_quiz_batch_to_firebase(results)
+            except Exception as e:
+                print(f"[WARNING] Firebase batch save failed (but local save succeeded): {e}")
+            
+            return jsonify({
+                "response": {
+                    "success": True,
+                    "evaluated": sum(1 for r in results if r.get("success")),
+                    "failed": sum(1 for r in results if not r.get("success")),
+                    "results": results
+                }
+            })
+        
         # Handle SAVE/QUIT action
         elif action == "save" or question.lower() == "quit":
-            if not response_array:
+            with quiz_sessions_lock:
+                last_response = quiz_sessions.pop(user, None)
+            if last_response is None:
                 return jsonify({"error": "No data to store"}), 400
             
-            last_response = response_array[-1]
             data_to_store = {
                 "agent": "agent-3",
                 "response": json.dumps(last_response),
                 "timestamp": firestore.SERVER_TIMESTAMP
             }
             add(3, user, data_to_store, "agent-3-saved")
-            response_array.clear()
             
             return jsonify({"message": "Data stored successfully!"})
         
         else:
             return jsonify({"error": f"Unknown action: {action}"}), 400
     
+    except QuotaExceededError:
+        raise
     except Exception as e:
         print(f"[ERROR] Exception in agent3 endpoint: {str(e)}")
         import traceback
@@ -232,24 +445,149 @@ def agent_3():
         return jsonify({"error": f"Internal error: {str(e)}"}), 500
 
 
+def run_generate_quiz_job(payload, progress):
+    """Job handler: generate a quiz with the global agent and keep it for evaluation"""
+    quiz_response = asyncio.run(quiz_agent.generate_quiz_questions(
+        payload["user"], payload["question"],
+        lambda done, total: progress({"done": done, "total": total})
+    ))
+    if not quiz_response.get("success"):
+        return quiz_response
+    
+    # Validate and add missing fields
+    for q in quiz_response.get("questions", []):
+        if "correct_answer" not in q:
+            q["correct_answer"] = "A"
+        if "explanation" not in q:
+            q["explanation"] = "No explanation provided"
+        if "question_hash" not in q:
+            q["question_hash"] = ""
+        if "fun_fact" not in q:
+            q["fun_fact"] = ""
+        if "accepted_answers" not in q:
+            q["accepted_answers"] = []
+    
+    print(f"[DEBUG] Generated {len(quiz_response.get('questions', []))} questions")
+    
+    # Store for evaluation (session storage)
+    with quiz_sessions_lock:
+        quiz_sessions[payload["user"]] = {"response": quiz_response}
+    return quiz_response
+
+
+def run_agent2_quit_job(payload, progress):
+    """Job handler: summarize the tutoring session and store it"""
+    user = payload["user"]
+    # The summary was built in the background during the chat; only fall
+    # back to a one-shot summary if that never produced anything
+    rolling = end_session(user)
+    summarized_response = rolling.summary(wait=5.0) if rolling else ""
+    if not summarized_response:
+        progress({"stage": "summarizing"})
+        summarized_response = summarizer(payload["chat"], user)
+    data_to_store = {
+        "id": 1,
+        "agent": "agent-2",
+        "response": summarized_response,
+        "timestamp": firestore.SERVER_TIMESTAMP
+    }
+    add(1, user, data_to_store, "2")
+    return {"message": "Data stored!"}
+
+
+job_queue.register("generate_quiz", run_generate_quiz_job)
+job_queue.register("agent2_quit", run_agent2_quit_job)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Workers run only in the process that serves requests, since quiz_sessions is per process.
+# Imported by a WSGI server, that is this process; run as a script, see __main__ below.
+# A worker pool child re-importing the script (__mp_main__) never runs jobs.
+if __name__ not in ("__main__", "__mp_main__"):
+    job_queue.start_workers(JOB_WORKERS)
+
+
+def idempotency_key(data):
+    """Client-chosen key (header or body) so retried requests reuse the same job"""
+    return request.headers.get("Idempotency-Key") or data.get("idempotency_key")
+
+
+def job_response(job, shape=lambda result: result):
+    """The job's result if it finished in time, otherwise 202 with where to poll"""
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    current_span().set(job_id=job["job_id"])
+    if job["status"] == "done":
+        return jsonify(shape(job["result"]))
+    if job["status"] == "error":
+        return jsonify({"error": job["error"], "job_id": job["job_id"]}), 500
+    return jsonify({
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "status_url": f"/jobs/{job['job_id']}"
+    }), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status, progress and (when done) result of a background job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job)
+
+
+def cached_json_response(body, etag):
+    """Send pre-serialized JSON with an ETag, or 304 if the client already has it"""
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
 # Firebase helper functions
+def quiz_results_record(results_data):
+    """Build the Firestore document for a quiz result"""
+    return {
+        "agent": "agent-3",
+        "type": "quiz_results",
+        "session_correct": results_data.get("session_correct"),
+        "total_questions": results_data.get("total_questions"),
+        "accuracy": results_data.get("accuracy"),
+        "session_xp": results_data.get("session_xp"),
+        "total_xp": results_data.get("total_xp"),
+        "level": results_data.get("level"),
+        "title": results_data.get("title"),
+        "current_streak": results_data.get("current_streak"),
+        "coins": results_data.get("coins"),
+        "timestamp": firestore.SERVER_TIMESTAMP
+    }
+
+
+def save_quiz_batch_to_firebase(results):
+    """Save many users' quiz results to Firebase with batched writes"""
+    try:
+        records = [
+            (r["user"], "agent-3-quiz-results", quiz_results_record(r))
+            for r in results if r.get("success")
+        ]
+        if not records:
+            return
+        
+        result = add_many(3, records)
+        print(f"✓ {result}")
+        
+    except Exception as e:
+        print(f"✗ Error saving batch to Firebase: {e}")
+        raise
+
+
 def save_quiz_to_firebase(user, results_data):
     """Save quiz results to Firebase"""
     try:
-        data_to_store = {
-            "agent": "agent-3",
-            "type": "quiz_results",
-            "session_correct": results_data.get("session_correct"),
-            "total_questions": results_data.get("total_questions"),
-            "accuracy": results_data.get("accuracy"),
-            "session_xp": results_data.get("session_xp"),
-            "total_xp": results_data.get("total_xp"),
-            "level": results_data.get("level"),
-            "title": results_data.get("title"),
-            "current_streak": results_data.get("current_streak"),
-            "coins": results_data.get("coins"),
-            "timestamp": firestore.SERVER_TIMESTAMP
-        }
+        data_to_store = quiz_results_record(results_data)
         
         # add(id, user_name, data, agent)
         result = add(3, user, data_to_store, "agent-3-quiz-results")
@@ -261,9 +599,9 @@ def save_quiz_to_firebase(user, results_data):
 
 
 def save_dashboard_to_firebase(user, dashboard_data):
-    """Save dashboard snapshot to Firebase"""
+    """Save dashboard snapshot to Firebase (skipped when unchanged)"""
     try:
-        data_to_store = {
+        snapshot = {
             "agent": "agent-3",
             "type": "dashboard",
             "level": dashboard_data.get("level"),
@@ -275,12 +613,20 @@ def save_dashboard_to_firebase(user, dashboard_data):
             "badges_earned": dashboard_data.get("badges_earned"),
             "total_questions": dashboard_data.get("total_questions"),
             "total_correct": dashboard_data.get("total_correct"),
-            "accuracy": dashboard_data.get("accuracy"),
-            "timestamp": firestore.SERVER_TIMESTAMP
+            "accuracy": dashboard_data.get("accuracy")
         }
         
+        if not dashboard_snapshots.should_write(user, snapshot):
+            return
+        
+        data_to_store = dict(snapshot)
+        data_to_store["snapshot_hash"] = dashboard_snapshots.payload_hash(snapshot)
+        data_to_store["timestamp"] = firestore.SERVER_TIMESTAMP
+        
         # add(id, user_name, data, agent)
-        result = add(3, user, data_to_store, "agent-3-dashboard")
+        # Only a committed snapshot counts as written; a dropped batch is retried on the next view
+        result = add(3, user, data_to_store, "agent-3-dashboard",
+                     on_written=lambda: dashboard_snapshots.mark_written(user, snapshot))
         print(f"✓ {result}")
         
     except Exception as e:
@@ -298,6 +644,9 @@ def clear_conversations():
     response_array.clear()
     conversation_array.clear()
     chat_array.clear()
+    with quiz_sessions_lock:
+        quiz_sessions.clear()
+    clear_sessions()
     return jsonify({"message": "All conversations cleared"})
 
 
@@ -308,7 +657,7 @@ def debug_users():
         users_info = {}
         for username, profile in quiz_agent.user_profiles.items():
             users_info[username] = {
-                "level": quiz_agent.gamification.get_level_info(profile.total_xp)["level"],
+                "level": quiz_agent.gamification.get_level(profile.total_xp).level,
                 "total_xp": profile.total_xp,
                 "total_questions": profile.total_questions,
                 "badges": len(profile.earned_badges)
@@ -323,6 +672,56 @@ def debug_users():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/debug/snapshots', methods=['GET'])
+def debug_snapshots():
+    """Counters for dashboard snapshot writes vs skipped (unchanged) snapshots"""
+    return jsonify({
+        "written": dashboard_snapshots.stats["written"],
+        "skipped": dashboard_snapshots.stats["skipped"],
+        "tracked_users": len(dashboard_snapshots.last_written),
+        "max_staleness_seconds": dashboard_snapshots.max_staleness
+    })
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """p50/p95/p99 latency per span name (routes, agent methods, LLM calls, extraction, writes)"""
+    return jsonify(tracer.metrics())
+
+
+@app.route('/usage', methods=['GET'])
+def usage():
+    """Tokens and cost by user, agent, prompt and model over a rolling window (?window=5m|1h|24h&user=)"""
+    window = request.args.get('window', '1h')
+    if window not in WINDOWS:
+        return jsonify({"error": f"Unknown window; use one of {', '.join(WINDOWS)}"}), 400
+    return jsonify(usage_ledger.summary(window, request.args.get('user')))
+
+
+@app.route('/debug/generation', methods=['GET'])
+def debug_generation():
+    """Attempts per generated quiz question and why attempts failed"""
+    return jsonify(quiz_agent.generation_metrics.summary())
+
+
+@app.route('/debug/hedging', methods=['GET'])
+def debug_hedging():
+    """Hedged LLM calls, hedge wins and latency percentiles per (model, prompt kind)"""
+    return jsonify(get_hedger().summary())
+
+
+@app.route('/debug/prefetch', methods=['GET'])
+def debug_prefetch():
+    """Quiz prefetch hit rate and questions generated but never served"""
+    return jsonify(quiz_agent.prefetcher.summary())
+
+
+@app.route('/debug/extraction_cache', methods=['GET'])
+def debug_extraction_cache():
+    """Hit/miss counters and bytes of re-uploaded files that skipped extraction"""
+    return jsonify(get_extraction_cache().summary())
+
+
 if __name__ == "__main__":
     print("=" * 60)
     print("🚀 Quiz Legends Server Starting...")
@@ -348,4 +747,7 @@ if __name__ == "__main__":
     print("Debug endpoint: http://0.0.0.0:3000/debug/users")
     print("=" * 60)
     
+    # The reloader's first process only watches files; the child it starts serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        job_queue.start_workers(JOB_WORKERS)
     app.run(host="0.0.0.0", port=3000, debug=True)
@@ -0,0 +1,86 @@
+import os
+import json
+import time
+import atexit
+import hashlib
+import threading
+
+
+class SnapshotTracker:
+    """Decides whether a per-user snapshot actually needs to be written.
+
+    Keeps the hash of the last written payload per user. A snapshot is written
+    only when its hash differs or max_staleness seconds have passed since the
+    last write. Hashes are persisted to a small JSON file so a server restart
+    doesn't trigger a write for every user; the file is rewritten every
+    save_interval seconds when something changed, and once more at exit.
+    """
+
+    def __init__(self, path: str = "dashboard_snapshots.json", max_staleness: float = 3600.0,
+                 save_interval: float = 30.0):
+        self.path = path
+        self.max_staleness = max_staleness
+        self.save_interval = save_interval
+        self.lock = threading.Lock()
+        self.last_written = {}
+        self.dirty = False
+        self.stats = {"written": 0, "skipped": 0}
+        self.load()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._save_loop, name="snapshot-saver", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                self.last_written = json.load(f)
+        except Exception:
+            self.last_written = {}
+
+    def save(self):
+        """Write the hashes to disk if they changed since the last save"""
+        with self.lock:
+            if not self.dirty:
+                return
+            snapshot = dict(self.last_written)
+            self.dirty = False
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            with self.lock:
+                self.dirty = True
+            print(f"[WARNING] Could not persist snapshot hashes: {e}")
+
+    def _save_loop(self):
+        while not self.stopped.wait(self.save_interval):
+            self.save()
+
+    def close(self):
+        self.stopped.set()
+        self.save()
+
+    @staticmethod
+    def payload_hash(payload: dict) -> str:
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def should_write(self, user: str, payload: dict, now: float = None) -> bool:
+        now = now if now is not None else time.time()
+        digest = self.payload_hash(payload)
+        with self.lock:
+            last = self.last_written.get(user)
+            if last and last[0] == digest and now - last[1] < self.max_staleness:
+                self.stats["skipped"] += 1
+                return False
+            return True
+
+    def mark_written(self, user: str, payload: dict, now: float = None):
+        now = now if now is not None else time.time()
+        with self.lock:
+            self.last_written[user] = [self.payload_hash(payload), now]
+            self.stats["written"] += 1
+            self.dirty = True
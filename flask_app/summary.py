@@ -32,6 +32,9 @@ from concurrent.futures import ThreadPoolExecutor
 from langgraph.prebuilt import create_react_agent
 from langchain_core.tools import tool
 
+from flask_app.llm_callbacks import langchain_callbacks
+from flask_app.usage import usage_metadata
+
 GOOGLE_API_KEY = ""
 
 MODEL_ID = "gemini-2.5-flash"
@@ -40,18 +43,19 @@ llm = ChatGoogleGenerativeAI(
     model=MODEL_ID,
     google_api_key=GOOGLE_API_KEY,
     temperature=0.3,
+    callbacks=langchain_callbacks(),
 )
 
 
 
 
-def summarizer(responses: list):
+def summarizer(responses: list, user: Optional[str] = None):
     # convert AIMessage objects to strings if they exist
     responses_text = "\n".join([r.content if isinstance(r, AIMessage) else str(r) for r in responses])
     
     summary_prompt = f"You are an intelligent summarization assistant. You will receive a list of responses provided by users:\n{responses_text}\nYour task is to generate a concise, coherent, and meaningful summary of all these responses. Combine similar points, highlight the key ideas, avoid repetition, and keep it clear and readable. Provide the summary in 3-5 sentences maximum."
     
-    result = llm.invoke(summary_prompt)
+    result = llm.invoke(summary_prompt, usage_metadata(user, "agent2", "session_summary"))
     # ensure the result is a string
     return str(result)
 
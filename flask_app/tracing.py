@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import queue
+import atexit
+import asyncio
+import secrets
+import functools
+import threading
+import contextvars
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# Spans kept per name for percentiles
+SPAN_WINDOW = int(os.getenv("TRACE_WINDOW", "1000"))
+# Finished spans waiting for export; more than this are dropped, never blocked on
+MAX_QUEUED_SPANS = 10000
+EXPORT_BATCH = 512
+
+_OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "attributes",
+                 "start_ns", "start", "duration", "status", "error")
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: Optional[str], attributes: Dict):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(trace_id, parent span_id) from a W3C traceparent header"""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2]
+
+
+class JsonLinesSink:
+    """Appends one JSON object per finished span to a local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+
+def _otlp_value(value: Any) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPHttpSink:
+    """Posts spans to an OpenTelemetry collector (OTLP over HTTP, JSON encoding)"""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def payload(self, spans: List[Span]) -> Dict:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": _otlp_value(self.service_name)}]},
+            "scopeSpans": [{
+                "scope": {"name": "flask_app.tracing"},
+                "spans": [{
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "kind": _OTLP_KINDS.get(span.kind, 1),
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.start_ns + int(span.duration * 1e9)),
+                    "attributes": [{"key": key, "value": _otlp_value(value)}
+                                   for key, value in span.attributes.items() if value is not None],
+                    "status": {"code": 2, "message": span.error or ""} if span.status == "error" else {"code": 1},
+                } for span in spans],
+            }],
+        }]}
+
+    def export(self, spans: List[Span]):
+        import requests
+        response = requests.post(self.url, json=self.payload(spans), timeout=self.timeout)
+        response.raise_for_status()
+
+
+class Tracer:
+    """Timed spans for requests, agent methods, LLM calls and writes.
+
+    The current span lives in a context variable, so spans opened inside it
+    (in the same thread, or in asyncio tasks it starts) become its children.
+    Every finished span feeds a per-name window used for /metrics; when sinks
+    are configured, spans are also queued and exported in batches by a
+    background thread.
+    """
+
+    def __init__(self, sinks: Optional[List] = None, window: int = SPAN_WINDOW, flush_interval: float = 1.0):
+        self.sinks = list(sinks or [])
+        self.window = window
+        self.flush_interval = flush_interval
+        self.durations: Dict[str, Deque[float]] = {}
+        self.counts = Counter()
+        self.errors = Counter()
+        self.lock = threading.Lock()
+        self.queue: "queue.Queue[Span]" = queue.Queue(MAX_QUEUED_SPANS)
+        self.stats = {"exported": 0, "dropped": 0, "export_failures": 0}
+        self.thread = None
+        if self.sinks:
+            self.thread = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+            self.thread.start()
+            atexit.register(self.flush)
+
+    def start_span(self, name: str, kind: str = "internal", parent: Optional[Span] = None,
+                   context: Optional[Tuple[str, str]] = None, **attributes) -> Span:
+        """A new span under `parent` (default: the current span) or a remote `context`"""
+        if context is None:
+            parent = parent or _current.get()
+            context = (parent.trace_id, parent.span_id) if parent else (secrets.token_hex(16), None)
+        return Span(name, kind, context[0], context[1], attributes)
+
+    def end_span(self, span: Span, error: Any = None):
+        span.duration = time.perf_counter() - span.start
+        if isinstance(error, asyncio.CancelledError):
+            span.status = "cancelled"
+        elif error is not None:
+            span.status = "error"
+            span.error = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+
+        with self.lock:
+            samples = self.durations.get(span.name)
+            if samples is None:
+                samples = self.durations[span.name] = deque(maxlen=self.window)
+            samples.append(span.duration)
+            self.counts[span.name] += 1
+            if span.status == "error":
+                self.errors[span.name] += 1
+
+        if self.sinks:
+            try:
+                self.queue.put_nowait(span)
+            except queue.Full:
+                with self.lock:
+                    self.stats["dropped"] += 1
+
+    @staticmethod
+    def activate(span: Span) -> contextvars.Token:
+        return _current.set(span)
+
+    @staticmethod
+    def deactivate(token: contextvars.Token):
+        _current.reset(token)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes):
+        span = self.start_span(name, kind, **attributes)
+        token = _current.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current.reset(token)
+            self.end_span(span, error)
+
+    def _export_loop(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < EXPORT_BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._export(batch)
+            for _ in batch:
+                self.queue.task_done()
+
+    def _export(self, batch: List[Span]):
+        for sink in self.sinks:
+            try:
+                sink.export(batch)
+            except Exception as e:
+                with self.lock:
+                    self.stats["export_failures"] += 1
+                print(f"[WARNING] Trace export to {type(sink).__name__} failed: {e}")
+        with self.lock:
+            self.stats["exported"] += len(batch)
+
+    def flush(self):
+        """Wait until every queued span has been exported"""
+        if self.thread is not None:
+            self.queue.join()
+
+    def metrics(self) -> Dict:
+        with self.lock:
+            windows = {name: sorted(samples) for name, samples in self.durations.items()}
+            counts, errors, stats = dict(self.counts), dict(self.errors), dict(self.stats)
+
+        def pick(ordered, q):
+            return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 3)
+
+        return {
+            "spans": {
+                name: {
+                    "count": counts[name],
+                    "errors": errors.get(name, 0),
+                    "window": len(ordered),
+                    "p50_ms": pick(ordered, 0.5),
+                    "p95_ms": pick(ordered, 0.95),
+                    "p99_ms": pick(ordered, 0.99),
+                    "max_ms": round(ordered[-1] * 1000, 3),
+                }
+                for name, ordered in sorted(windows.items())
+            },
+            "sinks": [type(sink).__name__ for sink in self.sinks],
+            "queued": self.queue.qsize(),
+            **stats,
+        }
+
+
+def traced(name: str, kind: str = "internal", **attributes):
+    """Decorator: run the (sync or async) function inside a span"""
+    def decorate(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with get_tracer().span(name, kind, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(name, kind, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Process-wide tracer; exports to TRACE_FILE and/or OTEL_EXPORTER_OTLP_ENDPOINT when set"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            sinks = []
+            if os.getenv("TRACE_FILE"):
+                sinks.append(JsonLinesSink(os.getenv("TRACE_FILE")))
+            if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+                sinks.append(OTLPHttpSink(os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"),
+                                          os.getenv("OTEL_SERVICE_NAME", "college-companion")))
+            _tracer = Tracer(sinks)
+        return _tracer
+
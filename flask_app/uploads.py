@@ -0,0 +1,158 @@
+import os
+import time
+import uuid
+import shutil
+import zipfile
+import tempfile
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, IO, Optional
+
+from flask import Request
+
+from flask_app.tracing import get_tracer
+
+# Upload parts are kept in memory up to this size, then spill to a temp file
+UPLOAD_SPOOL_BYTES = 1024 * 1024
+# Requests larger than this are rejected with 413 before being read
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+# Files up to this size (and PDFs up to FAST_LANE_PAGES pages) are answered inline
+FAST_LANE_BYTES = int(os.getenv("FAST_LANE_KB", "2048")) * 1024
+FAST_LANE_PAGES = int(os.getenv("FAST_LANE_PAGES", "20"))
+
+PDF = "application/pdf"
+DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+_IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+)
+
+
+class SpooledRequest(Request):
+    """Request whose multipart file parts are streamed into spooled temp files"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+
+
+def sniff_file_type(stream: IO[bytes]) -> Optional[str]:
+    """Detect the file type from its leading bytes, ignoring the client's claim"""
+    stream.seek(0)
+    head = stream.read(16)
+    stream.seek(0)
+
+    if head.startswith(b"%PDF-"):
+        return PDF
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, file_type in _IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return file_type
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(stream) as archive:
+                if "word/document.xml" in archive.namelist():
+                    return DOCX
+        except zipfile.BadZipFile:
+            pass
+        finally:
+            stream.seek(0)
+    return None
+
+
+def stream_size(stream: IO[bytes]) -> int:
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+
+def save_upload(stream: IO[bytes]) -> str:
+    """Copy an upload to a named temp file, a block at a time; the caller deletes it"""
+    stream.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="upload-", delete=False) as tmp:
+        shutil.copyfileobj(stream, tmp, 1024 * 1024)
+    return tmp.name
+
+
+def use_fast_lane(file_type: str, size: int, pages: Optional[int] = None) -> bool:
+    if size > FAST_LANE_BYTES:
+        return False
+    return file_type != PDF or (pages or 0) <= FAST_LANE_PAGES
+
+
+class UploadJobs:
+    """Background processing for large uploads, with progress for polling.
+
+    Jobs run on a small thread pool (each one runs its own event loop) and
+    finished jobs are forgotten after `ttl` seconds.
+    """
+
+    def __init__(self, max_workers: int = 2, ttl: float = 3600.0):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload-job")
+        self.ttl = ttl
+        self.jobs: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, user: str, filename: str, run: Callable[[Callable[[int, int], None]], str],
+               on_done: Optional[Callable[[str], None]] = None) -> str:
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            self._expire()
+            self.jobs[job_id] = {
+                "job_id": job_id,
+                "user": user,
+                "filename": filename,
+                "status": "queued",
+                "progress": {"done": 0, "total": None},
+                "response": None,
+                "error": None,
+                "created_at": time.time(),
+                "finished_at": None,
+            }
+        # The job's spans continue the submitting request's trace
+        self.executor.submit(contextvars.copy_context().run, self._run, job_id, run, on_done)
+        return job_id
+
+    def _update(self, job_id: str, **fields):
+        with self.lock:
+            self.jobs[job_id].update(fields)
+
+    def _run(self, job_id: str, run, on_done):
+        self._update(job_id, status="running", started_at=time.time())
+
+        def progress(done: int, total: int):
+            self._update(job_id, progress={"done": done, "total": total})
+
+        try:
+            with get_tracer().span("upload.job", job_id=job_id):
+                response = run(progress)
+        except Exception as e:
+            print(f"[WARNING] Upload job {job_id} failed: {e}")
+            self._update(job_id, status="error", error=str(e), finished_at=time.time())
+            return
+        self._update(job_id, status="done", response=response, finished_at=time.time())
+        if on_done:
+            try:
+                on_done(response)
+            except Exception as e:
+                print(f"[WARNING] Upload job {job_id} callback failed: {e}")
+
+    def _expire(self):
+        # Caller holds the lock
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self.jobs.items()
+                       if job["finished_at"] and job["finished_at"] < cutoff]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
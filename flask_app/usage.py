@@ -0,0 +1,325 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from flask_app.llm_callbacks import model_name
+from flask_app.python_agents.tutor_memory import estimate_tokens
+
+# List prices in USD per million (input, output) tokens; MODEL_PRICES (JSON) overrides or adds models
+DEFAULT_PRICES = {
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-1.5-pro": (1.25, 5.00),
+}
+# Rolling windows reported by summary()
+WINDOWS = {"5m": 300, "1h": 3600, "24h": 86400}
+BUCKET_SECONDS = 60
+
+UsageKey = Tuple[str, str, str, str]  # (user, agent, prompt, model)
+_FIELDS = ("calls", "input_tokens", "output_tokens", "estimated_calls", "errors", "cost_usd")
+
+
+class QuotaExceededError(RuntimeError):
+    def __init__(self, user: str, used: int, limit: int, retry_after: float):
+        super().__init__(f"Token quota exceeded for {user}: {used}/{limit} tokens used")
+        self.user = user
+        self.used = used
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+def _totals(row: List[float]) -> Dict:
+    totals = dict(zip(_FIELDS, row))
+    totals["cost_usd"] = round(totals["cost_usd"], 6)
+    return totals
+
+
+class UsageLedger:
+    """Token and cost totals per (user, agent, prompt, model), in one-minute buckets.
+
+    Buckets are kept for the longest reporting or quota window, so any
+    window is a sum over its buckets. Users may have a token quota over
+    `quota_window` seconds. It is checked before each call, so it can be
+    overshot by at most the calls already in flight.
+    """
+
+    def __init__(self, prices: Optional[Dict[str, Tuple[float, float]]] = None, quota: int = 0,
+                 quota_window: float = 86400.0, quotas: Optional[Dict[str, int]] = None):
+        self.prices = dict(prices or DEFAULT_PRICES)
+        self.quota = quota
+        self.quota_window = quota_window
+        self.quotas = dict(quotas or {})
+        self.retention = max(max(WINDOWS.values()), quota_window)
+        self.buckets: Deque[Tuple[float, Dict[UsageKey, List[float]]]] = deque()
+        self.user_tokens: Dict[str, Deque[List[float]]] = {}
+        self.lock = threading.Lock()
+
+    def price(self, model: str) -> Optional[Tuple[float, float]]:
+        # Longest matching prefix, so versioned names like gemini-2.0-flash-001 are priced too
+        matches = [name for name in self.prices if model.startswith(name)]
+        return self.prices[max(matches, key=len)] if matches else None
+
+    def cost(self, model: str, input_tokens: int, output_tokens: int) -> float:
+        price = self.price(model)
+        if price is None:
+            return 0.0
+        return (input_tokens * price[0] + output_tokens * price[1]) / 1_000_000
+
+    def _trim(self, now: float):
+        # Caller holds the lock
+        cutoff = now - self.retention
+        if not self.buckets or self.buckets[0][0] >= cutoff:
+            return
+        while self.buckets and self.buckets[0][0] < cutoff:
+            self.buckets.popleft()
+        # Once per expired bucket: forget users with nothing left in the window
+        idle = [user for user, per_user in self.user_tokens.items() if per_user[-1][0] < cutoff]
+        for user in idle:
+            del self.user_tokens[user]
+
+    def record(self, user: str, agent: str, prompt: str, model: str, input_tokens: int, output_tokens: int,
+               estimated: bool = False, error: bool = False, now: Optional[float] = None):
+        now = now if now is not None else time.time()
+        bucket = now - now % BUCKET_SECONDS
+        tokens = input_tokens + output_tokens
+        with self.lock:
+            self._trim(now)
+            if not self.buckets or self.buckets[-1][0] != bucket:
+                self.buckets.append((bucket, {}))
+            row = self.buckets[-1][1].setdefault((user, agent, prompt, model), [0, 0, 0, 0, 0, 0.0])
+            row[0] += 1
+            row[1] += input_tokens
+            row[2] += output_tokens
+            row[3] += int(estimated)
+            row[4] += int(error)
+            row[5] += self.cost(model, input_tokens, output_tokens)
+
+            per_user = self.user_tokens.setdefault(user, deque())
+            if per_user and per_user[-1][0] == bucket:
+                per_user[-1][1] += tokens
+            else:
+                per_user.append([bucket, tokens])
+            # Trimmed here too: used() only runs when a quota is set
+            while per_user[0][0] < now - self.retention:
+                per_user.popleft()
+
+    def quota_for(self, user: str) -> int:
+        return self.quotas.get(user, self.quota)
+
+    def used(self, user: str, now: Optional[float] = None) -> int:
+        """Tokens the user spent in the current quota window"""
+        now = now if now is not None else time.time()
+        with self.lock:
+            per_user = self.user_tokens.get(user)
+            if not per_user:
+                return 0
+            while per_user and per_user[0][0] + BUCKET_SECONDS <= now - self.quota_window:
+                per_user.popleft()
+            return int(sum(tokens for _, tokens in per_user))
+
+    def check(self, user: Optional[str], upcoming_tokens: int = 0, now: Optional[float] = None):
+        """Raise QuotaExceededError if `user` can't spend `upcoming_tokens` more"""
+        limit = self.quota_for(user) if user else 0
+        if not limit:
+            return
+        now = now if now is not None else time.time()
+        used = self.used(user, now)
+        if used + upcoming_tokens > limit:
+            with self.lock:
+                per_user = self.user_tokens.get(user)
+                oldest = per_user[0][0] if per_user else now
+            retry_after = max(0.0, oldest + BUCKET_SECONDS + self.quota_window - now)
+            raise QuotaExceededError(user, used, limit, retry_after)
+
+    def quota_status(self, user: str) -> Dict:
+        limit = self.quota_for(user)
+        used = self.used(user)
+        return {
+            "limit": limit or None,
+            "used": used,
+            "remaining": max(0, limit - used) if limit else None,
+            "window_seconds": self.quota_window,
+        }
+
+    def summary(self, window: str = "1h", user: Optional[str] = None, top: int = 50) -> Dict:
+        """Totals over the window, broken down by user, agent, prompt and model"""
+        seconds = WINDOWS.get(window)
+        if seconds is None:
+            raise ValueError(f"Unknown window {window!r}; use one of {', '.join(WINDOWS)}")
+        cutoff = time.time() - seconds
+
+        rows: Dict[UsageKey, List[float]] = {}
+        with self.lock:
+            for bucket, entries in self.buckets:
+                if bucket + BUCKET_SECONDS <= cutoff:
+                    continue
+                for key, row in entries.items():
+                    if user is not None and key[0] != user:
+                        continue
+                    total = rows.setdefault(key, [0] * len(_FIELDS))
+                    for i, value in enumerate(row):
+                        total[i] += value
+
+        def group(index: int) -> Dict[str, Dict]:
+            grouped: Dict[str, List[float]] = {}
+            for key, row in rows.items():
+                total = grouped.setdefault(key[index], [0] * len(_FIELDS))
+                for i, value in enumerate(row):
+                    total[i] += value
+            return {name: _totals(row) for name, row in sorted(grouped.items(), key=lambda item: -item[1][5])}
+
+        totals = [0] * len(_FIELDS)
+        for row in rows.values():
+            for i, value in enumerate(row):
+                totals[i] += value
+
+        ranked = sorted(rows.items(), key=lambda item: (-item[1][5], -item[1][1] - item[1][2]))[:top]
+        result = {
+            "window": window,
+            "totals": _totals(totals),
+            "by_user": group(0),
+            "by_agent": group(1),
+            "by_prompt": group(2),
+            "by_model": group(3),
+            "top": [{"user": key[0], "agent": key[1], "prompt": key[2], "model": key[3], **_totals(row)}
+                    for key, row in ranked],
+            "unpriced_models": sorted({key[3] for key in rows if self.price(key[3]) is None}),
+        }
+        if user is not None:
+            result["quota"] = self.quota_status(user)
+        return result
+
+
+def _message_text(message) -> str:
+    content = getattr(message, "content", message)
+    if isinstance(content, list):
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return str(content)
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """LangChain callbacks that meter every LLM call and enforce quotas before it is sent.
+
+    Calls are attributed from the run's metadata keys "user", "agent" and
+    "prompt". Token counts come from the response's usage metadata, or are
+    estimated from the text when the model doesn't report them.
+    """
+
+    run_inline = True
+    # Lets QuotaExceededError stop the call; every other error is caught here
+    raise_error = True
+
+    def __init__(self, ledger: Optional[UsageLedger] = None):
+        self.ledger = ledger
+        self.runs: Dict[UUID, Tuple[str, str, str, str, int]] = {}
+        self.lock = threading.Lock()
+
+    def _ledger(self) -> UsageLedger:
+        return self.ledger or get_usage_ledger()
+
+    def _start(self, run_id: UUID, serialized, metadata: Optional[Dict], prompt_text: str):
+        # Metering must never break the call itself, so only a quota refusal propagates
+        try:
+            metadata = metadata or {}
+            user = str(metadata.get("user") or "unknown")
+            input_estimate = estimate_tokens(prompt_text)
+            run = (user, str(metadata.get("agent") or "unknown"), str(metadata.get("prompt") or "unknown"),
+                   model_name(serialized, metadata), input_estimate)
+            self._ledger().check(user, input_estimate)
+        except QuotaExceededError:
+            raise
+        except Exception as e:
+            print(f"[WARNING] Could not meter LLM call: {e}")
+            return
+        with self.lock:
+            self.runs[run_id] = run
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, serialized, metadata,
+                    "".join(_message_text(message) for batch in messages for message in batch))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, serialized, metadata, "".join(prompts))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self.lock:
+            run = self.runs.pop(run_id, None)
+        if run is None:
+            return
+        user, agent, prompt, model, input_estimate = run
+        try:
+            generations = [generation for batch in response.generations for generation in batch]
+            usage = getattr(getattr(generations[0], "message", None), "usage_metadata", None) if generations else None
+            if usage:
+                input_tokens, output_tokens, estimated = usage.get("input_tokens", 0), usage.get("output_tokens", 0), False
+            else:
+                input_tokens = input_estimate
+                output_tokens = sum(estimate_tokens(generation.text) for generation in generations)
+                estimated = True
+            self._ledger().record(user, agent, prompt, model, input_tokens, output_tokens, estimated)
+        except Exception as e:
+            print(f"[WARNING] Could not record LLM usage: {e}")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self.lock:
+            run = self.runs.pop(run_id, None)
+        if run is None:
+            return
+        # The prompt was most likely sent (and billed) even though no answer came back
+        user, agent, prompt, model, input_estimate = run
+        try:
+            self._ledger().record(user, agent, prompt, model, input_estimate, 0, estimated=True, error=True)
+        except Exception as e:
+            print(f"[WARNING] Could not record LLM usage: {e}")
+
+
+def usage_metadata(user: Optional[str], agent: str, prompt: str) -> Dict:
+    """Run-config metadata that attributes an LLM call for accounting and quotas"""
+    return {"metadata": {"user": user or "unknown", "agent": agent, "prompt": prompt}}
+
+
+_ledger: Optional[UsageLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def _load_quotas(path: Optional[str]) -> Dict[str, int]:
+    if not path:
+        return {}
+    try:
+        with open(path, "r") as f:
+            return {user: int(limit) for user, limit in json.load(f).items()}
+    except Exception as e:
+        print(f"[WARNING] Could not load per-user token quotas from {path}: {e}")
+        return {}
+
+
+def get_usage_ledger() -> UsageLedger:
+    """Process-wide ledger.
+
+    USER_TOKEN_QUOTA sets the default per-user quota (0 means none).
+    USER_QUOTA_WINDOW sets the quota window in seconds.
+    TOKEN_QUOTA_FILE points to a JSON file of per-user overrides.
+    """
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            prices = dict(DEFAULT_PRICES)
+            if os.getenv("MODEL_PRICES"):
+                try:
+                    prices.update({model: (float(price[0]), float(price[1]))
+                                   for model, price in json.loads(os.getenv("MODEL_PRICES")).items()})
+                except Exception as e:
+                    print(f"[WARNING] Ignoring malformed MODEL_PRICES: {e}")
+            _ledger = UsageLedger(
+                prices,
+                quota=int(os.getenv("USER_TOKEN_QUOTA", "0")),
+                quota_window=float(os.getenv("USER_QUOTA_WINDOW", "86400")),
+                quotas=_load_quotas(os.getenv("TOKEN_QUOTA_FILE"))
+            )
+        return _ledger
@@ -0,0 +1,130 @@
+import threading
+
+import pytest
+
+from flask_app.firestore_writer import FirestoreWriter
+
+
+class FakeDocument:
+    def __init__(self, collection, document):
+        self.key = (collection, document)
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, doc_ref, data):
+        self.writes.append((doc_ref.key, data))
+
+    def commit(self):
+        self.client.commits += 1
+        self.client.release.wait()
+        if self.client.fail_next:
+            self.client.fail_next -= 1
+            raise ConnectionError("simulated Firestore outage")
+        for key, data in self.writes:
+            self.client.store[key] = data
+
+
+class FakeFirestoreClient:
+    """In-process stand-in for firestore.Client (collection/document/batch only)"""
+
+    def __init__(self, fail_next=0):
+        self.store = {}
+        self.commits = 0
+        self.fail_next = fail_next
+        # Cleared to hold commits, as if Firestore hung
+        self.release = threading.Event()
+        self.release.set()
+
+    def collection(self, name):
+        class Collection:
+            def document(self, document):
+                return FakeDocument(name, document)
+
+        return Collection()
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+def test_coalesces_writes_per_document_into_batches():
+    client = FakeFirestoreClient()
+    writer = FirestoreWriter(client, flush_interval=0.5, max_pending=1000)
+
+    # 200 users each viewing their dashboard 10 times
+    for view in range(10):
+        for user in range(200):
+            writer.enqueue(f"user{user}", "agent-3-dashboard", {"view": view})
+    writer.close()
+
+    assert len(client.store) == 200
+    assert all(data == {"view": 9} for data in client.store.values())
+    assert client.commits == 1
+    assert writer.stats["coalesced"] == 1800
+
+
+def test_retries_a_failed_batch():
+    client = FakeFirestoreClient(fail_next=2)
+    writer = FirestoreWriter(client, flush_interval=0.05, retry_delay=0.01)
+
+    writer.enqueue("user", "agent-3", {"score": 1})
+    assert writer.flush(timeout=5)
+
+    assert client.store == {("user", "agent-3"): {"score": 1}}
+    assert writer.stats["retries"] == 2
+    assert writer.stats["failed_batches"] == 0
+
+
+def test_counts_and_logs_batches_dropped_after_retries(capsys):
+    client = FakeFirestoreClient(fail_next=100)
+    writer = FirestoreWriter(client, flush_interval=0.05, max_retries=2, retry_delay=0.01)
+
+    writer.enqueue("user1", "agent-3", {"score": 1})
+    writer.enqueue("user2", "agent-3", {"score": 2})
+    assert writer.flush(timeout=5)
+
+    assert client.store == {}
+    assert writer.stats["failed_batches"] == 1
+    assert writer.stats["failed"] == 2
+    assert "simulated Firestore outage" in writer.last_error
+    assert "user1/agent-3" in capsys.readouterr().out
+
+
+def test_enqueue_gives_up_when_queue_stays_full():
+    client = FakeFirestoreClient()
+    client.release.clear()
+    writer = FirestoreWriter(client, flush_interval=60, max_pending=2, enqueue_timeout=0.1)
+
+    writer.enqueue("a", "doc", {})
+    writer.enqueue("b", "doc", {})
+    # Full: the worker takes a and b, then hangs in commit
+    writer.enqueue("c", "doc", {})
+    writer.enqueue("d", "doc", {})
+    with pytest.raises(TimeoutError):
+        writer.enqueue("e", "doc", {})
+    assert writer.stats["enqueue_timeouts"] == 1
+
+    client.release.set()
+    writer.close()
+    assert set(client.store) == {("a", "doc"), ("b", "doc"), ("c", "doc"), ("d", "doc")}
+
+
+def test_on_written_runs_only_after_a_successful_commit():
+    client = FakeFirestoreClient(fail_next=1)
+    writer = FirestoreWriter(client, flush_interval=10, max_retries=0)
+    written = []
+
+    writer.enqueue("user", "agent-3-dashboard", {"view": 1}, on_written=lambda: written.append(1))
+    assert writer.flush(timeout=5)
+    assert written == []
+
+    writer.enqueue("user", "agent-3-dashboard", {"view": 2}, on_written=lambda: written.append(2))
+    # Coalesced: only the newest write's callback fires
+    writer.enqueue("user", "agent-3-dashboard", {"view": 3}, on_written=lambda: written.append(3))
+    writer.close()
+
+    assert client.store == {("user", "agent-3-dashboard"): {"view": 3}}
+    assert written == [3]
@@ -0,0 +1,79 @@
+import pytest
+
+from flask_app.python_agents.grading import AnswerGrader, normalize
+
+
+@pytest.fixture
+def grader():
+    return AnswerGrader()
+
+
+@pytest.mark.parametrize("user_answer, correct_answer", [
+    ("Marss", "Mars"),
+    ("marss", "Mars"),
+    ("photosynthsis", "Photosynthesis"),
+    ("Cafe", "Café"),
+])
+def test_typos_are_accepted(grader, user_answer, correct_answer):
+    assert grader.grade(user_answer, correct_answer)
+
+
+@pytest.mark.parametrize("user_answer, correct_answer", [
+    ("venus", "Mars"),
+    ("Ag", "Au"),
+])
+def test_wrong_answers_are_rejected(grader, user_answer, correct_answer):
+    assert not grader.grade(user_answer, correct_answer)
+
+
+def test_plurals(grader):
+    assert grader.grade("planets", "planet")
+    assert grader.grade("boxes", "box")
+    assert grader.grade("mitochondrias", "Mitochondria")
+    assert normalize("species") == ("species",)
+
+
+def test_short_words_and_proper_nouns_are_not_stemmed():
+    assert normalize("Mars") == ("mars",)
+    assert normalize("mars") == ("mars",)
+    assert normalize("Texas") == ("texas",)
+    assert normalize("gas") == ("gas",)
+
+
+@pytest.mark.parametrize("user_answer, correct_answer", [
+    ("21", "21"),
+    ("21.0", "21"),
+    ("twenty one", "21"),
+    (".5", "0.5"),
+    ("0.50", ".5"),
+    ("-.5", "-0.5"),
+    ("1,000", "1000"),
+    ("100", "100.00"),
+    ("42.", "42"),
+])
+def test_equal_numbers_match(grader, user_answer, correct_answer):
+    assert grader.grade(user_answer, correct_answer)
+
+
+@pytest.mark.parametrize("user_answer, correct_answer", [
+    ("1945", "1946"),
+    (".5", "5"),
+    ("5", "50"),
+])
+def test_different_numbers_do_not_match(grader, user_answer, correct_answer):
+    assert not grader.grade(user_answer, correct_answer)
+
+
+def test_phrases_and_aliases(grader):
+    assert grader.grade("Planet Mars", "Mars")
+    assert grader.grade("Leonardo", "Leonardo da Vinci", ["Leonardo"])
+    assert grader.grade("da vinci", "Leonardo da Vinci", ["da Vinci"])
+
+
+@pytest.mark.parametrize("user_answer", ["not mars", "Not Mars", "never mars", "no, Mars"])
+def test_negated_answers_are_rejected(grader, user_answer):
+    assert not grader.grade(user_answer, "Mars")
+
+
+def test_negation_in_the_correct_answer_still_matches(grader):
+    assert grader.grade("not guilty", "Not guilty")
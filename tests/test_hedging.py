@@ -0,0 +1,94 @@
+import asyncio
+
+from flask_app.python_agents.hedging import HedgedCaller, LatencyTracker
+
+KEY = ("fake", "quiz_question")
+
+
+class ScriptedLLM:
+    """Each call sleeps and then returns (or raises) the next scripted outcome"""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def ainvoke(self):
+        delay, outcome = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def warmed_caller(latency=0.005, samples=1000, **kwargs):
+    """A caller whose tracker has seen enough fast calls to hedge anything slower"""
+    tracker = LatencyTracker(window=samples)
+    for _ in range(samples):
+        tracker.record(KEY, latency)
+    return HedgedCaller(tracker, **kwargs)
+
+
+def test_no_hedging_before_latencies_are_known():
+    caller = HedgedCaller()
+    llm = ScriptedLLM([(0.01, "ok")])
+
+    assert asyncio.run(caller.call(KEY, llm.ainvoke)) == "ok"
+    assert llm.calls == 1
+    assert caller.stats["hedges"] == 0
+
+
+def test_hedges_stay_within_the_token_budget():
+    caller = warmed_caller(max_hedge_ratio=0.05, burst=1.0)
+    # Every call is slower than the tracked latency, so every call would like a hedge
+    llm = ScriptedLLM([(0.02, "ok")])
+
+    async def run():
+        for _ in range(40):
+            await caller.call(KEY, llm.ainvoke)
+
+    asyncio.run(run())
+
+    hedges = caller.stats["hedges"]
+    assert 2 <= hedges <= 1 + 40 * 0.05
+    assert caller.stats["over_budget"] == 40 - hedges
+    assert llm.calls == 40 + hedges
+
+
+def test_the_losing_call_is_cancelled():
+    caller = warmed_caller()
+    llm = ScriptedLLM([(5.0, "slow"), (0.0, "fast")])
+
+    async def run():
+        result = await caller.call(KEY, llm.ainvoke)
+        # Let the cancelled primary see its CancelledError
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == "fast"
+    assert caller.stats["hedge_wins"] == 1
+    assert llm.cancelled == 1
+
+
+def test_an_invalid_result_waits_for_the_other_call():
+    caller = warmed_caller()
+    llm = ScriptedLLM([(0.05, "valid"), (0.0, "garbage")])
+
+    result = asyncio.run(caller.call(KEY, llm.ainvoke, validate=lambda text: text == "valid"))
+
+    assert result == "valid"
+    assert caller.stats["hedge_wins"] == 0
+
+
+def test_falls_back_to_an_invalid_result_when_nothing_valid_arrives():
+    caller = warmed_caller()
+    llm = ScriptedLLM([(0.05, "garbage"), (0.0, ConnectionError("hedge failed"))])
+
+    result = asyncio.run(caller.call(KEY, llm.ainvoke, validate=lambda text: text == "valid"))
+
+    assert result == "garbage"
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from flask_app.python_agents.levels import LevelTable
+
+
+def linear_scan_level_info(level_data, xp):
+    """The original linear scan over the level list, as a reference"""
+    for i, level_info in enumerate(level_data):
+        if i == len(level_data) - 1:
+            return {"level": level_info["level"], "title": level_info["title"],
+                    "xp_to_next": 0, "progress": 100.0, "is_max": True}
+        next_level = level_data[i + 1]
+        if xp < next_level["xp_required"]:
+            current_level_xp = level_info["xp_required"]
+            xp_for_level = next_level["xp_required"] - current_level_xp
+            return {"level": level_info["level"], "title": level_info["title"],
+                    "xp_to_next": next_level["xp_required"] - xp,
+                    "progress": max(0, ((xp - current_level_xp) / xp_for_level) * 100),
+                    "is_max": False}
+    return level_data[-1]
+
+
+def test_matches_the_linear_scan():
+    table = LevelTable.default()
+    level_data = table.as_level_data()
+    rng = random.Random(42)
+    thresholds = [entry["xp_required"] for entry in level_data]
+    samples = [rng.randint(0, 150000) for _ in range(10000)]
+    samples += thresholds + [xp - 1 for xp in thresholds[1:]] + [xp + 1 for xp in thresholds]
+
+    for xp in samples:
+        assert table.get_level_info(xp) == linear_scan_level_info(level_data, xp)
+
+
+def test_level_boundaries():
+    table = LevelTable.default()
+    assert table.get_level(0).level == 1
+    assert table.get_level(99).level == 1
+    assert table.get_level(100).level == 2
+    assert table.get_level(-5).level == 1
+    assert table.get_level(10 ** 9).is_max
+    assert table.get_level(250)["title"] == table.get_level(250).title
+
+
+def test_prestige_past_the_last_level():
+    table = LevelTable([
+        {"level": 1, "title": "One", "xp_required": 0},
+        {"level": 2, "title": "Two", "xp_required": 100},
+    ], prestige_xp=50)
+
+    info = table.get_level_info(225)
+    assert info["level"] == 2
+    assert info["prestige"] == 2
+    assert info["xp_to_next"] == 25
+    assert info["progress"] == 50.0
+
+
+@pytest.mark.parametrize("curve, prestige_xp", [
+    ([], 0),
+    ([{"level": 1, "title": "One", "xp_required": 10}], 0),
+    ([{"level": 1, "title": "One", "xp_required": 0}, {"level": 2, "title": "Two", "xp_required": 0}], 0),
+    ([{"level": 1, "title": "One", "xp_required": 0}], -1),
+])
+def test_rejects_invalid_curves(curve, prestige_xp):
+    with pytest.raises(ValueError):
+        LevelTable(curve, prestige_xp)
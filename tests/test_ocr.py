@@ -0,0 +1,88 @@
+import asyncio
+import io
+
+import pytest
+
+pytest.importorskip("PIL")
+from PIL import Image, ImageDraw, ImageFont
+
+from flask_app.python_agents.ocr import (
+    MAX_SIDE, OCRBusyError, OCRService, merge_tile_text, prepare_image, tile_boxes
+)
+
+
+def page_image(size=(1700, 2200), lines=20, fmt="JPEG"):
+    """A page of dark text lines on an off-white, speckled background"""
+    image = Image.new("RGB", size, (235, 232, 225))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=size[0] // 30)
+    for i in range(lines):
+        draw.text((80, 60 + i * (size[1] - 120) // lines),
+                  f"Line {i} mitochondria powerhouse", fill=(30, 30, 40), font=font)
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def test_tile_boxes_cover_the_image_with_overlap():
+    assert tile_boxes(800, 1000, tile_height=1200) == [(0, 0, 800, 1000)]
+
+    boxes = tile_boxes(800, 3000, tile_height=1200, overlap=80)
+    assert boxes[0][1] == 0 and boxes[-1][3] == 3000
+    assert all(box[0] == 0 and box[2] == 800 for box in boxes)
+    for previous, current in zip(boxes, boxes[1:]):
+        assert current[1] == previous[3] - 80
+
+
+def test_prepare_image_downscales_and_binarizes_large_photos():
+    tiles, original_size, processed_size = prepare_image(page_image((4032, 3024)))
+
+    assert original_size == (4032, 3024)
+    assert max(processed_size) == MAX_SIDE
+    assert len(tiles) == len(tile_boxes(*processed_size))
+    tile = Image.open(io.BytesIO(tiles[0]))
+    assert tile.mode == "1"
+    assert tile.width == processed_size[0]
+
+
+def test_prepare_image_reads_a_path(tmp_path):
+    path = tmp_path / "notes.png"
+    path.write_bytes(page_image((600, 800), lines=5, fmt="PNG"))
+
+    tiles, original_size, processed_size = prepare_image(str(path))
+
+    assert original_size == processed_size == (600, 800)
+    assert len(tiles) == 1
+
+
+def test_merge_tile_text_drops_lines_repeated_in_the_overlap():
+    merged = merge_tile_text(["first\nsecond\nthird\n", "third\nfourth\n", "\nfourth\nfifth"])
+    assert merged.splitlines() == ["first", "second", "third", "fourth", "fifth"]
+
+
+def test_rejects_images_once_the_queue_is_full():
+    service = OCRService(max_workers=1, max_pending=0)
+    service.in_flight = 1
+    try:
+        with pytest.raises(OCRBusyError):
+            asyncio.run(service.image_to_text(b"ignored"))
+        assert service.stats["rejected"] == 1
+    finally:
+        service.pool.shutdown()
+
+
+def test_reads_text_from_a_page():
+    pytesseract = pytest.importorskip("pytesseract")
+    try:
+        pytesseract.get_tesseract_version()
+    except pytesseract.TesseractNotFoundError:
+        pytest.skip("tesseract is not installed")
+
+    service = OCRService(max_workers=2)
+    try:
+        result = asyncio.run(service.image_to_text(page_image((1700, 2600), lines=12)))
+    finally:
+        service.pool.shutdown()
+
+    assert result.tiles == len(tile_boxes(*result.processed_size))
+    assert "mitochondria" in result.text.lower()
@@ -0,0 +1,81 @@
+import threading
+
+from flask_app.rolling_summary import RollingSummarizer
+
+
+class FakeLLM:
+    """Deterministic stand-in chat model that counts calls and prompt sizes"""
+
+    def __init__(self, fail_merges: int = 0):
+        self.calls = 0
+        self.merges = 0
+        self.max_prompt_chars = 0
+        self.fail_merges = fail_merges
+        # Cleared to hold calls, as if the model were slow
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+        self.lock = threading.Lock()
+
+    def invoke(self, prompt: str, config=None) -> str:
+        self.started.set()
+        self.release.wait()
+        with self.lock:
+            self.calls += 1
+            self.max_prompt_chars = max(self.max_prompt_chars, len(prompt))
+            if prompt.startswith("Merge"):
+                self.merges += 1
+                if self.fail_merges:
+                    self.fail_merges -= 1
+                    raise ConnectionError("simulated LLM outage")
+            return f"summary #{self.calls}"
+
+
+def test_one_fold_per_exchange_and_one_merge_per_segment():
+    llm = FakeLLM()
+    rolling = RollingSummarizer(llm, segment_size=8)
+    answer = "x" * 1200
+
+    for i in range(40):
+        rolling.add(f"question {i}", answer)
+        rolling.summary(wait=5.0)
+
+    # 40 folds; the first segment becomes the session summary without a call
+    assert llm.merges == 4
+    assert llm.calls == 44
+    assert rolling.stats == {"exchanges": 40, "llm_calls": 44, "errors": 0, "merge_errors": 0}
+    # Prompts stay bounded by one segment, not the whole session
+    assert llm.max_prompt_chars < 2 * len(answer)
+
+
+def test_exchanges_arriving_during_a_call_are_folded_together():
+    llm = FakeLLM()
+    llm.release.clear()
+    rolling = RollingSummarizer(llm, segment_size=100)
+
+    rolling.add("question 0", "answer")
+    assert llm.started.wait(5.0)
+    for i in range(1, 6):
+        rolling.add(f"question {i}", "answer")
+    llm.release.set()
+    summary = rolling.summary(wait=5.0)
+
+    assert llm.calls == 2
+    assert summary == "summary #2"
+
+
+def test_failed_merge_is_counted_and_retried():
+    llm = FakeLLM(fail_merges=1)
+    rolling = RollingSummarizer(llm, segment_size=2)
+
+    for i in range(4):
+        rolling.add(f"question {i}", "answer")
+        rolling.summary(wait=5.0)
+    assert rolling.stats["merge_errors"] == 1
+
+    rolling.add("question 4", "answer")
+    rolling.summary(wait=5.0)
+
+    assert llm.merges == 2
+    assert rolling.stats["merge_errors"] == 1
+    assert rolling.segment_exchanges == 0